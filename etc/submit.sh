@@ -70,7 +70,7 @@ fi
 # We need to create the expected output files in advance just in case
 # some problem happens during the job bootstrap
 if [ -z "$outputFile" ]; then
-    outputFile="Report.0.pkl Report.1.pkl Report.2.pkl Report.3.pkl wmagentJob.log"
+    outputFile="Report.0.pkl Report.1.pkl Report.2.pkl Report.3.pkl Report.0.summary.json Report.1.summary.json Report.2.summary.json Report.3.summary.json wmagentJob.log"
 fi
 touch $outputFile
 
@@ -176,6 +176,7 @@ echo -e "======== WMAgent Run the job FINISH at $(TZ=GMT date) ========\n"
 echo "WMAgent bootstrap: WMAgent finished the job, it's copying the pickled report"
 set -x
 cp WMTaskSpace/Report*.pkl ../
+cp WMTaskSpace/Report*.summary.json ../
 ls -l WMTaskSpace
 ls -l WMTaskSpace/*
 set +x
@@ -0,0 +1,3 @@
+function(doc, req) {
+  return (doc._deleted || doc.type === 'agent_request');
+}
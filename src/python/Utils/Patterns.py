@@ -3,6 +3,9 @@ Patterns module provides set of CS patterns
 """
 from __future__ import division, print_function
 
+import threading
+from collections import OrderedDict
+
 
 class Singleton(type):
     """Implementation of Singleton class"""
@@ -12,3 +15,43 @@ class Singleton(type):
             cls._instances[cls] = \
                     super(Singleton, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
+
+
+class LRUCache(object):
+    """
+    Thread safe least recently used cache of at most maxsize items,
+    with a dict like get/put interface
+    """
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        "Return the cached value of key and mark it as recently used"
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def put(self, key, value):
+        "Cache the value of key, dropping the least recently used item if full"
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        "Drop all the cached items"
+        with self._lock:
+            self._data.clear()
@@ -24,6 +24,50 @@ class DBSBufferBlockException(WMException):
 
 
 
+def convertToDBSBlock(data, copyData=True):
+    """
+    convert the data of a DBSBufferBlock to the DBSBlock structure to upload
+    to dbs, copying the data unless copyData is False (e.g. data received by
+    an upload process, which can be used as it is)
+    TODO: check file lumi event and validate event is not null
+    """
+    block = {}
+
+    #TODO: instead of using key to remove need to change to keyToKeep
+    # Ask dbs team to publish the list (API)
+    keyToRemove = ['insertedFiles', 'newFiles', 'file_count', 'block_size',
+                   'origin_site_name', 'creation_date', 'open',
+                   'Name', 'close_settings']
+
+    nestedKeyToRemove = ['block.block_events', 'block.datasetpath', 'block.workflows']
+
+    dbsBufferToDBSBlockKey = {'block_size': 'BlockSize',
+                              'creation_date': 'CreationDate',
+                              'file_count': 'NumberOfFiles',
+                              'origin_site_name': 'location'}
+
+    # clone the new DBSBlock dict after filtering out the data.
+    for key in data:
+        if key in keyToRemove:
+            continue
+        value = copy.deepcopy(data[key]) if copyData else data[key]
+        if key in dbsBufferToDBSBlockKey:
+            block[dbsBufferToDBSBlockKey[key]] = value
+        else:
+            block[key] = value
+
+    # delete nested key dictionary
+    for nestedKey in nestedKeyToRemove:
+        firstkey, subkey = nestedKey.split('.', 1)
+        if firstkey in block and subkey in block[firstkey]:
+            if not copyData:
+                block[firstkey] = dict(block[firstkey])
+            del block[firstkey][subkey]
+
+    return block
+
+
+
 class DBSBufferBlock:
     """
     _DBSBufferBlock_
@@ -468,39 +512,8 @@ class DBSBufferBlock:
     def convertToDBSBlock(self):
         """
         convert to DBSBlock structure to upload to dbs
-        TODO: check file lumi event and validate event is not null
         """
-        block = {}
-
-        #TODO: instead of using key to remove need to change to keyToKeep
-        # Ask dbs team to publish the list (API)
-        keyToRemove = ['insertedFiles', 'newFiles', 'file_count', 'block_size',
-                       'origin_site_name', 'creation_date', 'open',
-                       'Name', 'close_settings']
-
-        nestedKeyToRemove = ['block.block_events', 'block.datasetpath', 'block.workflows']
-
-        dbsBufferToDBSBlockKey = {'block_size': 'BlockSize',
-                                  'creation_date': 'CreationDate',
-                                  'file_count': 'NumberOfFiles',
-                                  'origin_site_name': 'location'}
-
-        # clone the new DBSBlock dict after filtering out the data.
-        for key in self.data:
-            if key in keyToRemove:
-                continue
-            elif key in dbsBufferToDBSBlockKey.keys():
-                block[dbsBufferToDBSBlockKey[key]] = copy.deepcopy(self.data[key])
-            else:
-                block[key] = copy.deepcopy(self.data[key])
-
-        # delete nested key dictionary
-        for nestedKey in nestedKeyToRemove:
-            firstkey, subkey = nestedKey.split('.', 1)
-            if firstkey in block and subkey in block[firstkey]:
-                del block[firstkey][subkey]
-
-        return block
+        return convertToDBSBlock(self.data)
 
     def setPendingAndCloseBlock(self):
         "set the block status as Pending for upload as well as closed"
@@ -32,10 +32,15 @@ import os.path
 import threading
 import time
 
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
 from dbs.apis.dbsClient import DbsApi
 
 from Utils.Timers import timeFunction
-from WMComponent.DBS3Buffer.DBSBufferBlock import DBSBufferBlock
+from WMComponent.DBS3Buffer.DBSBufferBlock import DBSBufferBlock, convertToDBSBlock
 from WMComponent.DBS3Buffer.DBSBufferUtil import DBSBufferUtil
 from WMCore.Algorithms.MiscAlgos import sortListByKey
 from WMCore.DAOFactory import DAOFactory
@@ -77,12 +82,71 @@ def createDictionaryFromConfig(configSection):
     return final
 
 
-def uploadWorker(workInput, results, dbsUrl):
+# errors of the DBS server or its frontends worth retrying the insertion after
+TRANSIENT_ERRORS = ('Service Unavailable', 'Connection refused', 'Error reading from remote server',
+                    'timed out')
+
+
+def uploadBlock(dbsApi, name, blockDump, nRetries=0, retryWait=0):
+    """
+    _uploadBlock_
+
+    Insert a block dump in DBS, retrying up to nRetries times on transient
+    errors, waiting retryWait seconds doubled after each attempt.
+    Return the result of the upload for the poller.
+    """
+    startTime = time.time()
+    result = {'name': name, 'size': 0, 'files': len(blockDump.get('files', [])), 'tries': 0}
+    while True:
+        result['tries'] += 1
+        try:
+            if not result['size']:
+                result['size'] = len(json.dumps(blockDump))
+            logging.debug("About to call insert block with block: %s", blockDump)
+            dbsApi.insertBulkBlock(blockDump=blockDump)
+            result['success'] = "uploaded"
+        except Exception as ex:
+            exString = str(ex)
+            if 'Block %s already exists' % name in exString:
+                # Then this is probably a duplicate
+                # Ignore this for now
+                logging.warning("Block %s already exists. Marking it as uploaded.", name)
+                logging.debug("Exception: %s", exString)
+                result['success'] = "uploaded"
+            elif 'Proxy Error' in exString:
+                # This is probably a successfully insertion that went bad.
+                # Put it on the check list
+                msg = "Got a proxy error for block %s." % name
+                logging.warning(msg)
+                result['success'] = "check"
+            elif 'Missing data when inserting to dataset_parents' in exString:
+                msg = "Parent dataset is not inserted yet for block %s." % name
+                logging.warning(msg)
+                result.update(success="error", error=msg)
+            elif result['tries'] <= nRetries and any(error in exString for error in TRANSIENT_ERRORS):
+                wait = retryWait * 2 ** (result['tries'] - 1)
+                logging.warning("Transient error inserting block %s, retrying in %s secs. Error: %s",
+                                name, wait, exString)
+                time.sleep(wait)
+                continue
+            else:
+                msg = "Error trying to process block %s through DBS. Error: %s" % (name, exString)
+                logging.exception(msg)
+                logging.debug("block info: %s \n", blockDump)
+                result.update(success="error", error=msg)
+        result['time'] = time.time() - startTime
+        return result
+
+
+def uploadWorker(workInput, results, dbsUrl, nRetries=0, retryWait=0):
     """
     _uploadWorker_
 
-    Put JSONized blocks in the workInput
+    Put the data of the blocks in the workInput
     Get confirmation in the output
+
+    The DBS block dumps are built here, in parallel in the worker processes,
+    and uploaded with the DbsApi of the process.
     """
 
     # Init DBS Stuff
@@ -104,36 +168,11 @@ def uploadWorker(workInput, results, dbsUrl):
             break
 
         name = work.get('name', None)  # this is the block name
-        block = work.get('block', None)  # this is the block data structure
+        # this is the pickled data of the DBSBufferBlock
+        blockDump = convertToDBSBlock(pickle.loads(work['data']), copyData=False)
 
         # Do stuff with DBS
-        try:
-            logging.debug("About to call insert block with block: %s", block)
-            dbsApi.insertBulkBlock(blockDump=block)
-            results.put({'name': name, 'success': "uploaded"})
-        except Exception as ex:
-            exString = str(ex)
-            if 'Block %s already exists' % name in exString:
-                # Then this is probably a duplicate
-                # Ignore this for now
-                logging.warning("Block %s already exists. Marking it as uploaded.", name)
-                logging.debug("Exception: %s", exString)
-                results.put({'name': name, 'success': "uploaded"})
-            elif 'Proxy Error' in exString:
-                # This is probably a successfully insertion that went bad.
-                # Put it on the check list
-                msg = "Got a proxy error for block %s." % name
-                logging.warning(msg)
-                results.put({'name': name, 'success': "check"})
-            elif 'Missing data when inserting to dataset_parents' in exString:
-                msg = "Parent dataset is not inserted yet for block %s." % name
-                logging.warning(msg)
-                results.put({'name': name, 'success': "error", 'error': msg})
-            else:
-                msg = "Error trying to process block %s through DBS. Error: %s" % (name, exString)
-                logging.exception(msg)
-                logging.debug("block info: %s \n", block)
-                results.put({'name': name, 'success': "error", 'error': msg})
+        results.put(uploadBlock(dbsApi, name, blockDump, nRetries, retryWait))
 
     return
 
@@ -190,10 +229,14 @@ class DBSUploadPoller(BaseWorkerThread):
         self.nProc = getattr(self.config.DBS3Upload, 'nProcesses', 4)
         self.wait = getattr(self.config.DBS3Upload, 'dbsWaitTime', 2)
         self.nTries = getattr(self.config.DBS3Upload, 'dbsNTries', 300)
+        # retries of each block insertion on transient DBS errors
+        self.nRetries = getattr(self.config.DBS3Upload, 'dbsUploadRetries', 2)
+        self.retryWait = getattr(self.config.DBS3Upload, 'dbsRetryWait', 10)
         self.physicsGroup = getattr(self.config.DBS3Upload, "physicsGroup", "NoGroup")
         self.datasetType = getattr(self.config.DBS3Upload, "datasetType", "PRODUCTION")
         self.primaryDatasetType = getattr(self.config.DBS3Upload, "primaryDatasetType", "mc")
         self.blockCount = 0
+        self.uploadStartTime = None
         self.dbsApi = DbsApi(url=self.dbsUrl)
 
         # List of blocks currently in processing
@@ -236,7 +279,9 @@ class DBSUploadPoller(BaseWorkerThread):
             p = multiprocessing.Process(target=uploadWorker,
                                         args=(self.workInput,
                                               self.workResult,
-                                              self.dbsUrl))
+                                              self.dbsUrl,
+                                              self.nRetries,
+                                              self.retryWait))
             p.start()
             self.pool.append(p)
 
@@ -670,7 +715,8 @@ class DBSUploadPoller(BaseWorkerThread):
         if len(self.pool) == 0:
             self.setupPool()
 
-        # Finally upload blocks to DBS.
+        # Finally upload blocks to DBS, timing this batch for the upload stats
+        self.uploadStartTime = time.time()
         for block in createInDBS:
             if len(block.files) < 1:
                 # What are we doing?
@@ -687,13 +733,15 @@ class DBSUploadPoller(BaseWorkerThread):
             logging.debug("Found block %s in blocks", block.getName())
             block.setPhysicsGroup(group=self.physicsGroup)
 
-            encodedBlock = block.convertToDBSBlock()
             logging.info("About to insert block %s", block.getName())
-            self.workInput.put({'name': block.getName(), 'block': encodedBlock})
+            # the block dump is built by the worker processes, from a snapshot
+            # of the block data (much cheaper than the copy of convertToDBSBlock)
+            blockData = pickle.dumps(block.data, pickle.HIGHEST_PROTOCOL)
+            self.workInput.put({'name': block.getName(), 'data': blockData})
             self.blockCount += 1
             if self.produceCopy:
                 with open(self.copyPath, 'w') as jo:
-                    json.dump(encodedBlock, jo, indent=2)
+                    json.dump(block.convertToDBSBlock(), jo, indent=2)
             self.queuedBlocks.append(block.getName())
 
         # And all work is in and we're done for now
@@ -744,6 +792,9 @@ class DBSUploadPoller(BaseWorkerThread):
                 emptyCount += 1
                 continue
 
+        if blocksToClose:
+            self.logUploadStats(blocksToClose)
+
         loadedBlocks = []
         for result in blocksToClose:
             # Remove from list of work being processed
@@ -808,6 +859,23 @@ class DBSUploadPoller(BaseWorkerThread):
         # And we're done
         return
 
+    def logUploadStats(self, results):
+        """
+        _logUploadStats_
+
+        Log the upload rate and the size of the block dumps uploaded since
+        the last batch of blocks was queued
+        """
+        elapsed = max(time.time() - self.uploadStartTime, 1e-6)
+        sizes = [result.get('size', 0) for result in results]
+        uploadTimes = [result.get('time', 0) for result in results]
+        logging.info("Uploaded %d blocks with %d files in %.1f secs: %.2f blocks/sec, "
+                     "%.1f MB of block dumps (largest %.1f MB), %d retries, slowest insertion %.1f secs",
+                     len(results), sum(result.get('files', 0) for result in results), elapsed,
+                     len(results) / elapsed, sum(sizes) / 1e6, max(sizes) / 1e6,
+                     sum(result.get('tries', 1) - 1 for result in results), max(uploadTimes))
+        return
+
     def checkBlocks(self):
         """
         _checkBlocks_
@@ -23,7 +23,6 @@ immediately to the 'created' state, skipping cooloff.  It defaults to [].
 Note that exitCodesNoRetry has precedence over passExitCodes.
 """
 import logging
-import os.path
 import threading
 from httplib import HTTPException
 from Utils.Timers import timeFunction
@@ -31,7 +30,7 @@ from Utils.IteratorTools import grouper
 from WMCore.ACDC.DataCollectionService import DataCollectionService
 from WMCore.DAOFactory import DAOFactory
 from WMCore.Database.CouchUtils import CouchConnectionError
-from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.ReportSummary import readReportSummaries
 from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMCore.WMBS.Job import Job
 from WMCore.WMException import WMException
@@ -223,65 +222,63 @@ class ErrorHandlerPoller(BaseWorkerThread):
         passJobs = []
         exhaustJobs = []
 
+        # read the summary sidecars of all the reports at once, falling
+        # back to the full report for jobs without one
+        summaries = readReportSummaries([job['fwjr_path'] for job in jobList
+                                         if job['fwjr_path'] is not None])
+
         for job in jobList:
-            report = Report()
             reportPath = job['fwjr_path']
             if reportPath is None:
                 logging.error("No FWJR in job %i, ErrorHandler can't process it.\n Passing it to cooloff.", job['id'])
                 cooloffJobs.append(job)
                 continue
-            if not os.path.isfile(reportPath):
+            if reportPath not in summaries:
                 logging.error(
-                    "Failed to find FWJR for job %i in location %s.\n Passing it to cooloff.", job['id'], reportPath)
+                    "Failed to read FWJR for job %i in location %s.\n Passing it to cooloff.", job['id'], reportPath)
                 cooloffJobs.append(job)
                 continue
-            try:
-                report.load(reportPath)
-                # First let's check the time conditions
-                times = report.getFirstStartLastStop()
-                startTime = None
-                stopTime = None
-                if times is not None:
-                    startTime = times['startTime']
-                    stopTime = times['stopTime']
-
-                # correct the location if the original location is different from recorded in wmbs
-                # WARNING: we are not updating job location in wmbs only updating in couchdb by doing this.
-                # If location in wmbs needs to be updated, it should happen in JobAccountant.
-                locationFromFWJR = report.getSiteName()
-                if locationFromFWJR:
-                    job["location"] = locationFromFWJR
-                    job["site_cms_name"] = locationFromFWJR
-
-                if startTime is None or stopTime is None:
-                    # We have no information to make a decision, keep going.
-                    logging.debug("No start, stop times for steps for job %i", job['id'])
-                elif stopTime - startTime > self.maxFailTime:
-                    msg = "Job %i exhausted after running on node for %i seconds" % (job['id'], stopTime - startTime)
-                    logging.debug(msg)
-                    exhaustJobs.append(job)
-                    continue
-
-                if len([x for x in report.getExitCodes() if x in self.exitCodesNoRetry]):
-                    msg = "Job %i exhausted due to a bad exit code (%s)" % (job['id'], str(report.getExitCodes()))
-                    logging.debug(msg)
-                    exhaustJobs.append(job)
-                    continue
-
-                if len([x for x in report.getExitCodes() if x in self.passCodes]):
-                    msg = "Job %i restarted immediately due to an exit code (%s)" % (job['id'],
-                                                                                     str(report.getExitCodes()))
-                    logging.debug(msg)
-                    passJobs.append(job)
-                    continue
 
-                cooloffJobs.append(job)
+            summary = summaries[reportPath]
+            # First let's check the time conditions
+            times = summary['times']
+            startTime = None
+            stopTime = None
+            if times is not None:
+                startTime = times['startTime']
+                stopTime = times['stopTime']
+
+            # correct the location if the original location is different from recorded in wmbs
+            # WARNING: we are not updating job location in wmbs only updating in couchdb by doing this.
+            # If location in wmbs needs to be updated, it should happen in JobAccountant.
+            locationFromFWJR = summary['siteName']
+            if locationFromFWJR:
+                job["location"] = locationFromFWJR
+                job["site_cms_name"] = locationFromFWJR
+
+            if startTime is None or stopTime is None:
+                # We have no information to make a decision, keep going.
+                logging.debug("No start, stop times for steps for job %i", job['id'])
+            elif stopTime - startTime > self.maxFailTime:
+                msg = "Job %i exhausted after running on node for %i seconds" % (job['id'], stopTime - startTime)
+                logging.debug(msg)
+                exhaustJobs.append(job)
+                continue
 
-            except Exception as ex:
-                logging.warning("Exception while trying to check jobs for failures!")
-                logging.warning(str(ex))
-                logging.warning("Ignoring and sending job to cooloff")
-                cooloffJobs.append(job)
+            exitCodes = summary['exitCodes']
+            if len([x for x in exitCodes if x in self.exitCodesNoRetry]):
+                msg = "Job %i exhausted due to a bad exit code (%s)" % (job['id'], str(exitCodes))
+                logging.debug(msg)
+                exhaustJobs.append(job)
+                continue
+
+            if len([x for x in exitCodes if x in self.passCodes]):
+                msg = "Job %i restarted immediately due to an exit code (%s)" % (job['id'], str(exitCodes))
+                logging.debug(msg)
+                passJobs.append(job)
+                continue
+
+            cooloffJobs.append(job)
 
         return cooloffJobs, passJobs, exhaustJobs
 
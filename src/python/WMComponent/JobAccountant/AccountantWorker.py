@@ -16,6 +16,7 @@ import gc
 import logging
 import os
 import threading
+import time
 
 from WMComponent.DBS3Buffer.DBSBufferFile import DBSBufferFile
 from WMCore.ACDC.DataCollectionService import DataCollectionService
@@ -123,6 +124,8 @@ class AccountantWorker(WMConnectionBase):
         self.parentageBindsForMerge = []
         self.jobsWithSkippedFiles = {}
         self.count = 0
+        # time spent in each stage of the last call
+        self.timing = {'load': 0, 'handle': 0, 'commit': 0}
         self.datasetAlgoID = collections.deque(maxlen=1000)
         self.datasetAlgoPaths = collections.deque(maxlen=1000)
         self.dbsLocations = set()
@@ -216,21 +219,29 @@ class AccountantWorker(WMConnectionBase):
 
         return
 
-    def __call__(self, parameters):
+    def __call__(self, parameters, jobReports=None):
         """
         __call__
 
         Handle a completed job.  The parameters dictionary will contain the job
         ID and the path to the framework job report.
+        The framework job reports can be given already loaded, in the same
+        order as the jobs.
         """
         returnList = []
         self.reset()
+        self.timing = {'load': 0, 'handle': 0, 'commit': 0}
 
-        for job in parameters:
+        if jobReports is None:
+            startTime = time.time()
+            jobReports = [self.loadJobReport(job["fwjr_path"]) for job in parameters]
+            self.timing['load'] = time.time() - startTime
+
+        startTime = time.time()
+        for job, fwkJobReport in zip(parameters, jobReports):
             logging.info("Handling %s", job["fwjr_path"])
 
-            # Load the job and set the ID
-            fwkJobReport = self.loadJobReport(job["fwjr_path"])
+            # Set the job ID of the report
             fwkJobReport.setJobID(job['id'])
 
             jobSuccess = self.handleJob(jobID=job["id"],
@@ -244,6 +255,8 @@ class AccountantWorker(WMConnectionBase):
 
             self.count += 1
 
+        self.timing['handle'] = time.time() - startTime
+        startTime = time.time()
         existingTransaction = self.beginTransaction()
 
         # Now things done at the end of the job
@@ -303,6 +316,7 @@ class AccountantWorker(WMConnectionBase):
             self.handleSkippedFiles()
 
         self.commitTransaction(existingTransaction)
+        self.timing['commit'] = time.time() - startTime
 
         return returnList
 
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+_FWJRLoader_
+
+Load the framework job reports of the next slices of complete jobs in
+background threads, while the AccountantWorker does the database work of
+the current slice.
+"""
+from __future__ import print_function, division
+
+import time
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+
+class FWJRLoader(object):
+    """
+    _FWJRLoader_
+
+    loadFunc takes a framework job report path and returns the loaded report,
+    like AccountantWorker.loadJobReport. The reports of each slice are loaded
+    by numThreads threads, with at most prefetchSlices slices loaded ahead of
+    the one being accounted (inline if numThreads is 0).
+    """
+
+    def __init__(self, loadFunc, numThreads=2, prefetchSlices=2):
+        self.loadFunc = loadFunc
+        self.prefetchSlices = prefetchSlices if numThreads > 0 else 0
+        self.pool = ThreadPool(numThreads) if numThreads > 0 else None
+
+    def _loadReports(self, jobsSlice):
+        startTime = time.time()
+        reports = [self.loadFunc(job['fwjr_path']) for job in jobsSlice]
+        return reports, time.time() - startTime
+
+    def _startLoad(self, jobsSlice):
+        if self.pool is None:
+            return jobsSlice, self._loadReports(jobsSlice)
+        return jobsSlice, self.pool.apply_async(self._loadReports, (jobsSlice,))
+
+    def loadSlices(self, jobSlices):
+        """
+        _loadSlices_
+
+        Generator of (jobsSlice, reports, loadTime, waitTime) for each slice
+        of jobs, in order, where reports are the loaded reports of the jobs,
+        loadTime the time spent loading them and waitTime the time waited for
+        them to be loaded.
+        """
+        pending = deque()
+        jobSlices = iter(jobSlices)
+        while True:
+            for jobsSlice in jobSlices:
+                pending.append(self._startLoad(jobsSlice))
+                if len(pending) > self.prefetchSlices:
+                    break
+            if not pending:
+                return
+            jobsSlice, result = pending.popleft()
+            startTime = time.time()
+            if self.pool is not None:
+                result = result.get()
+            reports, loadTime = result
+            yield jobsSlice, reports, loadTime, time.time() - startTime
+
+    def close(self):
+        """
+        _close_
+
+        Stop the loader threads
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+        return
@@ -7,6 +7,7 @@ Poll WMBS for complete jobs and process their framework job reports.
 
 import threading
 import logging
+import time
 
 from Utils.IteratorTools import grouper
 from Utils.Timers import timeFunction
@@ -14,6 +15,7 @@ from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.Database.CouchUtils import CouchConnectionError
 from WMCore.DAOFactory import DAOFactory
 from WMComponent.JobAccountant.AccountantWorker import AccountantWorker
+from WMComponent.JobAccountant.FWJRLoader import FWJRLoader
 from WMCore.WMException import WMException
 
 
@@ -32,6 +34,10 @@ class JobAccountantPoller(BaseWorkerThread):
         BaseWorkerThread.__init__(self)
         self.config = config
         self.accountantWorkSize = getattr(self.config.JobAccountant, 'accountantWorkSize', 100)
+        # threads loading the job reports of the next slices during the database work
+        self.loaderThreads = getattr(self.config.JobAccountant, 'loaderThreads', 2)
+        self.prefetchSlices = getattr(self.config.JobAccountant, 'prefetchSlices', 2)
+        self.fwjrLoader = None
 
         return
 
@@ -43,6 +49,9 @@ class JobAccountantPoller(BaseWorkerThread):
         processpool with them.  Also instantiate all the DAOs that we will use.
         """
         self.accountantWorker = AccountantWorker(config=self.config)
+        self.fwjrLoader = FWJRLoader(self.accountantWorker.loadJobReport,
+                                     numThreads=self.loaderThreads,
+                                     prefetchSlices=self.prefetchSlices)
 
         myThread = threading.currentThread()
         daoFactory = DAOFactory(package="WMCore.WMBS", logger=myThread.logger,
@@ -50,6 +59,17 @@ class JobAccountantPoller(BaseWorkerThread):
         self.getJobsAction = daoFactory(classname="Jobs.GetFWJRByState")
         return
 
+    def terminate(self, params):
+        """
+        _terminate_
+
+        Stop the job report loader threads
+        """
+        if self.fwjrLoader is not None:
+            self.fwjrLoader.close()
+        BaseWorkerThread.terminate(self, params)
+        return
+
     @timeFunction
     def algorithm(self, parameters=None):
         """
@@ -65,9 +85,12 @@ class JobAccountantPoller(BaseWorkerThread):
             logging.debug("No work to do; exiting")
             return
 
-        for jobsSlice in grouper(completeJobs, self.accountantWorkSize):
+        startTime = time.time()
+        timing = {'wait': 0, 'load': 0, 'handle': 0, 'commit': 0}
+        jobSlices = self.fwjrLoader.loadSlices(grouper(completeJobs, self.accountantWorkSize))
+        for jobsSlice, jobReports, loadTime, waitTime in jobSlices:
             try:
-                self.accountantWorker(jobsSlice)
+                self.accountantWorker(jobsSlice, jobReports)
             except WMException:
                 myThread = threading.currentThread()
                 if getattr(myThread, 'transaction', None) is not None:
@@ -89,4 +112,14 @@ class JobAccountantPoller(BaseWorkerThread):
                 logging.exception(msg)
                 raise JobAccountantPollerException(msg)
 
+            timing['wait'] += waitTime
+            timing['load'] += loadTime
+            timing['handle'] += self.accountantWorker.timing['handle']
+            timing['commit'] += self.accountantWorker.timing['commit']
+
+        totalTime = time.time() - startTime
+        logging.info("Accounted %d jobs in %.2f secs (%.1f jobs/sec): reports loaded in %.2f secs "
+                     "(waited for %.2f secs), jobs handled in %.2f secs and committed in %.2f secs",
+                     len(completeJobs), totalTime, len(completeJobs) / max(totalTime, 1e-6), timing['load'],
+                     timing['wait'], timing['handle'], timing['commit'])
         return
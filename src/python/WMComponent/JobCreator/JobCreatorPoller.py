@@ -17,6 +17,8 @@ except ImportError:
 from Utils.Timers import timeFunction
 from Utils.MathUtils import quantize
 from WMComponent.JobCreator.CreateWorkArea import CreateWorkArea
+from WMComponent.JobCreator.JobWriter import JobWriter
+from WMComponent.JobCreator.SubmitRecords import writeSubmitRecords
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.DAOFactory import DAOFactory
 from WMCore.WMException import WMException
@@ -120,11 +122,12 @@ def saveJob(job, workflow, sandbox, wmTask=None, jobNumber=0,
             owner=None, ownerDN=None, ownerGroup='', ownerRole='',
             scramArch=None, swVersion=None, agentNumber=0, numberOfCores=1,
             inputDataset=None, inputDatasetLocations=None, inputPileup=None,
-            allowOpportunistic=False, agentName=''):
+            allowOpportunistic=False, agentName='', jobWriter=None):
     """
     _saveJob_
 
-    Actually do the mechanics of saving the job to a pickle file
+    Actually do the mechanics of saving the job to a pickle file,
+    or hand it to jobWriter if given
     """
     if wmTask:
         # If we managed to load the task,
@@ -151,17 +154,22 @@ def saveJob(job, workflow, sandbox, wmTask=None, jobNumber=0,
     job['inputPileup'] = inputPileup
     job['allowOpportunistic'] = allowOpportunistic
 
+    if jobWriter is not None:
+        jobWriter.write(job)
+        return
+
     with open(os.path.join(cacheDir, 'job.pkl'), 'w') as output:
         pickle.dump(job, output, pickle.HIGHEST_PROTOCOL)
 
     return
 
 
-def creatorProcess(work, jobCacheDir):
+def creatorProcess(work, jobCacheDir, jobWriter=None):
     """
     _creatorProcess_
 
-    Creator work areas and pickle job objects
+    Creator work areas and pickle job objects, written by jobWriter
+    in the background if given
     """
     createWorkArea = CreateWorkArea()
 
@@ -224,13 +232,20 @@ def creatorProcess(work, jobCacheDir):
                     inputDatasetLocations=inputDatasetLocations,
                     inputPileup=inputPileup,
                     allowOpportunistic=allowOpportunistic,
-                    agentName=agentName)
+                    agentName=agentName,
+                    jobWriter=jobWriter)
 
     except Exception as ex:
         msg = "Exception in processing wmbsJobGroup %i\n. Error: %s" % (wmbsJobGroup.id, str(ex))
         logging.exception(msg)
         raise JobCreatorException(msg)
 
+    try:
+        writeSubmitRecords(wmbsJobGroup.jobs)
+    except Exception as ex:
+        # the JobSubmitter reads the job pickles without them
+        logging.warning("Failed to write the submit records of wmbsJobGroup %i: %s", wmbsJobGroup.id, str(ex))
+
     return wmbsJobGroup
 
 
@@ -373,6 +388,11 @@ class JobCreatorPoller(BaseWorkerThread):
         self.agentNumber = int(getattr(config.Agent, 'agentNumber', 0))
         self.agentName = getattr(config.Agent, 'hostName', '')
         self.glideinLimits = getattr(config.JobCreator, 'GlideInRestriction', None)
+        # job objects pickled here and written by a pool of threads,
+        # optionally in one archive per job collection instead of one file per job
+        self.jobWriter = JobWriter(numThreads=getattr(config.JobCreator, 'jobWriterThreads', 4),
+                                   maxPending=getattr(config.JobCreator, 'jobWriterMaxPending', 100),
+                                   archive=getattr(config.JobCreator, 'jobGroupArchive', False))
 
         # initialize the alert framework (if available - config.Alert present)
         #    self.sendAlert will be then be available
@@ -615,7 +635,8 @@ class JobCreatorPoller(BaseWorkerThread):
                     tempDict['allowOpportunistic'] = allowOpport
 
                     jobGroup = creatorProcess(work=tempDict,
-                                              jobCacheDir=self.jobCacheDir)
+                                              jobCacheDir=self.jobCacheDir,
+                                              jobWriter=self.jobWriter)
                     jobNumber += jobsInGroup
 
                     # Set jobCache for group
@@ -624,6 +645,14 @@ class JobCreatorPoller(BaseWorkerThread):
                                              'cacheDir': job['cache_dir']})
                         job["user"] = wmWorkload.getOwner()["name"]
                         job["group"] = wmWorkload.getOwner()["group"]
+                # all the job objects must be on disk before the jobs are created
+                try:
+                    self.jobWriter.wait()
+                except WMException as ex:
+                    msg = "Failed to write the job objects: %s" % str(ex)
+                    logging.error(msg)
+                    raise JobCreatorException(msg)
+
                 # Set the caches in the database
                 try:
                     if len(nameDictList) > 0:
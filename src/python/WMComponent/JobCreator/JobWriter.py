@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+_JobWriter_
+
+Write the pickled job objects of the JobCreator in the background, with a
+bounded pool of threads, either to a job.pkl file in each job cache directory
+or, optionally, to one indexed archive per job collection directory, read
+back with JobArchiveReader.
+"""
+from __future__ import print_function, division
+
+import logging
+import os
+import threading
+from collections import defaultdict
+from Queue import Queue
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from WMCore.WMException import WMException
+
+JOB_ARCHIVE_FILE = "JobArchive.pkl"
+JOB_ARCHIVE_INDEX = "JobArchive.idx"
+
+
+class JobWriterException(WMException):
+    """
+    _JobWriterException_
+
+    Failures to write the job objects.
+    """
+    pass
+
+
+def _writeFile(path, data):
+    with open(path, 'wb') as handle:
+        handle.write(data)
+    return
+
+
+def _writeFiles(files):
+    for path, data in files:
+        _writeFile(path, data)
+    return
+
+
+def writeJobArchive(collectionDir, pickledJobs):
+    """
+    _writeJobArchive_
+
+    Write the pickled jobs, given as [(job id, data)], to the archive of a job
+    collection directory, with an index of the offset and length of each job.
+    The index is written last, an archive without index is ignored.
+    """
+    index = {}
+    offset = 0
+    archivePath = os.path.join(collectionDir, JOB_ARCHIVE_FILE)
+    with open(archivePath, 'wb') as handle:
+        for jobID, data in pickledJobs:
+            handle.write(data)
+            index[jobID] = (offset, len(data))
+            offset += len(data)
+    indexPath = os.path.join(collectionDir, JOB_ARCHIVE_INDEX)
+    _writeFile(indexPath + ".tmp", pickle.dumps(index, pickle.HIGHEST_PROTOCOL))
+    os.rename(indexPath + ".tmp", indexPath)
+    return
+
+
+class JobArchiveReader(object):
+    """
+    _JobArchiveReader_
+
+    Load jobs from the job archives, keeping the indexes already read.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+
+    def getIndex(self, collectionDir):
+        if collectionDir not in self.indexes:
+            index = {}
+            indexPath = os.path.join(collectionDir, JOB_ARCHIVE_INDEX)
+            if os.path.isfile(indexPath):
+                with open(indexPath, 'rb') as handle:
+                    index = pickle.load(handle)
+            self.indexes[collectionDir] = index
+        return self.indexes[collectionDir]
+
+    def loadJob(self, cacheDir, jobID):
+        """
+        _loadJob_
+
+        Return the job in cacheDir from the archive of its collection, None if
+        it isn't archived.
+        """
+        collectionDir = os.path.dirname(os.path.normpath(cacheDir))
+        index = self.getIndex(collectionDir)
+        if jobID not in index:
+            return None
+        offset, length = index[jobID]
+        with open(os.path.join(collectionDir, JOB_ARCHIVE_FILE), 'rb') as handle:
+            handle.seek(offset)
+            return pickle.loads(handle.read(length))
+
+
+class JobWriter(object):
+    """
+    _JobWriter_
+
+    The jobs are pickled by the caller and written by numThreads threads,
+    in batches of batchSize files, with at most maxPending batches waiting
+    (inline if numThreads is 0).
+    In archive mode the jobs are kept until flush, which writes one archive
+    per job collection directory.
+
+    wait must be called before the jobs are made visible to other components,
+    it raises JobWriterException if any write failed.
+    """
+
+    def __init__(self, numThreads=4, maxPending=100, archive=False, batchSize=50):
+        self.archive = archive
+        self.archiveJobs = defaultdict(list)
+        # files handed to the threads together, to limit the thread switches
+        self.batchSize = batchSize
+        self.files = []
+        self.queue = Queue(maxPending)
+        self.errors = []
+        self.threads = []
+        for _ in range(numThreads):
+            thread = threading.Thread(target=self._run, name="JobWriter")
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def _run(self):
+        while True:
+            func, args = self.queue.get()
+            try:
+                func(*args)
+            except Exception as ex:
+                logging.exception("Failed to write job objects")
+                self.errors.append(str(ex))
+            finally:
+                self.queue.task_done()
+
+    def _submit(self, func, *args):
+        if self.threads:
+            self.queue.put((func, args))
+        else:
+            func(*args)
+        return
+
+    def write(self, job):
+        """
+        _write_
+
+        Pickle a job and queue it for writing to its cache directory
+        """
+        data = pickle.dumps(job, pickle.HIGHEST_PROTOCOL)
+        if self.archive:
+            collectionDir = os.path.dirname(os.path.normpath(job['cache_dir']))
+            self.archiveJobs[collectionDir].append((job['id'], data))
+        else:
+            self.files.append((os.path.join(job['cache_dir'], 'job.pkl'), data))
+            if len(self.files) >= self.batchSize:
+                self._submit(_writeFiles, self.files)
+                self.files = []
+        return
+
+    def flush(self):
+        """
+        _flush_
+
+        Queue the remaining files and the archives of the jobs written so far
+        """
+        if self.files:
+            self._submit(_writeFiles, self.files)
+            self.files = []
+        for collectionDir, pickledJobs in self.archiveJobs.iteritems():
+            self._submit(writeJobArchive, collectionDir, pickledJobs)
+        self.archiveJobs = defaultdict(list)
+        return
+
+    def wait(self):
+        """
+        _wait_
+
+        Wait for all the jobs to be written
+        """
+        self.flush()
+        self.queue.join()
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise JobWriterException("Failed to write %d job objects: %s" % (len(errors), errors[0]))
+        return
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+_SubmitRecords_
+
+Compact records of what the JobSubmitter needs from the job objects (sites,
+sandbox, owner, resource estimates...), written by the JobCreator in one
+index file per job collection directory, next to the job cache directories.
+
+The JobSubmitter adds to the records the job package it put each job in, so
+that the job objects don't have to be unpickled again when its cache is
+rebuilt, as long as the job keeps the same retry count.
+"""
+from __future__ import print_function, division
+
+import logging
+import os
+from collections import defaultdict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+SUBMIT_RECORDS_FILE = "submitRecords.pkl"
+
+# job keys copied to the records, read back with the same defaults
+RECORD_KEYS = ["possiblePSN", "fileLocations", "siteWhitelist", "siteBlacklist", "sandbox",
+               "ownerDN", "ownerGroup", "ownerRole", "scramArch", "swVersion", "proxyPath",
+               "estimatedJobTime", "estimatedDiskUsage", "estimatedMemoryUsage", "numberOfCores",
+               "inputDataset", "inputDatasetLocations", "inputPileup", "allowOpportunistic"]
+
+
+def getRecordsPath(cacheDir):
+    """
+    _getRecordsPath_
+
+    Path of the index file with the record of the job in cacheDir
+    """
+    return os.path.join(os.path.dirname(os.path.normpath(cacheDir)), SUBMIT_RECORDS_FILE)
+
+
+def makeSubmitRecord(job):
+    """
+    _makeSubmitRecord_
+
+    Build the submit record of a job, with the number of cores of the job
+    baggage already applied.
+    """
+    record = dict((key, job[key]) for key in RECORD_KEYS if key in job)
+    numberOfCores = job.get('numberOfCores', 1)
+    if numberOfCores == 1:
+        numberOfCores = getattr(job.getBaggage(), "numberOfCores", 1)
+    record['numberOfCores'] = numberOfCores
+    return record
+
+
+def readSubmitRecords(recordsPath):
+    """
+    _readSubmitRecords_
+
+    Return the records of an index file, by job id. Missing or unreadable
+    files give no records.
+    """
+    if not os.path.isfile(recordsPath):
+        return {}
+    try:
+        with open(recordsPath, 'rb') as handle:
+            return pickle.load(handle)
+    except Exception as ex:
+        logging.warning("Ignoring unreadable submit records %s: %s", recordsPath, str(ex))
+        return {}
+
+
+def _writeSubmitRecords(recordsPath, records):
+    tmpPath = "%s.%d.tmp" % (recordsPath, os.getpid())
+    with open(tmpPath, 'wb') as handle:
+        pickle.dump(records, handle, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmpPath, recordsPath)
+    return
+
+
+def writeSubmitRecords(jobs):
+    """
+    _writeSubmitRecords_
+
+    Add the records of the jobs to the index files of their directories.
+    """
+    recordsByPath = defaultdict(dict)
+    for job in jobs:
+        recordsByPath[getRecordsPath(job['cache_dir'])][job['id']] = makeSubmitRecord(job)
+
+    for recordsPath, newRecords in recordsByPath.iteritems():
+        records = readSubmitRecords(recordsPath)
+        records.update(newRecords)
+        _writeSubmitRecords(recordsPath, records)
+    return
+
+
+def updateSubmitPackages(packagesByPath):
+    """
+    _updateSubmitPackages_
+
+    Record the job package of the jobs, given as
+    {recordsPath: {jobid: (retry count, package directory)}}
+    """
+    for recordsPath, packages in packagesByPath.iteritems():
+        records = readSubmitRecords(recordsPath)
+        for jobid, (retryCount, packageDir) in packages.iteritems():
+            if jobid in records:
+                records[jobid]['packageRetryCount'] = retryCount
+                records[jobid]['packageDir'] = packageDir
+        _writeSubmitRecords(recordsPath, records)
+    return
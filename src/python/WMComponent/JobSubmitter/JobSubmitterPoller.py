@@ -9,6 +9,7 @@ Submit jobs for execution.
 """
 from __future__ import print_function, division
 
+import heapq
 import logging
 import os.path
 import threading
@@ -33,6 +34,8 @@ from WMCore.BossAir.BossAirAPI import BossAirAPI
 from WMCore.Services.ReqMgr.ReqMgr import ReqMgr
 from WMCore.Services.ReqMgrAux.ReqMgrAux import ReqMgrAux
 
+from WMComponent.JobCreator.JobWriter import JobArchiveReader
+from WMComponent.JobCreator.SubmitRecords import getRecordsPath, readSubmitRecords, updateSubmitPackages
 from WMComponent.JobSubmitter.JobSubmitAPI import availableScheddSlots
 
 
@@ -44,6 +47,77 @@ def jobSubmitCondition(jobStats):
     return "JobSubmitReady"
 
 
+class JobPriorityIndex(object):
+    """
+    _JobPriorityIndex_
+
+    Index of the cached job ids, grouped by final job priority and then by
+    task type and possible sites (the sites being a tuple in the iteration
+    order of the job possibleSites). The ids of each group are kept sorted
+    until the group changes.
+    """
+
+    def __init__(self):
+        self.groupsByPrio = {}
+        self.jobKeys = {}  # key'ed by the job id, containing its (priority, group key)
+
+    def __len__(self):
+        return len(self.jobKeys)
+
+    def __contains__(self, jobid):
+        return jobid in self.jobKeys
+
+    def add(self, jobid, jobPrio, jobType, possibleSites):
+        """
+        Add a job to the index, or move it if it's already there
+        """
+        self.discard(jobid)
+        groupKey = (jobType, tuple(possibleSites))
+        groups = self.groupsByPrio.setdefault(jobPrio, {})
+        groups.setdefault(groupKey, [set(), None])[0].add(jobid)
+        groups[groupKey][1] = None
+        self.jobKeys[jobid] = (jobPrio, groupKey)
+
+    def discard(self, jobid):
+        """
+        Remove a job from the index, if it's there
+        """
+        if jobid not in self.jobKeys:
+            return
+        jobPrio, groupKey = self.jobKeys.pop(jobid)
+        groups = self.groupsByPrio[jobPrio]
+        group = groups[groupKey]
+        group[0].discard(jobid)
+        # the sorted ids are replaced, not updated, they might be iterated over
+        group[1] = None
+        if not group[0]:
+            del groups[groupKey]
+            if not groups:
+                del self.groupsByPrio[jobPrio]
+
+    def clear(self):
+        self.groupsByPrio = {}
+        self.jobKeys = {}
+
+    def priorities(self):
+        """
+        Return the job priorities, from the highest to the lowest
+        """
+        return sorted(self.groupsByPrio, reverse=True)
+
+    def groups(self, jobPrio):
+        """
+        Return a list of (task type, possible sites, sorted job ids) of the
+        groups of a priority
+        """
+        result = []
+        for groupKey, group in self.groupsByPrio.get(jobPrio, {}).iteritems():
+            if group[1] is None:
+                group[1] = sorted(group[0])
+            result.append((groupKey[0], groupKey[1], group[1]))
+        return result
+
+
 class JobSubmitterPollerException(WMException):
     """
     _JobSubmitterPollerException_
@@ -93,10 +167,11 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.enableAllSites = False
 
         # Additions for caching-based JobSubmitter
-        self.jobsByPrio = {}  # key'ed by the final job priority, which contains a set of job ids
+        self.jobsByPrio = JobPriorityIndex()  # job ids by final job priority, task type and sites
         self.jobDataCache = {}  # key'ed by the job id, containing the whole job info dict
         self.jobsToPackage = {}
         self.locationDict = {}
+        self.jobArchiveReader = JobArchiveReader()
         self.drainSites = set()
         self.abortSites = set()
         self.refreshPollingCount = 0
@@ -233,6 +308,47 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         return
 
+    def loadJobObject(self, newJob):
+        """
+        _loadJobObject_
+
+        Unpickle the job object of a job, from its cache directory or the job
+        archive of its job collection. Return None if there is no pickle.
+        """
+        pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
+
+        try:
+            if os.path.isfile(pickledJobPath):
+                with open(pickledJobPath, 'r') as jobHandle:
+                    loadedJob = pickle.load(jobHandle)
+            else:
+                loadedJob = self.jobArchiveReader.loadJob(newJob["cache_dir"], newJob["id"])
+                if loadedJob is None:
+                    # Then we have a problem - there's no file
+                    logging.error("Could not find pickled jobObject %s", pickledJobPath)
+                    return None
+        except Exception as ex:
+            msg = "Error while loading pickled job object %s\n" % pickledJobPath
+            msg += str(ex)
+            logging.error(msg)
+            raise JobSubmitterPollerException(msg)
+        return loadedJob
+
+    @staticmethod
+    def hasJobPackage(jobRecord, retryCount, packageDirs):
+        """
+        _hasJobPackage_
+
+        Check whether the submit record of a job points to a package written
+        for the same retry count. packageDirs caches the checked directories.
+        """
+        if not jobRecord or jobRecord.get('packageRetryCount') != retryCount:
+            return False
+        packageDir = jobRecord['packageDir']
+        if packageDir not in packageDirs:
+            packageDirs[packageDir] = os.path.isfile(os.path.join(packageDir, "JobPackage.pkl"))
+        return packageDirs[packageDir]
+
     def hasToRefreshCache(self):
         """
         _hasToRefreshCache_
@@ -267,6 +383,10 @@ class JobSubmitterPoller(BaseWorkerThread):
         """
         badJobs = dict([(x, []) for x in range(71101, 71105)])
         newJobIds = set()
+        submitRecords = {}  # key'ed by the records path, containing the records by job id
+        newPackages = defaultdict(dict)  # packages of the jobs with a record, by records path
+        packageDirs = {}  # whether the package directories have a package on disk
+        self.jobArchiveReader = JobArchiveReader()
 
         logging.info("Refreshing priority cache with currently %i jobs", len(self.jobDataCache))
 
@@ -299,24 +419,21 @@ class JobSubmitterPoller(BaseWorkerThread):
             if jobID in self.jobDataCache:
                 continue
 
-            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
-
-            if not os.path.isfile(pickledJobPath):
-                # Then we have a problem - there's no file
-                logging.error("Could not find pickled jobObject %s", pickledJobPath)
-                badJobs[71103].append(newJob)
-                continue
-            try:
-                with open(pickledJobPath, 'r') as jobHandle:
-                    loadedJob = pickle.load(jobHandle)
-            except Exception as ex:
-                msg = "Error while loading pickled job object %s\n" % pickledJobPath
-                msg += str(ex)
-                logging.error(msg)
-                raise JobSubmitterPollerException(msg)
+            # use the submit record of the job if any, the pickled job otherwise
+            recordsPath = getRecordsPath(newJob["cache_dir"])
+            if recordsPath not in submitRecords:
+                submitRecords[recordsPath] = readSubmitRecords(recordsPath)
+            jobRecord = submitRecords[recordsPath].get(jobID)
+            loadedJob = None
+            if jobRecord is None:
+                loadedJob = self.loadJobObject(newJob)
+                if loadedJob is None:
+                    badJobs[71103].append(newJob)
+                    continue
+            jobSource = jobRecord or loadedJob
 
             # figure out possible locations for job
-            possibleLocations = loadedJob["possiblePSN"]
+            possibleLocations = jobSource["possiblePSN"]
 
             # Create another set of locations that may change when a site goes white/black listed
             # Does not care about the non_draining or aborted sites, they may change and that is the point
@@ -325,9 +442,9 @@ class JobSubmitterPoller(BaseWorkerThread):
 
             # check if there is at least one site left to run the job
             if len(possibleLocations) == 0:
-                newJob['fileLocations'] = loadedJob.get('fileLocations', [])
-                newJob['siteWhitelist'] = loadedJob.get('siteWhitelist', [])
-                newJob['siteBlacklist'] = loadedJob.get('siteBlacklist', [])
+                newJob['fileLocations'] = jobSource.get('fileLocations', [])
+                newJob['siteWhitelist'] = jobSource.get('siteWhitelist', [])
+                newJob['siteBlacklist'] = jobSource.get('siteBlacklist', [])
                 badJobs[71101].append(newJob)
                 continue
 
@@ -354,49 +471,63 @@ class JobSubmitterPoller(BaseWorkerThread):
                         badJobs[71104].append(newJob)
                         continue
 
-            # Sigh...make sure the job added to the package has the proper retry_count
-            loadedJob['retry_count'] = newJob['retry_count']
-            batchDir = self.addJobsToPackage(loadedJob)
+            if self.hasJobPackage(jobRecord, newJob['retry_count'], packageDirs):
+                # already in a package written to disk, reuse it
+                batchDir = jobRecord['packageDir']
+            else:
+                if loadedJob is None:
+                    loadedJob = self.loadJobObject(newJob)
+                    if loadedJob is None:
+                        badJobs[71103].append(newJob)
+                        continue
+                # Sigh...make sure the job added to the package has the proper retry_count
+                loadedJob['retry_count'] = newJob['retry_count']
+                batchDir = self.addJobsToPackage(loadedJob)
+                if jobRecord is not None:
+                    newPackages[recordsPath][jobID] = (newJob['retry_count'], batchDir)
 
             # calculate the final job priority such that we can order cached jobs by prio
             jobPrio = newJob['task_prio'] * self.maxTaskPriority + newJob['wf_priority']
-            self.jobsByPrio.setdefault(jobPrio, set())
-            self.jobsByPrio[jobPrio].add(jobID)
 
-            # allow job baggage to override numberOfCores
-            #       => used for repacking to get more slots/disk
-            numberOfCores = loadedJob.get('numberOfCores', 1)
-            if numberOfCores == 1:
-                baggage = loadedJob.getBaggage()
-                numberOfCores = getattr(baggage, "numberOfCores", 1)
-            loadedJob['numberOfCores'] = numberOfCores
+            if jobRecord is not None:
+                # the record has the baggage numberOfCores already
+                numberOfCores = jobRecord.get('numberOfCores', 1)
+            else:
+                # allow job baggage to override numberOfCores
+                #       => used for repacking to get more slots/disk
+                numberOfCores = loadedJob.get('numberOfCores', 1)
+                if numberOfCores == 1:
+                    baggage = loadedJob.getBaggage()
+                    numberOfCores = getattr(baggage, "numberOfCores", 1)
+                loadedJob['numberOfCores'] = numberOfCores
 
             # Create a job dictionary object and put it in the cache (needs to be in sync with RunJob)
             jobInfo = {'taskPriority': newJob['task_prio'],
                        'custom': {'location': None},  # update later
                        'packageDir': batchDir,
                        'retry_count': newJob["retry_count"],
-                       'sandbox': loadedJob["sandbox"],  # remove before submit
-                       'userdn': loadedJob.get("ownerDN", None),
-                       'usergroup': loadedJob.get("ownerGroup", ''),
-                       'userrole': loadedJob.get("ownerRole", ''),
+                       'sandbox': jobSource["sandbox"],  # remove before submit
+                       'userdn': jobSource.get("ownerDN", None),
+                       'usergroup': jobSource.get("ownerGroup", ''),
+                       'userrole': jobSource.get("ownerRole", ''),
                        'possibleSites': frozenset(possibleLocations),  # abort and drain sites filtered out
                        'potentialSites': frozenset(potentialLocations),  # original list of sites
-                       'scramArch': loadedJob.get("scramArch", None),
-                       'swVersion': loadedJob.get("swVersion", []),
-                       'proxyPath': loadedJob.get("proxyPath", None),
-                       'estimatedJobTime': loadedJob.get("estimatedJobTime", None),
-                       'estimatedDiskUsage': loadedJob.get("estimatedDiskUsage", None),
-                       'estimatedMemoryUsage': loadedJob.get("estimatedMemoryUsage", None),
-                       'numberOfCores': loadedJob.get("numberOfCores"),  # may update it later
-                       'inputDataset': loadedJob.get('inputDataset', None),
-                       'inputDatasetLocations': loadedJob.get('inputDatasetLocations', None),
-                       'inputPileup': loadedJob.get('inputPileup', None),
-                       'allowOpportunistic': loadedJob.get('allowOpportunistic', False)}
+                       'scramArch': jobSource.get("scramArch", None),
+                       'swVersion': jobSource.get("swVersion", []),
+                       'proxyPath': jobSource.get("proxyPath", None),
+                       'estimatedJobTime': jobSource.get("estimatedJobTime", None),
+                       'estimatedDiskUsage': jobSource.get("estimatedDiskUsage", None),
+                       'estimatedMemoryUsage': jobSource.get("estimatedMemoryUsage", None),
+                       'numberOfCores': numberOfCores,  # may update it later
+                       'inputDataset': jobSource.get('inputDataset', None),
+                       'inputDatasetLocations': jobSource.get('inputDatasetLocations', None),
+                       'inputPileup': jobSource.get('inputPileup', None),
+                       'allowOpportunistic': jobSource.get('allowOpportunistic', False)}
             # then update it with the info retrieved from the database
             jobInfo.update(newJob)
 
             self.jobDataCache[jobID] = jobInfo
+            self.jobsByPrio.add(jobID, jobPrio, jobInfo['task_type'], jobInfo['possibleSites'])
 
         # Register failures in submission
         for errorCode in badJobs:
@@ -407,6 +538,12 @@ class JobSubmitterPoller(BaseWorkerThread):
         # Persist remaining job packages to disk
         self.flushJobPackages()
 
+        # and keep track of them in the submit records
+        try:
+            updateSubmitPackages(newPackages)
+        except Exception as ex:
+            logging.warning("Failed to record the job packages in the submit records: %s", str(ex))
+
         # We need to remove any jobs from the cache that were not returned in
         # the last call to the database.
         jobIDsToPurge = set(self.jobDataCache.keys()) - newJobIds
@@ -432,11 +569,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         for jobid in jobIDsToPurge:
             self.jobDataCache.pop(jobid, None)
-            for jobPrio in self.jobsByPrio:
-                if jobid in self.jobsByPrio[jobPrio]:
-                    # then the jobid was found, go to the next one
-                    self.jobsByPrio[jobPrio].discard(jobid)
-                    break
+            self.jobsByPrio.discard(jobid)
         return
 
     def _handleSubmitFailedJobs(self, badJobs, exitCode):
@@ -503,7 +636,7 @@ class JobSubmitterPoller(BaseWorkerThread):
         # refresh is needed, for now it forces a full cache refresh
         if newDrainSites != self.drainSites or newAbortSites != self.abortSites:
             logging.info("Draining or Aborted sites have changed, the cache will be rebuilt.")
-            self.jobsByPrio = {}
+            self.jobsByPrio.clear()
             self.jobDataCache = {}
 
         self.currentRcThresholds = rcThresholds
@@ -600,6 +733,18 @@ class JobSubmitterPoller(BaseWorkerThread):
                      "Threshold": totalTaskTheshold}]
         return jobSubmitCondition(jobStats)
 
+    def _getOverflowKey(self, jobPrio, siteName, jobType):
+        """
+        Return whether a job of this priority can overflow the site/task
+        thresholds in _getJobSubmitCondition, None if the thresholds are missing
+        """
+        try:
+            highestPriorityInJobs = self.currentRcThresholds[siteName]['thresholds'][jobType]['wf_highest_priority']
+        except KeyError:
+            return None
+        return not ((highestPriorityInJobs is None) or (jobPrio <= highestPriorityInJobs) or
+                    (jobType in self.ioboundTypes))
+
     def assignJobLocations(self):
         """
         _assignJobLocations_
@@ -613,31 +758,51 @@ class JobSubmitterPoller(BaseWorkerThread):
           - Path to sanbox
           - Path to cache directory
           - SE name of the site to run at
+
+        Jobs are considered from the highest to the lowest priority and by job id,
+        merging the groups of jobs with the same task type and possible sites.
+        The pending and running jobs only increase during the cycle, so a site
+        without slots for a task type (and a given overflow) stays so and isn't
+        checked again, and when a job can't be submitted neither can the rest
+        of its group, which is skipped altogether.
         """
         jobsToSubmit = {}
         jobsCount = 0
         exitLoop = False
         jobSubmitLogBySites = defaultdict(lambda: defaultdict(Counter))
         jobSubmitLogByPriority = defaultdict(lambda: defaultdict(Counter))
+        # key'ed by (site, job type, overflow), the condition of the sites without slots
+        fullSites = {}
+        # key'ed by (job type, sites), the sites with non zero task thresholds
+        nonZeroSites = {}
 
         # iterate over jobs from the highest to the lowest prio
-        for jobPrio in sorted(self.jobsByPrio, reverse=True):
+        for jobPrio in self.jobsByPrio.priorities():
 
             # then we're completely done and have our basket full of jobs to submit
             if exitLoop:
                 break
 
             # can we assume jobid=1 is older than jobid=3? I think so...
-            for jobid in sorted(self.jobsByPrio[jobPrio]):
-                jobType = self.jobDataCache[jobid]['task_type']
-                possibleSites = self.jobDataCache[jobid]['possibleSites']
+            groupHeap = [(jobIds[0], 0, jobType, sites, jobIds)
+                         for jobType, sites, jobIds in self.jobsByPrio.groups(jobPrio)]
+            heapq.heapify(groupHeap)
+            while groupHeap:
+                jobid, position, jobType, sites, jobIds = groupHeap[0]
                 # remove sites with 0 task thresholds
-                possibleSites = self.checkZeroTaskThresholds(jobType, possibleSites)
+                if (jobType, sites) not in nonZeroSites:
+                    nonZeroSites[(jobType, sites)] = self.checkZeroTaskThresholds(jobType, sites)
+                possibleSites = nonZeroSites[(jobType, sites)]
                 jobSubmitLogByPriority[jobPrio][jobType]['Total'] += 1
+                submitted = False
                 # now look for sites with free pending slots
                 for siteName in possibleSites:
-                    condition = self._getJobSubmitCondition(jobPrio, siteName, jobType)
+                    siteKey = (siteName, jobType, self._getOverflowKey(jobPrio, siteName, jobType))
+                    condition = fullSites.get(siteKey)
+                    if condition is None:
+                        condition = self._getJobSubmitCondition(jobPrio, siteName, jobType)
                     if condition != "JobSubmitReady":
+                        fullSites[siteKey] = condition
                         jobSubmitLogBySites[siteName][jobType][condition] += 1
                         logging.debug("Found a job for %s : %s", siteName, condition)
                         continue
@@ -660,9 +825,10 @@ class JobSubmitterPoller(BaseWorkerThread):
                     jobSubmitLogByPriority[jobPrio][jobType]['submitted'] += 1
 
                     # jobs that will be submitted must leave the job data cache
-                    self.jobsByPrio[jobPrio].discard(jobid)
+                    self.jobsByPrio.discard(jobid)
 
                     # found a site to submit this job, so go to the next job
+                    submitted = True
                     break
 
                 # set the flag and get out of the job iteration
@@ -671,6 +837,19 @@ class JobSubmitterPoller(BaseWorkerThread):
                     exitLoop = True
                     break
 
+                position += 1
+                if submitted and position < len(jobIds):
+                    heapq.heapreplace(groupHeap, (jobIds[position], position, jobType, sites, jobIds))
+                    continue
+                heapq.heappop(groupHeap)
+                if not submitted and position < len(jobIds):
+                    # no site left for the rest of the group either
+                    skipped = len(jobIds) - position
+                    jobSubmitLogByPriority[jobPrio][jobType]['Total'] += skipped
+                    for siteName in possibleSites:
+                        siteKey = (siteName, jobType, self._getOverflowKey(jobPrio, siteName, jobType))
+                        jobSubmitLogBySites[siteName][jobType][fullSites[siteKey]] += skipped
+
         logging.info("Site submission report: %s", json.dumps(jobSubmitLogBySites, indent=4))
         logging.info("Priority submission report: %s", json.dumps(jobSubmitLogByPriority, indent=4))
         logging.info("Have %s packages to submit.", len(jobsToSubmit))
@@ -778,6 +957,9 @@ class JobSubmitterPoller(BaseWorkerThread):
 
             jobsToSubmit = self.assignJobLocations()
             self.submitJobs(jobsToSubmit=jobsToSubmit)
+            couchStats = self.changeState.getCouchStats(reset=True)
+            logging.info("Recorded %d state transitions in couch with %d requests in %.2f secs",
+                         couchStats["transitions"], couchStats["requests"], couchStats["time"])
         except WMException:
             if getattr(myThread, 'transaction', None) is not None:
                 myThread.transaction.rollback()
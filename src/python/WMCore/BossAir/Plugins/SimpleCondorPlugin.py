@@ -538,7 +538,8 @@ class SimpleCondorPlugin(BasePlugin):
                                                    'JobPackage.pkl', self.unpacker)
             ad['Arguments'] = "%s %i" % (os.path.basename(job['sandbox']), job['id'])
 
-            ad['TransferOutput'] = "Report.%i.pkl,wmagentJob.log" % job["retry_count"]
+            ad['TransferOutput'] = "Report.%i.pkl,Report.%i.summary.json,wmagentJob.log" % (job["retry_count"],
+                                                                                            job["retry_count"])
 
             # Do not define Requirements and X509 ads for Volunteer resources
             if self.reqStr and "T3_CH_Volunteer" not in job.get('possibleSites'):
@@ -3,42 +3,159 @@ A basic action is a thing that will run a SQL statement
 
 A more complex one would be something that ran multiple SQL
 objects to produce a single output.
+
+The DAO classes are resolved once per process and kept in a registry keyed by
+(package, dialect, classname), so creating a DAO in a per job or per file path
+doesn't import the module again. A DAOFactory created with cacheInstances=True
+also reuses the DAO instances per dbinterface, which is only safe for DAOs
+that don't keep any state between execute calls.
 """
+
+import threading
+
+# (package, dialect, classname) -> DAO class
+_daoClasses = {}
+# dbinterface -> {(package, dialect, classname, logger, owner): DAO instance}
+# the DAOs hold a reference to their dbinterface anyway, those live as long
+# as the process does
+_daoInstances = {}
+# WMCore dialect name -> SQLAlchemy dialect class
+_dialects = {}
+# SQLAlchemy dialect class -> WMCore dialect name
+_dialectNames = {}
+_daoStats = {"classHits": 0, "classMisses": 0, "instanceHits": 0, "instanceMisses": 0}
+_daoLock = threading.Lock()
+
+
+def getDAOCacheStats():
+    """
+    _getDAOCacheStats_
+
+    Return a copy of the DAO registry counters: how many class resolutions
+    were served from the registry (classHits) or had to import the module
+    (classMisses), and the same for cached instances.
+    """
+    with _daoLock:
+        stats = dict(_daoStats)
+    stats["classes"] = len(_daoClasses)
+    return stats
+
+
+def clearDAOCache():
+    """
+    _clearDAOCache_
+
+    Empty the DAO registry and reset its counters.
+    """
+    with _daoLock:
+        _daoClasses.clear()
+        _daoInstances.clear()
+        _dialectNames.clear()
+        for key in _daoStats:
+            _daoStats[key] = 0
+    return
+
+
 class DAOFactory(object):
-    def __init__(self, package='WMCore', logger=None, dbinterface=None, owner=""):
+    def __init__(self, package='WMCore', logger=None, dbinterface=None, owner="",
+                 cacheInstances=False):
         self.package = package
         self.logger = logger
         self.dbinterface = dbinterface
         self.owner = owner
+        self.cacheInstances = cacheInstances and not isinstance(dbinterface, str)
         #self.logger.debug("Instantiating DAOFactory for %s package" % self.package)
-        from WMCore.Database.Dialects import MySQLDialect
-        from WMCore.Database.Dialects import OracleDialect
-        self.dialects = {"Oracle" : OracleDialect,
-                    "MySQL" : MySQLDialect,}
+        if not _dialects:
+            from WMCore.Database.Dialects import MySQLDialect
+            from WMCore.Database.Dialects import OracleDialect
+            _dialects.update({"Oracle" : OracleDialect,
+                              "MySQL" : MySQLDialect,})
+        self.dialects = _dialects
 
-    def __call__(self, classname):
+    def dialect(self):
         """
-        Somewhat fugly method to load generic SQL classes...
+        _dialect_
+
+        Name of the dialect the DAOs are loaded for.
         """
-        if not isinstance(self.dbinterface, str):
+        if isinstance(self.dbinterface, str):
+            return 'CouchDB'
 
-            dia = self.dbinterface.engine.dialect
-            #TODO: Make good
-            dialect = None
-            for i in self.dialects.keys():
-                if isinstance(dia, self.dialects[i]):
-                    dialect = i
-            if not dialect:
-                raise TypeError("unknown connection type: %s" % dia)
-        else:
-            dialect = 'CouchDB'
+        dia = self.dbinterface.engine.dialect
+        dialect = _dialectNames.get(dia.__class__)
+        if dialect:
+            return dialect
 
+        #TODO: Make good
+        for i in self.dialects.keys():
+            if isinstance(dia, self.dialects[i]):
+                dialect = i
+        if not dialect:
+            raise TypeError("unknown connection type: %s" % dia)
+        _dialectNames[dia.__class__] = dialect
+        return dialect
 
-        module = "%s.%s.%s" % (self.package, dialect, classname)
+    def loadClass(self, classname, dialect=None):
+        """
+        _loadClass_
+
+        Return the DAO class for classname, importing its module only the
+        first time it is asked for in this process.
+        """
+        key = (self.package, dialect or self.dialect(), classname)
+        with _daoLock:
+            instance = _daoClasses.get(key)
+            if instance is not None:
+                _daoStats["classHits"] += 1
+                return instance
+
+        module = "%s.%s.%s" % key
         #self.logger.debug("importing %s, %s" % (module, classname))
         module = __import__(module, globals(), locals(), [classname])#, -1)
         instance = getattr(module, classname.split('.')[-1])
+        with _daoLock:
+            _daoStats["classMisses"] += 1
+            _daoClasses[key] = instance
+        return instance
+
+    def preload(self, classnames):
+        """
+        _preload_
+
+        Resolve a list of DAO class names, to be called at component startup
+        with every DAO the component needs so no module is imported while it
+        is polling. Returns the number of classes that had to be imported.
+        """
+        dialect = self.dialect()
+        loaded = 0
+        for classname in classnames:
+            if (self.package, dialect, classname) not in _daoClasses:
+                self.loadClass(classname, dialect)
+                loaded += 1
+        return loaded
+
+    def __call__(self, classname):
+        """
+        Somewhat fugly method to load generic SQL classes...
+        """
+        dialect = self.dialect()
+        if self.cacheInstances:
+            key = (self.package, dialect, classname, self.logger, self.owner)
+            with _daoLock:
+                daos = _daoInstances.setdefault(self.dbinterface, {})
+                dao = daos.get(key)
+                if dao is not None:
+                    _daoStats["instanceHits"] += 1
+                    return dao
+
+        instance = self.loadClass(classname, dialect)
         if self.owner:
-            return instance(self.logger, self.dbinterface, self.owner)
+            dao = instance(self.logger, self.dbinterface, self.owner)
         else:
-            return instance(self.logger, self.dbinterface)
+            dao = instance(self.logger, self.dbinterface)
+
+        if self.cacheInstances:
+            with _daoLock:
+                _daoStats["instanceMisses"] += 1
+                daos[key] = dao
+        return dao
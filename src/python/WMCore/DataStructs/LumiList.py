@@ -13,12 +13,99 @@ This code began life in COMP/CRAB/python/LumiList.py
 """
 
 
-import copy
+import bisect
 import itertools
 import json
 import re
 import urllib2
 
+
+def _mergeRanges(ranges):
+    """
+    Sort a list of [first, last] lumi ranges and merge the overlapping
+    or contiguous ones. Returns a new list, the input is left untouched.
+    """
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1][1] = last
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def _intersectRanges(aRanges, bRanges):
+    """
+    Intersect two sorted, compacted lists of [first, last] lumi ranges
+    with a single linear sweep over both of them.
+    """
+    result = []
+    aIdx, bIdx = 0, 0
+    while aIdx < len(aRanges) and bIdx < len(bRanges):
+        first = max(aRanges[aIdx][0], bRanges[bIdx][0])
+        last = min(aRanges[aIdx][1], bRanges[bIdx][1])
+        if first <= last:
+            if result and first == result[-1][1] + 1:
+                result[-1][1] = last
+            else:
+                result.append([first, last])
+        # advance whichever range finishes first
+        if aRanges[aIdx][1] < bRanges[bIdx][1]:
+            aIdx += 1
+        else:
+            bIdx += 1
+    return result
+
+
+def _subtractRanges(aRanges, bRanges):
+    """
+    Remove from the sorted, compacted list of [first, last] lumi ranges
+    aRanges everything covered by bRanges, in a single linear sweep.
+    """
+    result = []
+    bIdx = 0
+    for first, last in aRanges:
+        # skip the ranges of b that end before this one starts
+        while bIdx < len(bRanges) and bRanges[bIdx][1] < first:
+            bIdx += 1
+        idx = bIdx
+        while idx < len(bRanges) and bRanges[idx][0] <= last:
+            if bRanges[idx][0] > first:
+                result.append([first, bRanges[idx][0] - 1])
+            first = bRanges[idx][1] + 1
+            if first > last:
+                break
+            idx += 1
+        if first <= last:
+            result.append([first, last])
+    return result
+
+
+def _rangeIndex(ranges, openEnded=False):
+    """
+    Build the lookup structure used for lumi membership checks: the sorted
+    list of range starts, the matching list of range ends and, if openEnded
+    is set, the lowest start of any range with end == 0 (which means it
+    extends up to the end of the run).
+    """
+    starts = [lumiRange[0] for lumiRange in ranges]
+    ends = [lumiRange[1] for lumiRange in ranges]
+    openStarts = [lumiRange[0] for lumiRange in ranges if openEnded and lumiRange[1] == 0]
+    return starts, ends, min(openStarts) if openStarts else None
+
+
+def _inRangeIndex(index, lumi):
+    """
+    Check whether a lumi is covered by a range index built by _rangeIndex
+    """
+    starts, ends, openStart = index
+    if openStart is not None and lumi >= openStart:
+        return True
+    pos = bisect.bisect_right(starts, lumi) - 1
+    return pos >= 0 and lumi <= ends[pos]
+
+
 class LumiList(object):
     """
     Deal with lists of lumis in several different forms:
@@ -54,6 +141,9 @@ class LumiList(object):
         """
         self.compactList = {}
         self.duplicates = {}
+        # per run lookup structures used by contains(), rebuilt whenever
+        # the list of ranges of a run gets replaced
+        self._indexCache = {}
         if filename:
             self.filename = filename
             jsonFile = open(self.filename,'r')
@@ -148,27 +238,7 @@ class LumiList(object):
     def __sub__(self, other): # Things from self not in other
         result = {}
         for run in sorted(self.compactList.keys()):
-            alumis = sorted(self.compactList[run])
-            blumis = sorted(other.compactList.get(run, []))
-            alist = []                    # verified part
-            for alumi in alumis:
-                tmplist = [alumi[0], alumi[1]] # may be part
-                for blumi in blumis:
-                    if blumi[0] <= tmplist[0] and blumi[1] >= tmplist[1]: # blumi has all of alumi
-                        tmplist = []
-                        break # blumi is has all of alumi
-                    if blumi[0] > tmplist[0] and blumi[1] < tmplist[1]: # blumi is part of alumi
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] <= tmplist[0] and blumi[1] < tmplist[1] and blumi[1]>=tmplist[0]: # overlaps start
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] > tmplist[0] and blumi[1] >= tmplist[1] and blumi[0]<=tmplist[1]: # overlaps end
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = []
-                        break
-                if tmplist:
-                    alist.append(tmplist)
-            result[run] = alist
+            result[run] = _subtractRanges(self.compactList[run], other.compactList.get(run, []))
 
         return LumiList(compactList = result)
 
@@ -178,46 +248,15 @@ class LumiList(object):
         aruns = set(self.compactList.keys())
         bruns = set(other.compactList.keys())
         for run in aruns & bruns:
-            lumiList = []                    # List for this run
-            unique = []                    # List for this run
-            for alumi in self.compactList[run]:
-                for blumi in other.compactList[run]:
-                    if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]: # blumi has all of alumi
-                        lumiList.append(alumi)
-                    if blumi[0] > alumi[0] and blumi[1] < alumi[1]: # blumi is part of alumi
-                        lumiList.append(blumi)
-                    elif blumi[0] <= alumi[0] and blumi[1] < alumi[1] and blumi[1] >= alumi[0]: # overlaps start
-                        lumiList.append([alumi[0], blumi[1]])
-                    elif blumi[0] > alumi[0] and blumi[1] >= alumi[1] and blumi[0] <= alumi[1]: # overlaps end
-                        lumiList.append([blumi[0], alumi[1]])
-
-
-            if lumiList:
-                unique = [lumiList[0]]
-            for pair in lumiList[1:]:
-                if pair[0] == unique[-1][1]+1:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                else:
-                    unique.append(copy.deepcopy(pair))
-
-            result[run] = unique
+            result[run] = _intersectRanges(self.compactList[run], other.compactList[run])
         return LumiList(compactList = result)
 
 
     def __or__(self, other):
         result = {}
-        aruns = self.compactList.keys()
-        bruns = other.compactList.keys()
-        runs = set(aruns + bruns)
+        runs = set(self.compactList.keys()) | set(other.compactList.keys())
         for run in runs:
-            overlap = sorted(self.compactList.get(run, []) + other.compactList.get(run, []))
-            unique = [overlap[0]]
-            for pair in overlap[1:]:
-                if pair[0] >= unique[-1][0] and pair[0] <= unique[-1][1]+1 and pair[1] > unique[-1][1]:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                elif pair[0] > unique[-1][1]:
-                    unique.append(copy.deepcopy(pair))
-            result[run] = unique
+            result[run] = _mergeRanges(self.compactList.get(run, []) + other.compactList.get(run, []))
         return LumiList(compactList = result)
 
 
@@ -236,12 +275,12 @@ class LumiList(object):
         [(run1,lumi1),(run1,lumi2),(run2,lumi1)]
         """
         filteredList = []
+        indexes = {}
         for (run, lumi) in lumiList:
-            runsInLumi = self.compactList.get(str(run), [[0, -1]])
-            for (first, last) in runsInLumi:
-                if lumi >= first and lumi <= last:
-                    filteredList.append((run, lumi))
-                    break
+            if run not in indexes:
+                indexes[run] = _rangeIndex(self.compactList.get(str(run), []))
+            if _inRangeIndex(indexes[run], lumi):
+                filteredList.append((run, lumi))
         return filteredList
 
 
@@ -389,17 +428,14 @@ class LumiList(object):
         if not lumiRangeList:
             # the run isn't there, so no need to look any further
             return False
-        for lumiRange in lumiRangeList:
-            # we want to make this as found if either the lumiSection
-            # is inside the range OR if the lumi section is greater
-            # than or equal to the lower bound of the lumi range and
-            # the upper bound is 0 (which means extends to the end of
-            # the run)
-            if lumiRange[0] <= lumiSection and \
-               (0 == lumiRange[1] or lumiSection <= lumiRange[1]):
-                # got it
-                return True
-        return False
+        # a lumi section is found if it is either inside one of the ranges
+        # OR greater than or equal to the lower bound of a range whose
+        # upper bound is 0 (which means extends to the end of the run)
+        index = self._indexCache.get(str(run))
+        if index is None or index[0] is not lumiRangeList or index[1] != len(lumiRangeList):
+            index = (lumiRangeList, len(lumiRangeList), _rangeIndex(lumiRangeList, openEnded=True))
+            self._indexCache[str(run)] = index
+        return _inRangeIndex(index[2], lumiSection)
 
 
     def __contains__ (self, runTuple):
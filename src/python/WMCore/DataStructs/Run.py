@@ -8,20 +8,44 @@ container representing a run, and its constituent lumi sections and event counts
 
 from __future__ import print_function
 
-from WMCore.DataStructs.WMObject import WMObject
+import bisect
+from array import array
 
+# event count stored for lumis without event information (None)
+_NO_EVENTS = -1
 
-class Run(WMObject):
+
+def _packEvents(events):
+    """
+    Convert an event count to the value stored in the events array
+    """
+    return _NO_EVENTS if events is None else int(events)
+
+
+def _unpackEvents(events):
+    """
+    Convert a value stored in the events array back to an event count
+    """
+    return None if events == _NO_EVENTS else events
+
+
+class Run(object):
     """
     _Run_
 
     Run container, is a list of lumi sections with associate event counts
+
+    Lumis are kept in a sorted array with a parallel array of event counts,
+    so indexed access is O(1), lumi lookup is O(log n) and comparisons do
+    not need to sort anything.
     """
 
+    __slots__ = ('run', '_lumis', '_events')
+
     def __init__(self, runNumber=None, *newLumis):
-        WMObject.__init__(self)
         self.run = runNumber
-        self.eventsPerLumi = {}
+        self._lumis = array('i')
+        self._events = array('l')
         self.extendLumis(newLumis)
 
     def __str__(self):
@@ -31,21 +55,13 @@ class Run(WMObject):
         """
         Compare on run # first, then by lumis as a list is compared
         """
-        if self.run != rhs.run:
-            return self.run < rhs.run
-        if sorted(self.eventsPerLumi.keys()) != sorted(rhs.eventsPerLumi.keys()):
-            return sorted(self.eventsPerLumi.keys()) < sorted(rhs.eventsPerLumi.keys())
-        return self.eventsPerLumi < rhs.eventsPerLumi
+        return (self.run, self._lumis, self._events) < (rhs.run, rhs._lumis, rhs._events)
 
     def __gt__(self, rhs):
         """
         Compare on run # first, then by lumis as a list is compared
         """
-        if self.run != rhs.run:
-            return self.run > rhs.run
-        if sorted(self.eventsPerLumi.keys()) != sorted(rhs.eventsPerLumi.keys()):
-            return sorted(self.eventsPerLumi.keys()) > sorted(rhs.eventsPerLumi.keys())
-        return self.eventsPerLumi > rhs.eventsPerLumi
+        return (self.run, self._lumis, self._events) > (rhs.run, rhs._lumis, rhs._events)
 
     def extend(self, items):
         """
@@ -66,15 +82,11 @@ class Run(WMObject):
             msg += "Run %s does not equal Run %s" % (self.run, rhs.run)
             raise RuntimeError(msg)
 
-        for lumi, events in rhs.eventsPerLumi.iteritems():
-            if lumi not in self.eventsPerLumi or not self.eventsPerLumi[lumi]:  # Either doesn't exist, 0, or None
-                self.eventsPerLumi[lumi] = events
-            else:
-                self.eventsPerLumi[lumi] += events
+        self._update([(lumi, _unpackEvents(events), True) for lumi, events in zip(rhs._lumis, rhs._events)])
         return self
 
     def __iter__(self):
-        return self.eventsPerLumi.__iter__()
+        return self._lumis.__iter__()
 
     def __next__(self):
         """
@@ -86,41 +98,39 @@ class Run(WMObject):
         """
         Number of lumis
         """
-        return self.eventsPerLumi.__len__()
+        return self._lumis.__len__()
 
     def __getitem__(self, key):
         """
         Get the nth lumi from the list (no event count)
         """
-        return sorted(self.eventsPerLumi.keys()).__getitem__(key)
+        if isinstance(key, slice):
+            return self._lumis[key].tolist()
+        return self._lumis[key]
 
     def __setitem__(self, key, lumi):
         """
         Replace the nth lumi from the list (no event count)
         """
-        try:
-            oldLumi = sorted(self.eventsPerLumi.keys())[key]  # Extract the lumi from the sorted list
-            del self.eventsPerLumi[oldLumi]  # Delete it and add the new one
-        except IndexError:
-            pass
+        self.__delitem__(key)
         self.appendLumi(lumi)
 
     def __delitem__(self, key):
         try:
-            oldLumi = sorted(self.eventsPerLumi.keys())[key]  # Extract the lumi from the sorted list
-            del self.eventsPerLumi[oldLumi]  # Delete it
+            del self._lumis[key]
+            del self._events[key]
         except IndexError:
             pass
 
     def __eq__(self, rhs):
         """
-        Check equality of run numbers and then underlying lumi/event dicts
+        Check equality of run numbers and then underlying lumi/event arrays
         """
         if not isinstance(rhs, Run):
             return False
         if self.run != rhs.run:
             return False
-        return self.eventsPerLumi == rhs.eventsPerLumi
+        return self._lumis == rhs._lumis and self._events == rhs._events
 
     def __ne__(self, rhs):
         return not self.__eq__(rhs)
@@ -129,67 +139,121 @@ class Run(WMObject):
         """
         Calculate the value of the hash
         """
-        value = self.run.__hash__()
-        value += hash(frozenset(self.eventsPerLumi.items()))  # Hash that represents the dictionary
-        return value
+        return hash((self.run, tuple(self._lumis), tuple(self._events)))
+
+    def __getstate__(self):
+        """
+        Pickle the same run number and lumi/event dict that older versions stored
+        """
+        return {'run': self.run, 'eventsPerLumi': self.eventsPerLumi}
+
+    def __setstate__(self, state):
+        """
+        Restore from __getstate__, also accepting the __dict__ of older versions
+        """
+        self.run = state['run']
+        self.eventsPerLumi = state['eventsPerLumi']
+
+    def _find(self, lumi):
+        """
+        Return the position of the lumi in the sorted lumi array and
+        whether it is already there
+        """
+        pos = bisect.bisect_left(self._lumis, lumi)
+        return pos, pos < len(self._lumis) and self._lumis[pos] == lumi
+
+    def _update(self, updates):
+        """
+        Apply a list of (lumi, events, accumulate) updates and rebuild the arrays
+        once. With accumulate set, events are added to a lumi that already has
+        events, otherwise they replace the current count.
+        """
+        if not updates:
+            return
+        current = dict(zip(self._lumis, self._events))
+        for lumi, events, accumulate in updates:
+            lumi = int(lumi)
+            if accumulate and current.get(lumi, _NO_EVENTS) not in (_NO_EVENTS, 0):
+                if events:
+                    current[lumi] += int(events)
+            else:  # Doesn't exist, is 0 or None or gets overwritten
+                current[lumi] = _packEvents(events)
+        lumis = sorted(current)
+        self._lumis = array('i', lumis)
+        self._events = array('l', [current[lumi] for lumi in lumis])
+
+    @property
+    def eventsPerLumi(self):
+        """
+        Dictionary of lumi numbers to event counts. This is a copy, use the
+        setter or the lumi methods to modify the run.
+        """
+        return dict(zip(self._lumis, [_unpackEvents(events) for events in self._events]))
+
+    @eventsPerLumi.setter
+    def eventsPerLumi(self, eventsPerLumi):
+        """
+        Replace the lumis and event counts with the ones in a dictionary
+        """
+        lumis = sorted(eventsPerLumi)
+        self._lumis = array('i', [int(lumi) for lumi in lumis])
+        self._events = array('l', [_packEvents(eventsPerLumi[lumi]) for lumi in lumis])
 
     @property
     def lumis(self):
         """
         Property that makes existing uses of myRun.lumis function by returning a list
         """
-        return sorted(self.eventsPerLumi.keys())
+        return self._lumis.tolist()
 
     @lumis.setter
     def lumis(self, lumiList):
         """
         Setter to allow for replacement of the lumis with a list or list of tuples
         """
-        self.eventsPerLumi = {}  # Remove existing dictionary
-        for lumi in lumiList:
-            if isinstance(lumi, (list, tuple)):
-                self.eventsPerLumi[lumi[0]] = lumi[1]
-            else:
-                self.eventsPerLumi[lumi] = None
+        self._lumis = array('i')  # Remove existing lumis
+        self._events = array('l')
+        self._update([(lumi[0], lumi[1], False) if isinstance(lumi, (list, tuple)) else (lumi, None, False)
+                      for lumi in lumiList])
 
     def extendLumis(self, lumiList):
         """
         Method to replace myRun.lumis.extend() which does not work with the property
         """
+        updates = []
         for lumi in lumiList:
             if not isinstance(lumi, (list, tuple)):  # comma separated lumi numbers
-                self.eventsPerLumi[lumi] = None
+                updates.append((lumi, None, False))
             else:
                 if isinstance(lumi, list) and not isinstance(lumi[0], tuple):  # then it's a plain list
                     for l in lumi:
-                        self.eventsPerLumi[l] = None
+                        updates.append((l, None, False))
                 else:
                     if isinstance(lumi, tuple):  # it's an unpacked list of tuples
                         lumi = [(lumi)]
                     # it's a list/tuple of tuples
                     for tp in lumi:
-                        if tp[0] in self.eventsPerLumi and self.eventsPerLumi[tp[0]]:
-                            self.eventsPerLumi[tp[0]] += tp[1]  # Already exists, add events
-                        else:  # Doesn't exist or is 0 or None
-                            self.eventsPerLumi[tp[0]] = tp[1]
+                        updates.append((tp[0], tp[1], True))
+        self._update(updates)
 
     def appendLumi(self, lumi):
         """
         Method to replace myRun.lumis.append() which does not work with the property
         """
-        if isinstance(lumi, (list, tuple)) and self.eventsPerLumi[lumi[0]]:  # Already exists, add events
-            self.eventsPerLumi[lumi[0]] += lumi[1]
-        elif isinstance(lumi, (list, tuple)):  # Doesn't exist or is 0 or None
-            self.eventsPerLumi[lumi[0]] = lumi[1]
+        if isinstance(lumi, (list, tuple)):
+            self._update([(lumi[0], lumi[1], True)])
         else:  # Just given lumis, not events
-            if lumi not in self.eventsPerLumi:  # Don't overwrite existing events
-                self.eventsPerLumi[lumi] = None
+            pos, found = self._find(int(lumi))
+            if not found:  # Don't overwrite existing events
+                self._lumis.insert(pos, int(lumi))
+                self._events.insert(pos, _NO_EVENTS)
 
     def getEventsByLumi(self, lumi):
         """
         getter to select event counts by given lumi
         """
-        return self.eventsPerLumi.get(lumi)
+        pos, found = self._find(lumi)
+        return _unpackEvents(self._events[pos]) if found else None
 
     def json(self):
         """
@@ -217,8 +281,6 @@ class Run(WMObject):
         Convert JSON data back into a Run object with integer lumi numbers
         """
         self.run = jsondata["Run"]
-        self.eventsPerLumi = {}
-        for lumi, events in jsondata["Lumis"].iteritems():
-            self.eventsPerLumi[int(lumi)] = events  # Make the keys integers again
+        self.eventsPerLumi = dict((int(lumi), events) for lumi, events in jsondata["Lumis"].iteritems())
 
         return self
@@ -10,6 +10,9 @@ NOT A THREAD SAFE CLASS.
 """
 from __future__ import print_function, division
 
+import Queue
+import atexit
+import threading
 import time
 import urllib
 import re
@@ -83,14 +86,19 @@ class CouchDBRequests(JSONRequests):
     completeness, and talks to the CouchDB port
     """
 
-    def __init__(self, url='http://localhost:5984', usePYCurl=False, ckey=None, cert=None, capath=None):
+    def __init__(self, url='http://localhost:5984', usePYCurl=False, ckey=None, cert=None, capath=None,
+                 poolSize=10, poolTimeout=60):
         """
-        Initialise requests
+        Initialise requests, with pycurl up to poolSize idle curl handles
+        (and their connections) per host are kept for poolTimeout seconds
         """
         JSONRequests.__init__(self, url,
-                              {"cachepath": None, "pycurl": usePYCurl, "key": ckey, "cert": cert, "capath": capath})
+                              {"cachepath": None, "pycurl": usePYCurl, "key": ckey, "cert": cert, "capath": capath,
+                               "pycurl_pool_size": poolSize, "pycurl_pool_timeout": poolTimeout})
         self.accept_type = "application/json"
         self["timeout"] = 600
+        # number of requests made, for clients that want to monitor them
+        self.requestCount = 0
 
     def move(self, uri=None, data=None):
         """
@@ -112,6 +120,7 @@ class CouchDBRequests(JSONRequests):
 
         TODO: set caching in the calling methods.
         """
+        self.requestCount += 1
         try:
             if not cache:
                 incoming_headers.update({'Cache-Control': 'no-cache'})
@@ -178,6 +187,88 @@ class Database(CouchDBRequests):
         self._queue_size = size
         self.threads = []
         self.last_seq = 0
+        # to open another connection to the database for the async committer
+        self._connectArgs = (dbname, url, size, ckey, cert)
+        self._committer = None
+
+    def enableAsyncCommit(self, maxPendingCommits=10):
+        """
+        _enableAsyncCommit_
+
+        Opt in to asynchronous commits: from now on the batches of queued
+        documents are committed by a background thread with its own connection
+        to the database, see AsyncCommitter. At most maxPendingCommits batches
+        wait to be committed, queueing more documents blocks until one is done.
+        """
+        if self._committer is None:
+            dbname, url, size, ckey, cert = self._connectArgs
+            database = Database(dbname, url, size, ckey, cert)
+            database.additionalHeaders = dict(self.additionalHeaders)
+            self._committer = AsyncCommitter(database, maxPendingCommits)
+            self._committer.start()
+        return
+
+    def disableAsyncCommit(self):
+        """
+        _disableAsyncCommit_
+
+        Wait for the pending asynchronous commits and stop the background
+        thread, the following commits are done by the caller again.
+        """
+        if self._committer is not None:
+            committer = self._committer
+            self._committer = None
+            committer.stop()
+            committer.raiseErrors()
+        return
+
+    def asyncCommitStats(self):
+        """
+        _asyncCommitStats_
+
+        Return the counters of the asynchronous committer, None if asynchronous
+        commits are not enabled
+        """
+        if self._committer is None:
+            return None
+        return self._committer.getStats()
+
+    def flush(self):
+        """
+        _flush_
+
+        Hand the queued documents to the asynchronous committer and wait until
+        all of them are committed. Raises the first error of the asynchronous
+        commits done since the last flush, if any. Does a plain commit if
+        asynchronous commits are not enabled.
+        """
+        if self._committer is None:
+            self.commit()
+            return
+        if self._queue:
+            self._committer.submit(self._queue)
+            self._reset_queue()
+        self._committer.wait()
+        self._committer.raiseErrors()
+        return
+
+    def commitAsync(self, timestamp=False, viewlist=[], callback=None):
+        """
+        _commitAsync_
+
+        Hand the queued documents to the asynchronous committer and return
+        without waiting for them to be committed, the callback is called for
+        the conflicts from the committer thread (see commit). Does a plain
+        commit if asynchronous commits are not enabled.
+        """
+        if self._committer is None:
+            return self.commit(timestamp=timestamp, viewlist=viewlist, callback=callback)
+        if self._queue:
+            if timestamp:
+                self.timestamp(self._queue, timestamp)
+            self._committer.submit(self._queue, viewlist, callback)
+            self._reset_queue()
+        return
 
     def _reset_queue(self):
         """
@@ -211,10 +302,12 @@ class Database(CouchDBRequests):
         """
         if timestamp:
             self.timestamp(doc, timestamp)
-        # TODO: Thread this off so that it's non blocking...
         if len(self._queue) >= self._queue_size:
             print('queue larger than %s records, committing' % self._queue_size)
-            self.commit(viewlist=viewlist, callback=callback)
+            if self._committer is not None:
+                self.commitAsync(viewlist=viewlist, callback=callback)
+            else:
+                self.commit(viewlist=viewlist, callback=callback)
         self._queue.append(doc)
 
     def queueDelete(self, doc):
@@ -269,12 +362,15 @@ class Database(CouchDBRequests):
         if doc:
             self.queue(doc, timestamp, viewlist)
 
+        if self._committer is not None:
+            # keep the order of the commits
+            self._committer.wait()
+
         if len(self._queue) == 0:
             return
 
         if timestamp:
             self.timestamp(self._queue, timestamp)
-        # TODO: commit in thread to avoid blocking others
         uri = '/%s/_bulk_docs/' % self.name
 
         data['docs'] = list(self._queue)
@@ -385,6 +481,59 @@ class Database(CouchDBRequests):
             self.updateBulkDocumentsWithConflictHandle(conflictDocIDs, updateParams, maxConflictLimit=maxConflictLimit - 1)
         return []
 
+    def updateBulkDocumentsWithFunction(self, updates, updateLimits=1000, maxConflictLimit=10):
+        """
+        Apply client side updates to a set of documents with bulk requests.
+
+        param: updates: dictionary from couch doc id to a function that gets the
+               current document (None if it doesn't exist) and returns the document
+               to save, or None to leave it as it is. Documents whose function
+               raises are logged and reported as failed.
+        param: updateLimits: number of documents read and written in one request
+        param: maxConflictLimit: number of times the documents that conflicted are
+               read again and updated before giving up on them
+
+        Returns a dictionary with the updated documents (with their new revision)
+        by id, the ids that couldn't be updated and the number of conflicts hit.
+        """
+        uri = '/%s/_bulk_docs/' % self.name
+        result = {"updated": {}, "failed": [], "conflicts": 0}
+        docIDs = list(updates)
+        for attempt in range(maxConflictLimit + 1):
+            conflictDocIDs = []
+            for ids in grouper(docIDs, updateLimits):
+                rows = self.allDocs(options={"include_docs": True}, keys=ids)['rows']
+                docs = []
+                for row in rows:
+                    try:
+                        doc = updates[row['key']](row.get('doc'))
+                    except Exception as ex:
+                        logging.error("Failed to update document %s: %s", row['key'], str(ex))
+                        result["failed"].append(row['key'])
+                        continue
+                    if doc is not None:
+                        docs.append(doc)
+                if not docs:
+                    continue
+
+                retval = self.post(uri, {'docs': docs})
+                for doc, status in zip(docs, retval):
+                    if status.get('error', None) == 'conflict':
+                        conflictDocIDs.append(status['id'])
+                    elif 'error' in status:
+                        result["failed"].append(status['id'])
+                    else:
+                        doc['_rev'] = status['rev']
+                        result["updated"][status['id']] = doc
+
+            result["conflicts"] += len(conflictDocIDs)
+            if not conflictDocIDs:
+                break
+            docIDs = conflictDocIDs
+        else:
+            result["failed"].extend(conflictDocIDs)
+        return result
+
     def putDocument(self, doc_id, fields):
         """
         Call the update function update_func defined in the design document
@@ -454,25 +603,33 @@ class Database(CouchDBRequests):
                 time.sleep(blocking_poll)
         return response
 
-    def changes(self, since=-1):
+    def changes(self, since=-1, includeDocs=False):
         """
         Get the changes since sequence number. Store the last sequence value to
         self.last_seq. If the since is negative use self.last_seq.
+        If includeDocs is True the changed documents are returned in the rows.
         """
         if since < 0:
             since = self.last_seq
-        data = self.get('/%s/_changes/?since=%s' % (self.name, since))
+        uri = '/%s/_changes/?since=%s' % (self.name, since)
+        if includeDocs:
+            uri += '&include_docs=true'
+        data = self.get(uri)
         self.last_seq = data['last_seq']
         return data
 
-    def changesWithFilter(self, filter, limit=1000, since=-1):
+    def changesWithFilter(self, filter, limit=1000, since=-1, includeDocs=False):
         """
         Get the changes since sequence number. Store the last sequence value to
         self.last_seq. If the since is negative use self.last_seq.
+        If includeDocs is True the changed documents are returned in the rows.
         """
         if since < 0:
             since = self.last_seq
-        data = self.get('/%s/_changes?limit=%s&since=%s&filter=%s' % (self.name, limit, since, filter))
+        uri = '/%s/_changes?limit=%s&since=%s&filter=%s' % (self.name, limit, since, filter)
+        if includeDocs:
+            uri += '&include_docs=true'
+        data = self.get(uri)
         self.last_seq = data['last_seq']
         return data
 
@@ -666,6 +823,123 @@ class Database(CouchDBRequests):
         return self.commit()
 
 
+class AsyncCommitter(threading.Thread):
+    """
+    _AsyncCommitter_
+
+    Background thread doing the bulk commits of a Database that opted in to
+    asynchronous commits. The batches wait in a bounded queue, submitting a
+    batch when it is full blocks the caller until a commit is done. Conflict
+    callbacks are called from this thread, with the committer own Database
+    object. The committers still running when the process exits commit their
+    pending batches first.
+    """
+
+    def __init__(self, database, maxPendingCommits=10):
+        threading.Thread.__init__(self, name="AsyncCommitter-%s" % database.name)
+        self.daemon = True
+        self.database = database
+        self.batches = Queue.Queue(maxPendingCommits)
+        self.errors = []
+        self._lock = threading.Lock()
+        self._stats = {"commits": 0, "docs": 0, "conflicts": 0, "failed": 0,
+                       "commitTime": 0.0, "blockedTime": 0.0, "maxDepth": 0}
+        atexit.register(self.stop)
+
+    def submit(self, docs, viewlist=[], callback=None):
+        """
+        Queue a batch of documents to be committed
+        """
+        startTime = time.time()
+        self.batches.put((docs, viewlist, callback))
+        with self._lock:
+            self._stats["blockedTime"] += time.time() - startTime
+            self._stats["maxDepth"] = max(self._stats["maxDepth"], self.batches.qsize())
+        return
+
+    def wait(self):
+        """
+        Wait until all the submitted batches are committed
+        """
+        self.batches.join()
+        return
+
+    def stop(self):
+        """
+        Commit the pending batches and stop the thread
+        """
+        if self.is_alive():
+            self.batches.put(None)
+            self.join()
+        return
+
+    def raiseErrors(self):
+        """
+        Raise the first error of the commits done since the last call
+        """
+        with self._lock:
+            errors = self.errors
+            self.errors = []
+        if errors:
+            raise errors[0]
+        return
+
+    def getStats(self):
+        """
+        Return the number of commits done, documents committed, conflicts and
+        commits that failed, the time spent committing, the time callers were
+        blocked because too many commits were pending, the number of batches
+        waiting to be committed (depth) and the largest depth seen, as well
+        as the commit throughput in documents per second
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["depth"] = self.batches.qsize()
+        stats["docsPerSecond"] = stats["docs"] / stats["commitTime"] if stats["commitTime"] else 0.0
+        return stats
+
+    def run(self):
+        while True:
+            batch = self.batches.get()
+            try:
+                if batch is None:
+                    return
+                self._commit(*batch)
+            finally:
+                self.batches.task_done()
+
+    def _commit(self, docs, viewlist, callback):
+        """
+        Commit a batch of documents, counting its conflicts
+        """
+        conflicts = [0]
+
+        def countConflict(database, data, result):
+            conflicts[0] += 1
+            if callback:
+                return callback(database, data, result)
+            return result
+
+        startTime = time.time()
+        failed = 0
+        try:
+            self.database._queue = docs
+            self.database.commit(viewlist=viewlist, callback=countConflict)
+        except Exception as ex:
+            logging.error("Failed to commit %d documents to %s: %s", len(docs), self.database.name, str(ex))
+            self.database._reset_queue()
+            failed = 1
+            with self._lock:
+                self.errors.append(ex)
+        with self._lock:
+            self._stats["commits"] += 1
+            self._stats["docs"] += len(docs)
+            self._stats["conflicts"] += conflicts[0]
+            self._stats["failed"] += failed
+            self._stats["commitTime"] += time.time() - startTime
+        return
+
+
 class RotatingDatabase(Database):
     """
     A rotating database is actually multiple databases:
@@ -909,12 +1183,14 @@ class CouchServer(CouchDBRequests):
     More info http://wiki.apache.org/couchdb/HTTP_database_API
     """
 
-    def __init__(self, dburl='http://localhost:5984', usePYCurl=False, ckey=None, cert=None, capath=None):
+    def __init__(self, dburl='http://localhost:5984', usePYCurl=False, ckey=None, cert=None, capath=None,
+                 poolSize=10, poolTimeout=60):
         """
         Set up a connection to the CouchDB server
         """
         check_server_url(dburl)
-        CouchDBRequests.__init__(self, url=dburl, usePYCurl=usePYCurl, ckey=ckey, cert=cert, capath=capath)
+        CouchDBRequests.__init__(self, url=dburl, usePYCurl=usePYCurl, ckey=ckey, cert=cert, capath=capath,
+                                 poolSize=poolSize, poolTimeout=poolTimeout)
         self.url = dburl
         self.ckey = ckey
         self.cert = cert
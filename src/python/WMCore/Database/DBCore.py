@@ -6,12 +6,13 @@ Core Database APIs
 
 
 """
+import re
 from copy import copy
 
 from Utils.IteratorTools import grouper
 import WMCore.WMLogging
 from WMCore.DataStructs.WMObject import WMObject
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, StreamingResultSet
 
 class DBInterface(WMObject):
     """
@@ -36,6 +37,9 @@ class DBInterface(WMObject):
         self.logger.info ("Instantiating base WM DBInterface")
         self.engine = engine
         self.maxBindsPerQuery = 500
+        # IN lists are padded up to a power of two (and at most
+        # maxBindsPerQuery) so only a handful of distinct statements is used
+        self.minInListSize = 8
 
     def buildbinds(self, sequence, thename, therest=[{}]):
         """
@@ -113,6 +117,63 @@ class DBInterface(WMObject):
         result = connection.execute(s, b)
         return self.makelist(result)
 
+    def splitInListStatement(self, s, b, inListBind):
+        """
+        _splitInListStatement_
+
+        Check whether a statement run for a list of binds is a single column
+        lookup on the inListBind variable, i.e. a SELECT with exactly one
+        "column = :inListBind" condition and binds that only hold inListBind.
+        Returns the statement text before and after "= :inListBind" or None
+        if the statement can't be batched into IN lists.
+        """
+        if not s.strip().lower().startswith('select'):
+            return None
+        for bind in b:
+            if not isinstance(bind, dict) or list(bind) != [inListBind]:
+                return None
+
+        parts = re.split(r"=\s*:%s\b" % re.escape(inListBind), s, flags=re.IGNORECASE)
+        if len(parts) != 2:
+            return None
+        return parts
+
+    def executeinlistbinds(self, parts, b, inListBind, connection=None,
+                           returnCursor=False):
+        """
+        _executeinlistbinds_
+
+        Run a single column lookup (see splitInListStatement) for a list of
+        binds as one "column IN (...)" query per maxBindsPerQuery values
+        instead of one query per bind. Duplicated values are only looked up
+        once and no particular row order is guaranteed, so DAOs opting in must
+        not depend on getting one result row per bind in the order of binds.
+
+        returns a list of ResultSet (or ResultProxy if returnCursor is set)
+        objects, one per IN list query
+        """
+        values = []
+        seen = set()
+        for bind in b:
+            value = bind[inListBind]
+            if value not in seen:
+                seen.add(value)
+                values.append(value)
+
+        result = []
+        for chunk in grouper(values, self.maxBindsPerQuery):
+            listSize = self.minInListSize
+            while listSize < len(chunk):
+                listSize *= 2
+            listSize = min(listSize, self.maxBindsPerQuery)
+            chunk.extend([chunk[-1]] * (listSize - len(chunk)))
+
+            bindNames = ["%s_%d" % (inListBind, i) for i in range(len(chunk))]
+            sql = "%sIN (%s)%s" % (parts[0], ", ".join([":%s" % name for name in bindNames]), parts[1])
+            result.append(self.executebinds(sql, dict(zip(bindNames, chunk)),
+                                            connection=connection, returnCursor=returnCursor))
+        return result
+
     def connection(self):
         """
         Return a connection to the engine (from the connection pool)
@@ -120,14 +181,36 @@ class DBInterface(WMObject):
         return self.engine.connect()
 
 
+    def executestreaming(self, s, b=None, connection=None, ownConnection=False):
+        """
+        _executestreaming_
+
+        Execute a single SELECT asking for a server-side cursor where the
+        driver supports it, and return a StreamingResultSet reading the rows
+        lazily. If ownConnection is set the connection is closed together
+        with the StreamingResultSet.
+        """
+        streamConnection = connection.execution_options(stream_results=True)
+        if b is None or b == {}:
+            resultProxy = self.executebinds(s, connection=streamConnection, returnCursor=True)
+        else:
+            resultProxy = self.executebinds(s, b, connection=streamConnection, returnCursor=True)
+        return StreamingResultSet(resultProxy, connection=connection if ownConnection else None)
+
     def processData(self, sqlstmt, binds={}, conn=None,
-                    transaction=False, returnCursor=False):
+                    transaction=False, returnCursor=False, inListBind=None,
+                    streamResults=False):
         """
         set conn if you already have an active connection to reuse
         set transaction = True if you already have an active transaction
+        set inListBind to the bind variable name of a single column lookup
+        to run it for a list of binds as IN list queries (executeinlistbinds)
+        set streamResults to get a single SELECT with at most one set of binds
+        back as a StreamingResultSet, rows are then read while formatting
 
         """
         connection = None
+        streaming = False
         try:
             if not conn:
                 connection = self.connection()
@@ -138,7 +221,13 @@ class DBInterface(WMObject):
             # Can take either a single statement or a list of statements and binds
             sqlstmt = self.makelist(sqlstmt)
             binds = self.makelist(binds)
-            if len(sqlstmt) > 0 and (len(binds) == 0 or (binds[0] == {} or binds[0] == None)):
+            if streamResults and not returnCursor and len(sqlstmt) == 1 and len(binds) <= 1 and \
+                    sqlstmt[0].strip().lower().startswith('select'):
+                # No transaction around it, the rows are read after we return
+                streaming = True
+                result.append(self.executestreaming(sqlstmt[0], binds[0] if binds else None,
+                                                    connection=connection, ownConnection=not conn))
+            elif len(sqlstmt) > 0 and (len(binds) == 0 or (binds[0] == {} or binds[0] == None)):
                 # Should only be run by create statements
                 if not transaction:
                     #WMCore.WMLogging.sqldebug("transaction created in DBInterface")
@@ -153,11 +242,18 @@ class DBInterface(WMObject):
                     trans.commit()
             elif len(binds) > len(sqlstmt) and len(sqlstmt) == 1:
                 #Run single SQL statement for a list of binds - use execute_many()
+                parts = None
+                if inListBind:
+                    parts = self.splitInListStatement(sqlstmt[0], binds, inListBind)
                 if not transaction:
                     trans = connection.begin()
-                for subBinds in grouper(binds, self.maxBindsPerQuery):
-                    result.extend(self.executemanybinds(sqlstmt[0], subBinds,
-                                                        connection=connection, returnCursor=returnCursor))
+                if parts:
+                    result.extend(self.executeinlistbinds(parts, binds, inListBind,
+                                                          connection=connection, returnCursor=returnCursor))
+                else:
+                    for subBinds in grouper(binds, self.maxBindsPerQuery):
+                        result.extend(self.executemanybinds(sqlstmt[0], subBinds,
+                                                            connection=connection, returnCursor=returnCursor))
 
                 if not transaction:
                     trans.commit()
@@ -192,7 +288,11 @@ class DBInterface(WMObject):
                                            (type(sqlstmt), type(binds), type(connection), type(transaction)))
                 raise Exception("""DBInterface.processData Nothing executed, problem with your arguments
                 Probably mismatched sizes for sql (%i) and binds (%i)""" % (len(sqlstmt), len(binds)))
+        except Exception:
+            if streaming and not conn and connection != None:
+                connection.close()
+            raise
         finally:
-            if not conn and connection != None:
+            if not conn and connection != None and not streaming:
                 connection.close() # Return connection to the pool
         return result
@@ -11,10 +11,18 @@ interactions.
 import datetime
 import time
 import types
+from collections import namedtuple
 
 from WMCore.DataStructs.WMObject import WMObject
 
 class DBFormatter(WMObject):
+    # DAOs doing a "column = :bind" lookup for many binds at once can set this
+    # to the bind name and pass it to processData to get IN list batching
+    inListBind = None
+    # DAOs loading big tables can set this and pass it to processData to get
+    # the rows streamed from the database while they are formatted
+    streamResults = False
+
     def __init__(self, logger, dbinterface):
         """
         The class holds a connection to the database in self.dbi. This is a
@@ -68,24 +76,51 @@ class DBFormatter(WMObject):
         """
         dictOut = []
         for r in result:
-            descriptions = r.keys
-            for i in r.fetchall():
+            # WARNING: Oracle returns table names in CAP!
+            descriptions = [str(key.lower()) for key in r.keys]
+            for i in r:
                 #WARNING: this can generate errors for some stupid reason
                 # in both oracle and mysql.
-                entry = {}
-                for index in xrange(0,len(descriptions)):
-                    # WARNING: Oracle returns table names in CAP!
-                    if type(i[index]) == unicode:
-                        entry[str(descriptions[index].lower())] = str(i[index])
-                    else:
-                        entry[str(descriptions[index].lower())] = i[index]
-
-                dictOut.append(entry)
+                dictOut.append(dict(zip(descriptions, [str(value) if type(value) == unicode else value
+                                                       for value in i])))
 
             r.close()
 
         return dictOut
 
+    def formatNamedTuple(self, result, typename="Row"):
+        """
+        Returns an array of namedtuples (with lower case field names)
+        representing the results, lighter than one dictionary per row
+        """
+        tupleOut = []
+        for r in result:
+            rowType = namedtuple(typename, [str(key.lower()) for key in r.keys])
+            for i in r:
+                tupleOut.append(rowType._make([str(value) if type(value) == unicode else value
+                                               for value in i]))
+
+            r.close()
+
+        return tupleOut
+
+    def formatColumns(self, result):
+        """
+        Returns a dictionary of (lower case) column names to the list of
+        values of that column over all the results
+        """
+        columnsOut = {}
+        for r in result:
+            descriptions = [str(key.lower()) for key in r.keys]
+            columns = [columnsOut.setdefault(key, []) for key in descriptions]
+            for i in r:
+                for column, value in zip(columns, i):
+                    column.append(str(value) if type(value) == unicode else value)
+
+            r.close()
+
+        return columnsOut
+
     def formatOneDict(self, result):
         """
         Return a dictionary representing the first record
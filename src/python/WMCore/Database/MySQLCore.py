@@ -5,39 +5,11 @@ _MySQLCore_
 Handle bind variable parsing for MySQL.
 """
 
-import copy
+import re
 
 from WMCore.Database.DBCore import DBInterface
 from WMCore.Database.ResultSet import ResultSet
 
-def bindVarCompare(a, b):
-    """
-    _bindVarCompare_
-
-    Bind variables are represented as a tuple with the first element being the
-    variable name and the second being it's position in the query.  We sort on
-    the position in the query.
-    """
-    if a[1] > b[1]:
-        return 1
-    elif a[1] == b[1]:
-        return 0
-    else:
-        return -1
-
-def stringLengthCompare(a, b):
-    """
-    _stringLengthCompare_
-
-    Sort comparison function to sort strings by length from longest to shortest.
-    """
-    if len(a) > len(b):
-        return -1
-    if len(a) == len(b):
-        return 0
-    else:
-        return 1
-
 class MySQLInterface(DBInterface):
     def substitute(self, origSQL, origBindsList):
         """
@@ -65,51 +37,31 @@ class MySQLInterface(DBInterface):
         origBindsList = self.makelist(origBindsList)
         origBind = origBindsList[0]
 
-        bindVarPositionList = []
-        updatedSQL = copy.copy(origSQL)
-
-        # We process bind variables from longest to shortest to avoid a shorter
+        # We match bind variables from longest to shortest to avoid a shorter
         # bind variable matching a longer one.  For example if we have two bind
         # variables: RELEASE_VERSION and RELEASE_VERSION_ID the former will
-        # match against the latter, causing problems.  We'll sort the variable
-        # names by length to guard against this.
-        bindVarNames = origBind.keys()
-        bindVarNames.sort(stringLengthCompare)
-
-        bindPositions = {}
-        for bindName in bindVarNames:
-            searchPosition = 0
-
-            while True:
-                bindPosition = origSQL.lower().find(":%s" % bindName.lower(),
-                                                    searchPosition)
-                if bindPosition == -1:
-                    break
-
-                if bindPosition not in bindPositions:
-                    bindPositions[bindPosition] = 0
-                    bindVarPositionList.append((bindName, bindPosition))
-                searchPosition = bindPosition + 1
-
-            searchPosition = 0
-            while True:
-                bindPosition = updatedSQL.lower().find(":%s" % bindName.lower(),
-                                                       searchPosition)
-
-                if bindPosition == -1:
-                    break
+        # match against the latter, causing problems.  Every ":word" in the
+        # query is replaced by the longest bind variable it starts with, in a
+        # single pass, which matters for statements with hundreds of binds.
+        bindVarByName = dict((bindName.lower(), bindName) for bindName in origBind.keys())
+        bindVarPositionList = []
 
-                left = updatedSQL[0:bindPosition]
-                right = updatedSQL[bindPosition + len(bindName) + 1:]
-                updatedSQL = left + "%s" + right
+        def replaceBind(match):
+            word = match.group(1)
+            for length in range(len(word), 0, -1):
+                bindName = bindVarByName.get(word[:length].lower())
+                if bindName is not None:
+                    bindVarPositionList.append(bindName)
+                    return "%s" + word[length:]
+            return match.group(0)
 
-        bindVarPositionList.sort(bindVarCompare)
+        updatedSQL = re.sub(r":(\w+)", replaceBind, origSQL)
 
         mySQLBindVarsList = []
         for origBind in origBindsList:
             mySQLBindVars = []
-            for bindVarPosition in bindVarPositionList:
-                mySQLBindVars.append(origBind[bindVarPosition[0]])
+            for bindName in bindVarPositionList:
+                mySQLBindVars.append(origBind[bindName])
 
             mySQLBindVarsList.append(tuple(mySQLBindVars))
 
@@ -4,6 +4,10 @@ _ResultSet_
 A class to read in a SQLAlchemy result proxy and hold the data, such that the
 SQLAlchemy result sets (aka cursors) can be closed. Make this class look as much
 like the SQLAlchemy class to minimise the impact of adding this class.
+
+StreamingResultSet offers the same interface but reads the rows lazily from
+a still open result proxy, so big selects don't need to be held in memory
+twice (rows and formatted output) at the same time.
 """
 
 
@@ -28,6 +32,9 @@ class ResultSet:
     def fetchall(self):
         return self.data
 
+    def __iter__(self):
+        return iter(self.data)
+
     def add(self, resultproxy):
 
         myThread = threading.currentThread()
@@ -41,3 +48,78 @@ class ResultSet:
                 self.data.append(r)
 
         return
+
+
+class StreamingResultSet(object):
+    """
+    _StreamingResultSet_
+
+    Wrap an open SQLAlchemy result proxy and hand out its rows lazily, fetching
+    arraysize rows at a time. Iterating over it consumes the rows only once,
+    fetchall/fetchone/data read whatever is left into memory and behave like
+    a ResultSet from then on. The result proxy, and the connection it was
+    executed on if one is given, are closed once all the rows have been read.
+    """
+
+    def __init__(self, resultproxy, connection=None, arraysize=1000):
+        self.resultproxy = resultproxy
+        self.connection = connection
+        self.arraysize = arraysize
+        self.keys = []
+        self._rows = None
+
+        if resultproxy.closed or not resultproxy.returns_rows:
+            self.close()
+        else:
+            self.keys.extend(resultproxy.keys())
+
+    def close(self):
+        """
+        Release the cursor and the connection it was executed on
+        """
+        if self.resultproxy is not None:
+            self.resultproxy.close()
+            self.resultproxy = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        return
+
+    def fetchmany(self, size=None):
+        """
+        Return the next size (arraysize by default) rows, an empty list when
+        all of them have been read
+        """
+        if self.resultproxy is None:
+            return []
+        rows = self.resultproxy.fetchmany(size or self.arraysize)
+        if not rows:
+            self.close()
+        return rows
+
+    def __iter__(self):
+        if self._rows is not None:
+            for row in self._rows:
+                yield row
+            return
+        while True:
+            rows = self.fetchmany()
+            if not rows:
+                return
+            for row in rows:
+                yield row
+
+    @property
+    def data(self):
+        if self._rows is None:
+            self._rows = list(self)
+        return self._rows
+
+    def fetchall(self):
+        return self.data
+
+    def fetchone(self):
+        if len(self.data) > 0:
+            return self.data[0]
+        else:
+            return []
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+_FlatReport_
+
+JSON on disk format for the framework job report ConfigSection tree.
+
+The tree is stored as a flat, versioned list of sections, each one with its
+own settings and the names and list positions of its child sections. Every
+section is itself JSON encoded as a string of the list:
+
+{"format": "FWJR", "version": 1,
+ "sections": ["{\"name\": \"FrameworkJobReport\", \"settings\": {...},
+                \"children\": [[\"cmsRun1\", 1], ...]}", ...]}
+
+Loading a document only decodes and materializes the top section, child
+sections are decoded and built the first time they are accessed, so reading
+a couple of attributes (site name, exit codes...) doesn't decode the whole
+tree. Values keep their python types (tuples, non string dict keys, unicode
+vs str).
+
+Runtime Safe.
+"""
+
+import json
+
+from WMCore.Configuration import ConfigSection
+
+FLAT_REPORT_FORMAT = "FWJR"
+FLAT_REPORT_VERSION = 1
+
+# key of the dictionaries standing for values JSON can't represent
+_TYPE_KEY = "_fwjr_type_"
+
+
+def _encodeValue(value):
+    """
+    _encodeValue_
+
+    Convert a setting value into something JSON can represent exactly
+    """
+    if isinstance(value, str):
+        try:
+            value.decode("utf-8")
+        except UnicodeDecodeError:
+            return {_TYPE_KEY: "latin1", "v": value.decode("latin-1")}
+        return value
+    if isinstance(value, unicode):
+        return {_TYPE_KEY: "unicode", "v": value}
+    if isinstance(value, list):
+        return [_encodeValue(x) for x in value]
+    if isinstance(value, tuple):
+        return {_TYPE_KEY: "tuple", "v": [_encodeValue(x) for x in value]}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and _TYPE_KEY not in value:
+            return dict((key, _encodeValue(x)) for key, x in value.iteritems())
+        return {_TYPE_KEY: "dict", "v": [[_encodeValue(key), _encodeValue(x)] for key, x in value.iteritems()]}
+    return value
+
+
+def _decodeValue(value):
+    """
+    _decodeValue_
+
+    Reverse _encodeValue on a value read back by the JSON decoder
+    """
+    valueType = type(value)
+    if valueType is unicode:
+        return value.encode("utf-8")
+    if valueType in (int, float, bool, long) or value is None:
+        return value
+    if valueType is list:
+        return [_decodeValue(x) for x in value]
+    if isinstance(value, dict):
+        valueType = value.get(_TYPE_KEY)
+        if valueType is None:
+            return dict((key.encode("utf-8"), _decodeValue(x)) for key, x in value.iteritems())
+        if valueType == "unicode":
+            return value["v"]
+        if valueType == "latin1":
+            return value["v"].encode("latin-1")
+        if valueType == "tuple":
+            return tuple(_decodeValue(x) for x in value["v"])
+        if valueType == "dict":
+            return dict((_decodeValue(key), _decodeValue(x)) for key, x in value["v"])
+        raise ValueError("Unknown encoded value type %s in flat report" % valueType)
+    return value
+
+
+def dumpReportData(section):
+    """
+    _dumpReportData_
+
+    Flatten a ConfigSection tree into a flat report document
+    """
+    sections = []
+
+    def addSection(node):
+        position = len(sections)
+        entry = {"name": node._internal_name, "settings": {}, "children": []}
+        if node._internal_documentation:
+            entry["doc"] = node._internal_documentation
+        if node._internal_docstrings:
+            entry["docstrings"] = node._internal_docstrings
+        sections.append(None)
+        for attr in node._internal_settings:
+            value = getattr(node, attr)
+            if attr in node._internal_children:
+                entry["children"].append([attr, addSection(value)])
+            else:
+                entry["settings"][attr] = _encodeValue(value)
+        sections[position] = json.dumps(entry, separators=(',', ':'))
+        return position
+
+    addSection(section)
+    return {"format": FLAT_REPORT_FORMAT, "version": FLAT_REPORT_VERSION,
+            "sections": sections}
+
+
+def loadReportData(document):
+    """
+    _loadReportData_
+
+    Build the ConfigSection tree of a flat report document, child sections
+    are only materialized when they are first accessed
+    """
+    if document.get("format") != FLAT_REPORT_FORMAT:
+        raise ValueError("Not a flat report document")
+    if document.get("version") != FLAT_REPORT_VERSION:
+        raise ValueError("Unsupported flat report version %s" % document.get("version"))
+
+    return LazySection.fromDocument(document["sections"], 0)
+
+
+def writeFlatReport(section, handle):
+    """
+    _writeFlatReport_
+
+    Write a ConfigSection tree to an open file as a flat report
+    """
+    json.dump(dumpReportData(section), handle, separators=(',', ':'))
+    return
+
+
+def readFlatReport(handle):
+    """
+    _readFlatReport_
+
+    Read a flat report from an open file, returns the top ConfigSection of
+    the tree
+    """
+    return loadReportData(json.load(handle))
+
+
+def isFlatReport(handle):
+    """
+    _isFlatReport_
+
+    Check whether an open report file holds a flat report or a pickle,
+    leaves the file at its start
+    """
+    flat = handle.read(1) == '{'
+    handle.seek(0)
+    return flat
+
+
+class LazySection(ConfigSection):
+    """
+    _LazySection_
+
+    ConfigSection whose child sections are built from the flat report
+    document on first access. Once all its children are built it turns
+    into a plain ConfigSection, which is also what gets pickled or copied.
+    """
+
+    @classmethod
+    def fromDocument(cls, sections, position):
+        """
+        _fromDocument_
+
+        Build the section at the given position of the sections list
+        """
+        entry = json.loads(sections[position])
+        settings = dict((attr.encode("utf-8"), _decodeValue(value))
+                        for attr, value in entry["settings"].iteritems())
+        lazyChildren = dict((attr.encode("utf-8"), childPosition)
+                            for attr, childPosition in entry["children"])
+        docstrings = dict((attr.encode("utf-8"), docstring.encode("utf-8"))
+                          for attr, docstring in entry.get("docstrings", {}).iteritems())
+
+        # fill in the instance dictionary directly, the values were type
+        # checked when the report was written
+        section = object.__new__(cls)
+        sectionDict = section.__dict__
+        sectionDict.update(settings)
+        sectionDict.update({"_internal_documentation": entry.get("doc", "").encode("utf-8"),
+                            "_internal_name": entry["name"].encode("utf-8"),
+                            "_internal_settings": set(settings).union(lazyChildren),
+                            "_internal_docstrings": docstrings,
+                            "_internal_children": set(lazyChildren),
+                            "_internal_parent_ref": None,
+                            "_internal_skipChecks": False})
+        if lazyChildren:
+            sectionDict["_internal_lazySections"] = sections
+            sectionDict["_internal_lazyChildren"] = lazyChildren
+        else:
+            object.__setattr__(section, "__class__", ConfigSection)
+        return section
+
+    def _materialize(self, name):
+        """
+        _materialize_
+
+        Build the child section with the given name
+        """
+        lazyChildren = self.__dict__["_internal_lazyChildren"]
+        child = LazySection.fromDocument(self._internal_lazySections, lazyChildren.pop(name))
+        child.__dict__["_internal_parent_ref"] = self
+        self.__dict__[name] = child
+        if not lazyChildren:
+            del self._internal_lazySections
+            del self._internal_lazyChildren
+            object.__setattr__(self, "__class__", ConfigSection)
+        return child
+
+    def materialize_(self):
+        """
+        _materialize_
+
+        Build the whole tree under this section
+        """
+        for name in list(self.__dict__.get("_internal_lazyChildren", [])):
+            self._materialize(name)
+        for name in list(self._internal_children):
+            child = getattr(self, name)
+            if isinstance(child, LazySection):
+                child.materialize_()
+        return
+
+    def __getattr__(self, name):
+        # only called for attributes that are not set
+        if name in self.__dict__.get("_internal_lazyChildren", {}):
+            return self._materialize(name)
+        raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        if name in self.__dict__.get("_internal_lazyChildren", {}):
+            self._materialize(name)
+        ConfigSection.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if name in self.__dict__.get("_internal_lazyChildren", {}):
+            self._materialize(name)
+        ConfigSection.__delattr__(self, name)
+
+    def section_(self, sectionName):
+        if sectionName in self.__dict__.get("_internal_lazyChildren", {}):
+            return self._materialize(sectionName)
+        return ConfigSection.section_(self, sectionName)
+
+    def __reduce_ex__(self, protocol):
+        self.materialize_()
+        return self.__reduce_ex__(protocol)
@@ -18,6 +18,7 @@ from WMCore.Configuration import ConfigSection
 from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Run import Run
 from WMCore.FwkJobReport.FileInfo import FileInfo
+from WMCore.FwkJobReport.FlatReport import isFlatReport, readFlatReport, writeFlatReport
 from WMCore.WMException import WMException
 from WMCore.WMExceptions import WM_JOB_ERROR_CODES
 
@@ -98,6 +99,8 @@ class Report(object):
     The base class for the new jobReport
 
     """
+    # on disk format written by persist, "pickle" or "json"
+    persistFormat = "pickle"
 
     def __init__(self, reportname=None):
         self.data = ConfigSection("FrameworkJobReport")
@@ -343,14 +346,20 @@ class Report(object):
 
         return returnCode
 
-    def persist(self, filename):
+    def persist(self, filename, persistFormat=None):
         """
         _persist_
 
-        Pickle this object and save it to disk.
+        Pickle this object and save it to disk. With persistFormat (or the
+        class persistFormat) set to "json" write it as a flat JSON report
+        instead, see WMCore.FwkJobReport.FlatReport.
         """
+        persistFormat = persistFormat or self.persistFormat
         with open(filename, 'w') as handle:
-            pickle.dump(self.data, handle)
+            if persistFormat == "json":
+                writeFlatReport(self.data, handle)
+            else:
+                pickle.dump(self.data, handle)
 
         return
 
@@ -358,10 +367,14 @@ class Report(object):
         """
         _unpersist_
 
-        Load a pickled FWJR from disk.
+        Load a pickled or flat JSON FWJR from disk. The sections of a flat
+        report are only built when they are accessed.
         """
         with open(filename, 'r') as handle:
-            self.data = pickle.load(handle)
+            if isFlatReport(handle):
+                self.data = readFlatReport(handle)
+            else:
+                self.data = pickle.load(handle)
 
         # old self.report (if it existed) became unattached
         if reportname:
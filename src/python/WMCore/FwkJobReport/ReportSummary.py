@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+_ReportSummary_
+
+Small JSON sidecar written next to a job report (Report.N.pkl gets a
+Report.N.summary.json) with what the agent needs to classify a failed job
+without loading the whole report: the exit codes, first start and last stop
+times and the site name.
+
+The sidecar records the size of the report it was made from, a sidecar that
+is missing, empty (the runtime touches its output files in advance) or out
+of date with its report is ignored and the full report is read instead.
+
+Runtime Safe.
+"""
+
+import json
+import logging
+import os
+
+from WMCore.FwkJobReport.Report import Report
+
+SUMMARY_VERSION = 1
+
+
+def getSummaryPath(reportPath):
+    """
+    _getSummaryPath_
+
+    Path of the summary sidecar of a report
+    """
+    return "%s.summary.json" % os.path.splitext(reportPath)[0]
+
+
+def getReportSummary(report):
+    """
+    _getReportSummary_
+
+    Build the summary of a Report object
+    """
+    siteName = report.getSiteName()
+    return {"exitCodes": report.getExitCodes(),
+            "times": report.getFirstStartLastStop(),
+            "siteName": str(siteName) if siteName else None}
+
+
+def writeReportSummary(report, reportPath):
+    """
+    _writeReportSummary_
+
+    Write the summary sidecar of a report that was just persisted to
+    reportPath. The sidecar is optional, failing to write it is only logged.
+    """
+    try:
+        summary = getReportSummary(report)
+        document = {"version": SUMMARY_VERSION,
+                    "reportSize": os.path.getsize(reportPath),
+                    "exitCodes": sorted(summary["exitCodes"]),
+                    "times": summary["times"],
+                    "siteName": summary["siteName"]}
+        with open(getSummaryPath(reportPath), 'w') as handle:
+            json.dump(document, handle)
+    except Exception as ex:
+        logging.warning("Failed to write the summary of job report %s: %s", reportPath, str(ex))
+        if os.path.isfile(getSummaryPath(reportPath)):
+            os.remove(getSummaryPath(reportPath))
+    return
+
+
+def _readSidecar(reportPath):
+    """
+    _readSidecar_
+
+    Read the summary sidecar of a report, None if it is missing, empty or
+    doesn't match the report
+    """
+    try:
+        with open(getSummaryPath(reportPath), 'r') as handle:
+            document = json.load(handle)
+    except (IOError, ValueError):
+        return None
+
+    if not isinstance(document, dict) or document.get("version") != SUMMARY_VERSION:
+        return None
+    if document.get("reportSize") != os.path.getsize(reportPath):
+        return None
+
+    siteName = document["siteName"]
+    return {"exitCodes": set(document["exitCodes"]),
+            "times": document["times"],
+            "siteName": str(siteName) if siteName else None}
+
+
+def _readFullReport(reportPath):
+    """
+    _readFullReport_
+
+    Build the summary of a report by loading the full report
+    """
+    report = Report()
+    report.load(reportPath)
+    return getReportSummary(report)
+
+
+def readReportSummary(reportPath):
+    """
+    _readReportSummary_
+
+    Return the summary of a report, from its sidecar when there is a valid
+    one or from the full report otherwise
+    """
+    summary = _readSidecar(reportPath)
+    if summary is None:
+        summary = _readFullReport(reportPath)
+    return summary
+
+
+def readReportSummaries(reportPaths):
+    """
+    _readReportSummaries_
+
+    Read the summaries of a list of reports, returns a dictionary from report
+    path to summary. Reports that don't exist or can't be read are logged and
+    left out of the result.
+    """
+    summaries = {}
+    fullReports = 0
+    for reportPath in set(reportPaths):
+        if not os.path.isfile(reportPath):
+            logging.error("Failed to find job report %s", reportPath)
+            continue
+
+        summary = _readSidecar(reportPath)
+        if summary is None:
+            fullReports += 1
+            try:
+                summary = _readFullReport(reportPath)
+            except Exception as ex:
+                logging.warning("Failed to read job report %s: %s", reportPath, str(ex))
+                continue
+        summaries[reportPath] = summary
+
+    if fullReports:
+        logging.info("Read %d job report summaries, %d of them from the full report",
+                     len(summaries), fullReports)
+    return summaries
@@ -12,6 +12,7 @@ Created on Sep 25, 2012
 @author: dballest
 """
 
+import bisect
 import logging
 import math
 import operator
@@ -149,6 +150,9 @@ class EventAwareLumiBased(JobFactory):
         currentJobAvgEventCount = 0
         stopTask = False
         self.lumiChecker = LumiChecker(applyLumiCorrection)
+        # without lumi mask nor lumi correction every lumi is good, and the
+        # lumis which don't end a job or a chain of lumis are added at once
+        addLumiBlocks = not goodRunList and not applyLumiCorrection
         for location in locationDict:
 
             # For each location, we need a new jobGroup
@@ -163,6 +167,8 @@ class EventAwareLumiBased(JobFactory):
                         f['parents'].add(parent)
 
                 lumisInJobInFile = 0
+                # the last job this file was added to
+                fileJob = None
                 updateSplitOnJobStop = False
                 failNextJob = False
                 # If estimated job time is higher the job time limit (condor limit)
@@ -208,8 +214,16 @@ class EventAwareLumiBased(JobFactory):
                         # Then we need to kill this job and get a new one
                         stopJob = True
 
+                    lumiList = run.lumis
+                    if addLumiBlocks:
+                        # lumi - index is the same for all the lumis of a block of consecutive lumis
+                        blockKeys = [lumi - index for index, lumi in enumerate(lumiList)]
+                    lumiIndex = 0
+
                     # Now loop over the lumis
-                    for lumi in run:
+                    while lumiIndex < len(lumiList):
+                        lumi = lumiList[lumiIndex]
+                        lumiIndex += 1
                         if (not isGoodLumi(goodRunList, run=run.run, lumi=lumi) or
                                 self.lumiChecker.isSplitLumi(run.run, lumi, f)):
                             # Kill the chain of good lumis
@@ -275,6 +289,7 @@ class EventAwareLumiBased(JobFactory):
 
                             # Add the file to new jobs
                             self.currentJob.addFile(f)
+                            fileJob = self.currentJob
 
                             if updateSplitOnJobStop:
                                 # Then we were carrying from a previous file
@@ -293,14 +308,32 @@ class EventAwareLumiBased(JobFactory):
                         lastRun = run.run
                         totalAvgEventCount += f['avgEvtsPerLumi']
 
-                        if self.currentJob and not f in self.currentJob['input_files']:
+                        if self.currentJob and self.currentJob is not fileJob:
                             self.currentJob.addFile(f)
+                            fileJob = self.currentJob
 
                         # We stop here if there are more total events than requested.
                         if totalEvents > 0 and totalAvgEventCount >= totalEvents:
                             stopTask = True
                             break
 
+                        if addLumiBlocks and lastLumi and lumiIndex < len(lumiList):
+                            # Add the next lumis of the block, up to the one filling the job
+                            # or reaching the total events, which go through the loop
+                            numLumis = bisect.bisect_right(blockKeys, blockKeys[lumiIndex - 1],
+                                                           lumiIndex) - lumiIndex
+                            if lumisInJob <= lumisPerJob:
+                                numLumis = min(numLumis, lumisPerJob - lumisInJob)
+                            if totalEvents > 0 and f['avgEvtsPerLumi']:
+                                numLumis = min(numLumis, int(totalEvents - totalAvgEventCount - 1) //
+                                               int(f['avgEvtsPerLumi']))
+                            if numLumis > 0:
+                                lumiIndex += numLumis
+                                lumisInJob += numLumis
+                                lumisInJobInFile += numLumis
+                                lastLumi = lumiList[lumiIndex - 1]
+                                totalAvgEventCount += numLumis * f['avgEvtsPerLumi']
+
                     if firstLumi != None and lastLumi != None:
                         # Add this run to the mask
                         self.currentJob['mask'].addRunAndLumis(run=run.run,
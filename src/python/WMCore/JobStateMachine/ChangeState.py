@@ -10,8 +10,9 @@ import logging
 import traceback
 import re
 
+from Utils.IteratorTools import grouper
 from WMCore.Database.CMSCouch import CouchServer
-from WMCore.Database.CMSCouch import CouchNotFoundError, CouchError
+from WMCore.Database.CMSCouch import CouchError
 from WMCore.DataStructs.WMObject import WMObject
 from WMCore.JobStateMachine.Transitions import Transitions
 from WMCore.Services.Dashboard.DashboardReporter import DashboardReporter
@@ -58,6 +59,62 @@ def discardConflictingDocument(couchDbInstance, data, result):
         logging.error("Error: %s", str(ex))
         return result
 
+def stateTransitionUpdate(docID, transitions):
+    """
+    _stateTransitionUpdate_
+
+    Client side version of the JobDump stateTransition update handler, returns
+    a function for Database.updateBulkDocumentsWithFunction that appends the
+    transitions to the states of a job document. Documents without states are
+    logged and left alone.
+    """
+    def update(doc):
+        if doc is None:
+            doc = {"_id": docID, "states": {}}
+        elif not isinstance(doc.get("states"), dict):
+            logging.warning("Job document %s has no states, skipping %d transitions", docID, len(transitions))
+            return None
+        for transition in transitions:
+            maxKey = max([int(key) for key in doc["states"]] or [0])
+            doc["states"][str(maxKey + 1)] = transition
+        return doc
+    return update
+
+def locationTransitionUpdate(location):
+    """
+    _locationTransitionUpdate_
+
+    Client side version of the JobDump locationTransition update handler,
+    returns a function that changes the location of the last state of a job
+    document.
+    """
+    def update(doc):
+        if doc is None or not doc.get("states"):
+            return None
+        maxKey = max([int(key) for key in doc["states"]])
+        doc["states"][str(maxKey)]["location"] = location
+        return doc
+    return update
+
+def jobSummaryTransitionUpdate(transitions):
+    """
+    _jobSummaryTransitionUpdate_
+
+    Client side version of the WMStatsAgent jobSummaryState and
+    jobStateTransition update handlers, returns a function that sets the
+    state of a job summary document and appends the transitions to its state
+    history. Missing job summaries are left alone.
+    """
+    def update(doc):
+        if doc is None:
+            return None
+        for transition in transitions:
+            doc["state"] = transition["newstate"]
+            doc["timestamp"] = transition["timestamp"]
+            doc.setdefault("state_history", []).append(transition)
+        return doc
+    return update
+
 def getDataFromSpecFile(specFile):
     workload = WMWorkloadHelper()
     workload.load(specFile)
@@ -84,6 +141,8 @@ class ChangeState(WMObject, WMConnectionBase):
         self.fwjrdatabase = None
         self.jsumdatabase = None
         self.statsumdatabase = None
+        # commit the job and fwjr documents from a background thread
+        self.asyncCouchCommits = getattr(self.config.JobStateMachine, 'asyncCouchCommits', False)
 
         self.couchdb = CouchServer(self.config.JobStateMachine.couchurl)
         self._connectDatabases()
@@ -103,9 +162,75 @@ class ChangeState(WMObject, WMConnectionBase):
         self.getWorkflowSpecDAO = self.daofactory("Workflow.GetSpecAndNameFromTask")
 
         self.maxUploadedInputFiles = getattr(self.config.JobStateMachine, 'maxFWJRInputFiles', 1000)
+        # number of documents read and written per bulk request
+        self.couchBulkSize = getattr(self.config.JobStateMachine, 'couchBulkSize', 1000)
         self.workloadCache = {}
+        self.couchStats = {"requests": 0, "time": 0.0, "transitions": 0, "conflicts": 0, "failed": 0}
         return
 
+    def getCouchStats(self, reset=False):
+        """
+        _getCouchStats_
+
+        Return the number of couch requests and the time spent in couch calls
+        (requests, time) since the last reset, as well as the number of state
+        transitions recorded, the conflicts that had to be retried and the
+        documents that couldn't be updated. Components can get them with
+        reset=True once per polling cycle. With asynchronous commits the
+        (never reset) counters of the committers are under asyncCommits.
+        """
+        stats = dict(self.couchStats)
+        if reset:
+            for key in self.couchStats:
+                self.couchStats[key] = 0
+            self.couchStats["time"] = 0.0
+        if self.asyncCouchCommits:
+            stats["asyncCommits"] = dict((db.name, db.asyncCommitStats())
+                                         for db in (self.jobsdatabase, self.fwjrdatabase)
+                                         if db is not None)
+        return stats
+
+    def _couchRequestCount(self):
+        """
+        Number of requests made so far to the couch databases
+        """
+        return sum([db.requestCount for db in (self.jobsdatabase, self.fwjrdatabase,
+                                                self.jsumdatabase, self.statsumdatabase) if db is not None])
+
+    def _bulkUpdate(self, database, updates):
+        """
+        _bulkUpdate_
+
+        Apply client side updates to a set of couch documents with bulk requests,
+        return the updated documents by id.
+        """
+        if not updates:
+            return {}
+        if self.asyncCouchCommits and database is self.jobsdatabase:
+            # the documents to update may still be waiting to be committed
+            database.flush()
+        result = database.updateBulkDocumentsWithFunction(updates, updateLimits=self.couchBulkSize)
+        self.couchStats["conflicts"] += result["conflicts"]
+        if result["failed"]:
+            self.couchStats["failed"] += len(result["failed"])
+            logging.error("Failed to update %d documents in %s: %s", len(result["failed"]),
+                          database.name, result["failed"][:10])
+        return result["updated"]
+
+    def _loadDocuments(self, database, docIDs):
+        """
+        _loadDocuments_
+
+        Read a set of couch documents with bulk requests, return the ones that
+        exist by id.
+        """
+        docs = {}
+        for ids in grouper(docIDs, self.couchBulkSize):
+            for row in database.allDocs(options={"include_docs": True}, keys=ids)['rows']:
+                if row.get('doc'):
+                    docs[row['key']] = row['doc']
+        return docs
+
     def _connectDatabases(self):
         """
         Try connecting to the couchdbs
@@ -113,6 +238,8 @@ class ChangeState(WMObject, WMConnectionBase):
         if not hasattr(self, 'jobsdatabase') or self.jobsdatabase is None:
             try:
                 self.jobsdatabase = self.couchdb.connectDatabase("%s/jobs" % self.dbname, size = 250)
+                if self.asyncCouchCommits:
+                    self.jobsdatabase.enableAsyncCommit()
             except Exception as ex:
                 logging.error("Error connecting to couch db '%s/jobs': %s", self.dbname, str(ex))
                 self.jobsdatabase = None
@@ -121,6 +248,8 @@ class ChangeState(WMObject, WMConnectionBase):
         if not hasattr(self, 'fwjrdatabase') or self.fwjrdatabase is None:
             try:
                 self.fwjrdatabase = self.couchdb.connectDatabase("%s/fwjrs" % self.dbname, size = 250)
+                if self.asyncCouchCommits:
+                    self.fwjrdatabase.enableAsyncCommit()
             except Exception as ex:
                 logging.error("Error connecting to couch db '%s/fwjrs': %s", self.dbname, str(ex))
                 self.fwjrdatabase = None
@@ -214,8 +343,27 @@ class ChangeState(WMObject, WMConnectionBase):
             logging.error('Databases not connected properly')
             return
 
+        startTime = time.time()
+        startRequests = self._couchRequestCount()
+        try:
+            self._recordInCouch(jobs, newstate, oldstate, updatesummary)
+        finally:
+            self.couchStats["time"] += time.time() - startTime
+            self.couchStats["requests"] += self._couchRequestCount() - startRequests
+        return
+
+    def _recordInCouch(self, jobs, newstate, oldstate, updatesummary = False):
+        """
+        _recordInCouch_
+
+        Do the work of recordInCouch, the state transitions of the jobs that are
+        already in couch are applied client side and written back in bulk.
+        """
         timestamp = int(time.time())
         couchRecordsToUpdate = []
+        stateTransitions = {}
+        summaryTransitions = {}
+        fwjrJobs = []
 
         for job in jobs:
             couchDocID = job.get("couch_record", None)
@@ -280,178 +428,182 @@ class ChangeState(WMObject, WMConnectionBase):
                                              "couchid": jobDocument["_id"]})
                 self.jobsdatabase.queue(jobDocument, callback = discardConflictingDocument)
             else:
-                # We send a PUT request to the stateTransition update handler.
-                # Couch expects the parameters to be passed as arguments to in
-                # the URI while the Requests class will only encode arguments
-                # this way for GET requests.  Changing the Requests class to
-                # encode PUT arguments as couch expects broke a bunch of code so
-                # we'll just do our own encoding here.
-                updateUri = "/" + self.jobsdatabase.name + "/_design/JobDump/_update/stateTransition/" + couchDocID
-                updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (oldstate,
-                                                                                    newstate,
-                                                                                    jobLocation,
-                                                                                    timestamp)
-                self.jobsdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
+                # Same as the JobDump stateTransition update handler, but
+                # applied client side to all the jobs at once
+                stateTransitions.setdefault(couchDocID, []).append({"oldstate": oldstate,
+                                                                    "newstate": newstate,
+                                                                    "location": jobLocation,
+                                                                    "timestamp": timestamp})
 
             # updating the status of the summary doc only when it is explicitely requested
             # doc is already in couch
             if updatesummary:
-                jobSummaryId = job["name"]
-                updateUri = "/" + self.jsumdatabase.name + "/_design/WMStatsAgent/_update/jobSummaryState/" + jobSummaryId
                 # map retrydone state to jobfailed state for monitoring
                 if newstate == "retrydone":
                     monitorState = "jobfailed"
                 else:
                     monitorState = newstate
-                updateUri += "?newstate=%s&timestamp=%s" % (monitorState, timestamp)
-                self.jsumdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
-                logging.debug("Updated job summary status for job %s", jobSummaryId)
-
-                updateUri = "/" + self.jsumdatabase.name + "/_design/WMStatsAgent/_update/jobStateTransition/" + jobSummaryId
-                updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (oldstate,
-                                                                                    monitorState,
-                                                                                    job["location"],
-                                                                                    timestamp)
-                self.jsumdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
-                logging.debug("Updated job summary state history for job %s", jobSummaryId)
+                summaryTransitions.setdefault(job["name"], []).append({"oldstate": oldstate,
+                                                                       "newstate": monitorState,
+                                                                       "location": job["location"],
+                                                                       "timestamp": timestamp})
 
             if job.get("fwjr", None):
-                
-                cachedByWorkflow = self.workloadCache.setdefault(job['workflow'], 
-                                            getDataFromSpecFile(
-                                             self.getWorkflowSpecDAO.execute(job['task'])[job['task']]['spec']))
-                job['fwjr'].setCampaign(cachedByWorkflow.get('Campaign', ''))
-                job['fwjr'].setPrepID(cachedByWorkflow.get(job['task'], ''))
-                # If there are too many input files, strip them out
-                # of the FWJR, as they should already
-                # be in the database
-                # This is not critical
-                try:
-                    if len(job['fwjr'].getAllInputFiles()) > self.maxUploadedInputFiles:
-                        job['fwjr'].stripInputFiles()
-                except Exception as ex:
-                    logging.error("Error while trying to strip input files from FWJR.  Ignoring. : %s", str(ex))
+                fwjrJobs.append((job, couchDocID))
+
+        jobDocs = self._bulkUpdate(self.jobsdatabase,
+                                   dict((docID, stateTransitionUpdate(docID, transitions))
+                                        for docID, transitions in stateTransitions.iteritems()))
+        jobSummaries = self._bulkUpdate(self.jsumdatabase,
+                                        dict((docID, jobSummaryTransitionUpdate(transitions))
+                                             for docID, transitions in summaryTransitions.iteritems()))
+        nStates = sum([len(stateTransitions[docID]) for docID in jobDocs])
+        nSummaryStates = sum([len(summaryTransitions[docID]) for docID in jobSummaries])
+        self.couchStats["transitions"] += nStates + nSummaryStates
+        logging.debug("Recorded %d job state and %d job summary state transitions", nStates, nSummaryStates)
+
+        # current job summaries of the jobs that get a new one
+        summaryIDs = set([job["name"] for job, couchDocID in fwjrJobs
+                          if couchDocID is not None and (job["retry_count"] > 0 or newstate != 'success')])
+        jobSummaries.update(self._loadDocuments(self.jsumdatabase, summaryIDs.difference(jobSummaries)))
+
+        for job, couchDocID in fwjrJobs:
+            cachedByWorkflow = self.workloadCache.setdefault(job['workflow'], 
+                                        getDataFromSpecFile(
+                                         self.getWorkflowSpecDAO.execute(job['task'])[job['task']]['spec']))
+            job['fwjr'].setCampaign(cachedByWorkflow.get('Campaign', ''))
+            job['fwjr'].setPrepID(cachedByWorkflow.get(job['task'], ''))
+            # If there are too many input files, strip them out
+            # of the FWJR, as they should already
+            # be in the database
+            # This is not critical
+            try:
+                if len(job['fwjr'].getAllInputFiles()) > self.maxUploadedInputFiles:
+                    job['fwjr'].stripInputFiles()
+            except Exception as ex:
+                logging.error("Error while trying to strip input files from FWJR.  Ignoring. : %s", str(ex))
 
-                if newstate == "retrydone":
-                    jobState = "jobfailed"
-                else:
-                    jobState = newstate
-
-                # there is race condition updating couch record location and job is completed.
-                # for the fast fail job, it could miss the location update
-                job["location"] = job["fwjr"].getSiteName() or job.get("location", "Unknown")
-                # complete fwjr document
-                job["fwjr"].setTaskName(job["task"])
-                jsonFWJR = job["fwjr"].__to_json__(None)
-
-                #Don't archive cleanup job report
-                if job["jobType"] == "Cleanup":
-                    archStatus = "skip"
+            if newstate == "retrydone":
+                jobState = "jobfailed"
+            else:
+                jobState = newstate
+
+            # there is race condition updating couch record location and job is completed.
+            # for the fast fail job, it could miss the location update
+            job["location"] = job["fwjr"].getSiteName() or job.get("location", "Unknown")
+            # complete fwjr document
+            job["fwjr"].setTaskName(job["task"])
+            jsonFWJR = job["fwjr"].__to_json__(None)
+
+            #Don't archive cleanup job report
+            if job["jobType"] == "Cleanup":
+                archStatus = "skip"
+            else:
+                archStatus = "ready"
+
+            fwjrDocument = {"_id": "%s-%s" % (job["id"], job["retry_count"]),
+                            "jobid": job["id"],
+                            "jobtype": job["jobType"],
+                            "jobstate": jobState,
+                            "retrycount": job["retry_count"],
+                            "archivestatus": archStatus,
+                            "fwjr": jsonFWJR,
+                            "type": "fwjr"}
+            self.fwjrdatabase.queue(fwjrDocument, timestamp = True, callback = discardConflictingDocument)
+
+            updateSummaryDB(self.statsumdatabase, job)
+
+            #TODO: can add config switch to swich on and off
+            # if self.config.JobSateMachine.propagateSuccessJobs or (job["retry_count"] > 0) or (newstate != 'success'):
+            if (job["retry_count"] > 0) or (newstate != 'success'):
+                jobSummaryId = job["name"]
+                # building a summary of fwjr
+                logging.debug("Pushing job summary for job %s", jobSummaryId)
+                errmsgs = {}
+                inputs = []
+                if "steps" in fwjrDocument["fwjr"]:
+                    for step in fwjrDocument["fwjr"]["steps"]:
+                        if "errors" in fwjrDocument["fwjr"]["steps"][step]:
+                            errmsgs[step] = [error for error in fwjrDocument["fwjr"]["steps"][step]["errors"]]
+                        if "input" in fwjrDocument["fwjr"]["steps"][step] and "source" in fwjrDocument["fwjr"]["steps"][step]["input"]:
+                            inputs.extend( [source["runs"] for source in fwjrDocument["fwjr"]['steps'][step]["input"]["source"] if "runs" in source] )
+
+                outputs = []
+                outputDataset = None
+                for singlestep in job["fwjr"].listSteps():
+                    for singlefile in job["fwjr"].getAllFilesFromStep(step=singlestep):
+                        if singlefile:
+                            outputs.append({'type': 'output' if CMSSTEP.match(singlestep) else singlefile.get('module_label', None),
+                                            'lfn': singlefile.get('lfn', None),
+                                            'location': list(singlefile.get('locations', set([]))) if len(singlefile.get('locations', set([]))) > 1
+                                                                                                   else singlefile['locations'].pop(),
+                                            'checksums': singlefile.get('checksums', {}),
+                                            'size': singlefile.get('size', None) })
+                            #it should have one output dataset for all the files
+                            outputDataset = singlefile.get('dataset', None) if not outputDataset else outputDataset
+                inputFiles = []
+                for inputFileStruct in job["fwjr"].getAllInputFiles():
+                    # check if inputFileSummary needs to be extended
+                    inputFileSummary = {}
+                    inputFileSummary["lfn"] = inputFileStruct["lfn"]
+                    inputFileSummary["input_type"] = inputFileStruct["input_type"]
+                    inputFiles.append(inputFileSummary)
+
+                # Don't record intermediate jobfailed status in the jobsummary
+                # change to jobcooloff which will be overwritten by error handler anyway
+                if (job["retry_count"] > 0) and (newstate == 'jobfailed'):
+                    summarystate = 'jobcooloff'
                 else:
-                    archStatus = "ready"
-
-                fwjrDocument = {"_id": "%s-%s" % (job["id"], job["retry_count"]),
-                                "jobid": job["id"],
-                                "jobtype": job["jobType"],
-                                "jobstate": jobState,
-                                "retrycount": job["retry_count"],
-                                "archivestatus": archStatus,
-                                "fwjr": jsonFWJR,
-                                "type": "fwjr"}
-                self.fwjrdatabase.queue(fwjrDocument, timestamp = True, callback = discardConflictingDocument)
-
-                updateSummaryDB(self.statsumdatabase, job)
-
-                #TODO: can add config switch to swich on and off
-                # if self.config.JobSateMachine.propagateSuccessJobs or (job["retry_count"] > 0) or (newstate != 'success'):
-                if (job["retry_count"] > 0) or (newstate != 'success'):
-                    jobSummaryId = job["name"]
-                    # building a summary of fwjr
-                    logging.debug("Pushing job summary for job %s", jobSummaryId)
-                    errmsgs = {}
-                    inputs = []
-                    if "steps" in fwjrDocument["fwjr"]:
-                        for step in fwjrDocument["fwjr"]["steps"]:
-                            if "errors" in fwjrDocument["fwjr"]["steps"][step]:
-                                errmsgs[step] = [error for error in fwjrDocument["fwjr"]["steps"][step]["errors"]]
-                            if "input" in fwjrDocument["fwjr"]["steps"][step] and "source" in fwjrDocument["fwjr"]["steps"][step]["input"]:
-                                inputs.extend( [source["runs"] for source in fwjrDocument["fwjr"]['steps'][step]["input"]["source"] if "runs" in source] )
-
-                    outputs = []
-                    outputDataset = None
-                    for singlestep in job["fwjr"].listSteps():
-                        for singlefile in job["fwjr"].getAllFilesFromStep(step=singlestep):
-                            if singlefile:
-                                outputs.append({'type': 'output' if CMSSTEP.match(singlestep) else singlefile.get('module_label', None),
-                                                'lfn': singlefile.get('lfn', None),
-                                                'location': list(singlefile.get('locations', set([]))) if len(singlefile.get('locations', set([]))) > 1
-                                                                                                       else singlefile['locations'].pop(),
-                                                'checksums': singlefile.get('checksums', {}),
-                                                'size': singlefile.get('size', None) })
-                                #it should have one output dataset for all the files
-                                outputDataset = singlefile.get('dataset', None) if not outputDataset else outputDataset
-                    inputFiles = []
-                    for inputFileStruct in job["fwjr"].getAllInputFiles():
-                        # check if inputFileSummary needs to be extended
-                        inputFileSummary = {}
-                        inputFileSummary["lfn"] = inputFileStruct["lfn"]
-                        inputFileSummary["input_type"] = inputFileStruct["input_type"]
-                        inputFiles.append(inputFileSummary)
-
-                    # Don't record intermediate jobfailed status in the jobsummary
-                    # change to jobcooloff which will be overwritten by error handler anyway
-                    if (job["retry_count"] > 0) and (newstate == 'jobfailed'):
-                        summarystate = 'jobcooloff'
-                    else:
-                        summarystate = newstate
-
-                    jobSummary = {"_id": jobSummaryId,
-                                  "wmbsid": job["id"],
-                                  "type": "jobsummary",
-                                  "retrycount": job["retry_count"],
-                                  "workflow": job["workflow"],
-                                  "task": job["task"],
-                                  "jobtype": job["jobType"],
-                                  "state": summarystate,
-                                  "site": job.get("location", None),
-                                  "cms_location": job["fwjr"].getSiteName(),
-                                  "exitcode": job["fwjr"].getExitCode(),
-                                  "eos_log_url": job["fwjr"].getLogURL(),
-                                  "worker_node_info": job["fwjr"].getWorkerNodeInfo(),
-                                  "errors": errmsgs,
-                                  "lumis": inputs,
-                                  "outputdataset": outputDataset,
-                                  "inputfiles": inputFiles,
-                                  "acdc_url": "%s/%s" % (sanitizeURL(self.config.ACDC.couchurl)['url'], self.config.ACDC.database),
-                                  "agent_name": self.config.Agent.hostName,
-                                  "output": outputs }
-                    if couchDocID is not None:
-                        try:
-                            currentJobDoc = self.jsumdatabase.document(id = jobSummaryId)
-                            jobSummary['_rev'] = currentJobDoc['_rev']
-                            jobSummary['state_history'] = currentJobDoc.get('state_history', [])
-                            # record final status transition
-                            if newstate == 'success':
-                                finalStateDict = {'oldstate': oldstate,
-                                                  'newstate': newstate,
-                                                  'location': job["location"],
-                                                  'timestamp': timestamp}
-                                jobSummary['state_history'].append(finalStateDict)
-
-                            noEmptyList = ["inputfiles", "lumis"]
-                            for prop in noEmptyList:
-                                jobSummary[prop] = jobSummary[prop] if jobSummary[prop] else currentJobDoc.get(prop, [])
-                        except CouchNotFoundError:
-                            pass
-                    self.jsumdatabase.queue(jobSummary, timestamp = True)
+                    summarystate = newstate
+
+                jobSummary = {"_id": jobSummaryId,
+                              "wmbsid": job["id"],
+                              "type": "jobsummary",
+                              "retrycount": job["retry_count"],
+                              "workflow": job["workflow"],
+                              "task": job["task"],
+                              "jobtype": job["jobType"],
+                              "state": summarystate,
+                              "site": job.get("location", None),
+                              "cms_location": job["fwjr"].getSiteName(),
+                              "exitcode": job["fwjr"].getExitCode(),
+                              "eos_log_url": job["fwjr"].getLogURL(),
+                              "worker_node_info": job["fwjr"].getWorkerNodeInfo(),
+                              "errors": errmsgs,
+                              "lumis": inputs,
+                              "outputdataset": outputDataset,
+                              "inputfiles": inputFiles,
+                              "acdc_url": "%s/%s" % (sanitizeURL(self.config.ACDC.couchurl)['url'], self.config.ACDC.database),
+                              "agent_name": self.config.Agent.hostName,
+                              "output": outputs }
+                if couchDocID is not None and jobSummaryId in jobSummaries:
+                    currentJobDoc = jobSummaries[jobSummaryId]
+                    jobSummary['_rev'] = currentJobDoc['_rev']
+                    jobSummary['state_history'] = currentJobDoc.get('state_history', [])
+                    # record final status transition
+                    if newstate == 'success':
+                        finalStateDict = {'oldstate': oldstate,
+                                          'newstate': newstate,
+                                          'location': job["location"],
+                                          'timestamp': timestamp}
+                        jobSummary['state_history'].append(finalStateDict)
+
+                    noEmptyList = ["inputfiles", "lumis"]
+                    for prop in noEmptyList:
+                        jobSummary[prop] = jobSummary[prop] if jobSummary[prop] else currentJobDoc.get(prop, [])
+                self.jsumdatabase.queue(jobSummary, timestamp = True)
 
         if len(couchRecordsToUpdate) > 0:
             self.setCouchDAO.execute(bulkList = couchRecordsToUpdate,
                                      conn = self.getDBConn(),
                                      transaction = self.existingTransaction())
 
-        self.jobsdatabase.commit(callback = discardConflictingDocument)
-        self.fwjrdatabase.commit(callback = discardConflictingDocument)
+        if self.asyncCouchCommits:
+            self.jobsdatabase.commitAsync(callback = discardConflictingDocument)
+            self.fwjrdatabase.commitAsync(callback = discardConflictingDocument)
+        else:
+            self.jobsdatabase.commit(callback = discardConflictingDocument)
+            self.fwjrdatabase.commit(callback = discardConflictingDocument)
         self.jsumdatabase.commit()
         return
 
@@ -600,12 +752,16 @@ class ChangeState(WMObject, WMConnectionBase):
             couchIDs = self.getCouchDAO.execute(jobIDs, conn = self.getDBConn(),
                                                 transaction = self.existingTransaction())
             locationCache = dict((x['jobid'], x['location']) for x in jobs)
-            for entry in couchIDs:
-                couchRecord = entry['couch_record']
-                location = locationCache[entry['jobid']]
-                updateUri = "/" + self.jobsdatabase.name + "/_design/JobDump/_update/locationTransition/" + couchRecord
-                updateUri += "?location=%s" % (location)
-                self.jobsdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
+            updates = dict((entry['couch_record'], locationTransitionUpdate(locationCache[entry['jobid']]))
+                           for entry in couchIDs if entry['couch_record'] is not None)
+
+            startTime = time.time()
+            startRequests = self._couchRequestCount()
+            try:
+                self.couchStats["transitions"] += len(self._bulkUpdate(self.jobsdatabase, updates))
+            finally:
+                self.couchStats["time"] += time.time() - startTime
+                self.couchStats["requests"] += self._couchRequestCount() - startRequests
         except Exception as ex:
             logging.error("Error updating job in couch: %s", str(ex))
             logging.error(traceback.format_exc())
@@ -49,13 +49,13 @@ uConfig = UnifiedConfiguration()
 def dbsInfo(datasets):
     "Provides DBS info about dataset blocks"
     urls = ['%s/blocks?detail=True&dataset=%s' % (dbsUrl(), d) for d in datasets]
-    data = multi_getdata(urls, ckey(), cert())
+    data = multi_getdata(urls, ckey(), cert(), decode=json.loads)
     datasetBlocks = {}
     datasetSizes = {}
 #     nblocks = 0
     for row in data:
         dataset = row['url'].split('=')[-1]
-        rows = json.loads(row['data'])
+        rows = row['data']
         blocks = []
         size = 0
         for item in rows:
@@ -72,10 +72,10 @@ def dbsInfo(datasets):
 def phedexInfo(datasets):
     "Fetch PhEDEx info about nodes for all datasets"
     urls = ['%s/blockreplicasummary?dataset=%s' % (phedexUrl(), d) for d in datasets]
-    data = multi_getdata(urls, ckey(), cert())
+    data = multi_getdata(urls, ckey(), cert(), decode=json.loads)
     blockNodes = {}
     for row in data:
-        rows = json.loads(row['data'])
+        rows = row['data']
         for item in rows['phedex']['block']:
             nodes = [r['node'] for r in item['replica'] if r['complete'] == 'y']
             blockNodes[item['name']] = nodes
@@ -145,12 +145,12 @@ def eventsLumisInfo(inputs, validFileOnly=0, sumOverLumi=0):
     urls = ['%s/filesummaries?validFileOnly=%s&sumOverLumi=%s&%s=%s' \
             % (dbsUrl(), validFileOnly, sumOverLumi, what, urllib.quote(i)) \
             for i in inputs]
-    data = multi_getdata(urls, ckey(), cert())
+    data = multi_getdata(urls, ckey(), cert(), decode=json.loads)
     for row in data:
         key = row['url'].split('=')[-1]
         if what == 'block_name':
             key = urllib.unquote(key)
-        rows = json.loads(row['data'])
+        rows = row['data']
         for item in rows:
             eventsLumis[key] = item
     return eventsLumis
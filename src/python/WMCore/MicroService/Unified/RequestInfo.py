@@ -150,13 +150,14 @@ def taskDescending(node, select=None):
 def getRequestWorkflows(requestNames):
     "Helper function to get all specs for given set of request names"
     urls = [str('%s/data/request/%s' % (reqmgrUrl(), r)) for r in requestNames]
-    data = multi_getdata(urls, ckey(), cert())
+    data = multi_getdata(urls, ckey(), cert(), decode=json.loads)
     rdict = {}
     for row in data:
         req = row['url'].split('/')[-1]
         try:
-            data = json.loads(row['data'])
-            rdict[req] = data['result'][0]  # we get back {'result': [workflow]} dict
+            if 'error' in row:
+                raise ValueError(row['error'])
+            rdict[req] = row['data']['result'][0]  # we get back {'result': [workflow]} dict
         except Exception as exp:
             print("ERROR: fail to load data as json record, error=%s" % str(exp))
             print(row)
@@ -166,11 +167,11 @@ def getRequestWorkflows(requestNames):
 def getRequestSpecs(requestNames):
     "Helper function to get all specs for given set of request names"
     urls = [str('%s/%s/spec' % (reqmgrCacheUrl(), r)) for r in requestNames]
-    data = multi_getdata(urls, ckey(), cert())
+    data = multi_getdata(urls, ckey(), cert(), decode=pickle.loads)
     rdict = {}
     for row in data:
         req = row['url'].split('/')[-2]
-        rdict[req] = pickle.loads(row['data'])
+        rdict[req] = row['data']
     return rdict
 
 
@@ -9,6 +9,7 @@ Original code: https://github.com/CMSCompOps/WmAgentScripts/Unified
 from __future__ import print_function, division
 
 # syste modules
+import itertools
 import json
 import tempfile
 import traceback
@@ -96,18 +97,18 @@ class SiteCache(with_metaclass(Singleton, object)):
             if 'gwmsmon' in url:
                 cern_sso_cookie(url, tfile.name, cert(), ckey())
                 cookie.update({url: tfile.name})
-        gen = multi_getdata(urls, ckey(), cert(), cookie=cookie)
+        # Detox provides plain text, all the other services JSON
+        jsonUrls = [url for url in urls if 'Detox' not in url]
+        textUrls = [url for url in urls if 'Detox' in url]
+        gen = itertools.chain(multi_getdata(jsonUrls, ckey(), cert(), cookie=cookie, decode=json.loads),
+                              multi_getdata(textUrls, ckey(), cert(), cookie=cookie))
         siteInfo = {}
         for row in gen:
-            if 'Detox' in row['url']:
-                data = row['data']
-            else:
-                try:
-                    data = json.loads(row['data'])
-                except Exception:
-                    traceback.print_exc()
-                    print(row)
-                    data = {}
+            data = row['data']
+            if 'error' in row:
+                print("ERROR: fail to fetch %s, error=%s" % (row['url'], row['error']))
+                print(row)
+                data = {}
             if 'ssb' in row['url']:
                 for ssbid in ssbids:
                     if ssbid in row['url']:
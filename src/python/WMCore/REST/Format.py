@@ -2,9 +2,11 @@ from __future__ import print_function
 
 import hashlib
 import json
+import threading
 import types
 import xml.sax.saxutils
 import zlib
+from collections import OrderedDict
 from traceback import format_exc
 
 import cherrypy
@@ -223,11 +225,22 @@ class JSONFormat(RESTFormat):
     final trailer line consisting of "``]}``". Each line is generated as a
     HTTP transfer chunk. This format is fixed so readers can be constructed
     to read and parse the stream incrementally one line at a time,
-    facilitating maximum throughput processing of the response."""
+    facilitating maximum throughput processing of the response.
+
+    If `chunk_size` is given at the formatter construction time, the lines
+    of the objects are instead coalesced into HTTP transfer chunks of about
+    `chunk_size` bytes, still made of whole lines. The output, and hence
+    the ETag, is the same, but responses with very many small objects are
+    formatted and sent with far fewer chunks and digest updates."""
+
+    def __init__(self, chunk_size=0):
+        self.chunk_size = chunk_size
 
     def stream_chunked(self, stream, etag, preamble, trailer):
         """Generator for actually producing the output."""
         comma = " "
+        pending = []
+        npending = 0
 
         try:
             if preamble:
@@ -236,13 +249,20 @@ class JSONFormat(RESTFormat):
 
             try:
                 for obj in stream:
-                    chunk = comma + json.dumps(obj) + "\n"
-                    etag.update(chunk)
-                    yield chunk
+                    line = comma + json.dumps(obj) + "\n"
                     comma = ","
+                    pending.append(line)
+                    npending += len(line)
+                    if npending >= self.chunk_size:
+                        chunk = "".join(pending)
+                        pending = []
+                        npending = 0
+                        etag.update(chunk)
+                        yield chunk
             except GeneratorExit:
                 etag.invalidate()
                 trailer = None
+                pending = []
                 raise
             except Exception as exp:
                 print("ERROR, json.dumps failed to serialize %s, type %s\nException: %s" \
@@ -250,8 +270,11 @@ class JSONFormat(RESTFormat):
                 raise
             finally:
                 if trailer:
-                    etag.update(trailer)
-                    yield trailer
+                    pending.append(trailer)
+                if pending:
+                    chunk = "".join(pending)
+                    etag.update(chunk)
+                    yield chunk
 
             cherrypy.response.headers["X-REST-Status"] = 100
         except RESTError as e:
@@ -449,8 +472,17 @@ def _stream_compress_deflate(reply, compress_level, max_chunk):
     is guaranteed to expand at the exact same chunk boundaries as original
     reply stream."""
 
-    # Create zlib compression object, with raw data stream (negative window size)
-    z = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS,
+    # Raw data stream, without zlib header (negative window size)
+    return _stream_compress_zlib(reply, compress_level, max_chunk, -zlib.MAX_WBITS)
+
+def _stream_compress_gzip(reply, compress_level, max_chunk):
+    """Streaming compressor for the 'gzip' method, same as 'deflate' but
+    with the gzip header and trailer."""
+    return _stream_compress_zlib(reply, compress_level, max_chunk, 16 + zlib.MAX_WBITS)
+
+def _stream_compress_zlib(reply, compress_level, max_chunk, wbits):
+    """Streaming zlib compressor with window size `wbits`."""
+    z = zlib.compressobj(compress_level, zlib.DEFLATED, wbits,
                          zlib.DEF_MEM_LEVEL, 0)
 
     # Data pending compression. We only take entire chunks from original
@@ -475,9 +507,23 @@ def _stream_compress_deflate(reply, compress_level, max_chunk):
 # : Stream compression methods.
 _stream_compressor = {
   'identity': _stream_compress_identity,
-  'deflate': _stream_compress_deflate
+  'deflate': _stream_compress_deflate,
+  'gzip': _stream_compress_gzip
 }
 
+def _accepted_encoding(available, compress_level):
+    """Return the first compression method requested via Accept-Encoding
+    request header and granted by `available` methods, None if there's
+    none or `compress_level` disables compression."""
+    for enc in cherrypy.request.headers.elements('Accept-Encoding'):
+        if enc.value not in available:
+            continue
+
+        elif enc.value in _stream_compressor and compress_level > 0:
+            return enc.value
+
+    return None
+
 def stream_compress(reply, available, compress_level, max_chunk):
     """If compression has been requested via Accept-Encoding request header,
     and is granted for this response via `available` compression methods,
@@ -488,22 +534,26 @@ def stream_compress(reply, available, compress_level, max_chunk):
     compression entirely."""
 
     global _stream_compressor
-    for enc in cherrypy.request.headers.elements('Accept-Encoding'):
-        if enc.value not in available:
-            continue
-
-        elif enc.value in _stream_compressor and compress_level > 0:
-            # Add 'Vary' header for 'Accept-Encoding'.
-            vary_by('Accept-Encoding')
+    enc = _accepted_encoding(available, compress_level)
+    if enc:
+        # Add 'Vary' header for 'Accept-Encoding'.
+        vary_by('Accept-Encoding')
 
-            # Compress contents at original chunk boundaries.
-            if 'Content-Length' in cherrypy.response.headers:
-                del cherrypy.response.headers['Content-Length']
-            cherrypy.response.headers['Content-Encoding'] = enc.value
-            return _stream_compressor[enc.value](reply, compress_level, max_chunk)
+        # Compress contents at original chunk boundaries.
+        if 'Content-Length' in cherrypy.response.headers:
+            del cherrypy.response.headers['Content-Length']
+        cherrypy.response.headers['Content-Encoding'] = enc
+        return _stream_compressor[enc](reply, compress_level, max_chunk)
 
     return reply
 
+def _etag_conditions():
+    """Return the If-Match and If-None-Match request header values."""
+    req = cherrypy.request
+    match = [str(x) for x in (req.headers.elements('If-Match') or [])]
+    nomatch = [str(x) for x in (req.headers.elements('If-None-Match') or [])]
+    return match, nomatch
+
 def _etag_match(status, etagval, match, nomatch):
     """Match ETag value against any If-Match / If-None-Match headers."""
     # Execute conditions only for status 2xx. We only handle GET/HEAD
@@ -552,10 +602,8 @@ def stream_maybe_etag(size_limit, etag, reply):
     as it normally would be, the `size_limit` constrains the compressed
     size, and chunk boundaries correspond to compressed chunks."""
 
-    req = cherrypy.request
     res = cherrypy.response
-    match = [str(x) for x in (req.headers.elements('If-Match') or [])]
-    nomatch = [str(x) for x in (req.headers.elements('If-None-Match') or [])]
+    match, nomatch = _etag_conditions()
 
     # If ETag is already set, match conditions and output without buffering.
     etagval = res.headers.get('ETag', None)
@@ -602,3 +650,83 @@ def stream_maybe_etag(size_limit, etag, reply):
     result = "".join(result)
     assert len(result) == size
     return result
+
+class ResponseCache(object):
+    """Cache of fully rendered responses of an API.
+
+    Use with the ``cache`` keyword argument to :func:`~.restcall`. Responses
+    to GET and HEAD requests are keyed by the API, its validated arguments,
+    the output format, and the data version returned by `version()`, for
+    example a database update sequence number. When the data changes the old
+    responses simply stop matching; `version()` returning None disables the
+    cache for the request.
+
+    A cached response is replied as a plain string without calling the API
+    or formatting its output again. Its ETag is matched against If-Match /
+    If-None-Match request headers, and it is compressed once per content
+    encoding requested by clients. Responses which fail or are larger than
+    `max_size` bytes are not cached. At most `max_entries` responses are
+    kept, the least recently used ones are dropped first."""
+
+    def __init__(self, version, max_entries=100, max_size=64 * 1024 * 1024):
+        self.version = version
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, api, safe, format):
+        """Return the cache key of a request, None if it isn't cacheable."""
+        version = self.version()
+        if version is None:
+            return None
+        return (api, repr(safe.args), repr(sorted(safe.kwargs.items())), format, version)
+
+    def get(self, key):
+        """Return the cached response for `key`, None if there is none."""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.entries[key] = entry
+            return entry
+
+    def store(self, key, reply, etag):
+        """Generator passing through the formatted `reply`, caching it for
+        `key` once it has been entirely and successfully produced."""
+        body = []
+        size = 0
+        for chunk in reply:
+            if body is not None:
+                body.append(chunk)
+                size += len(chunk)
+                if size > self.max_size:
+                    body = None
+            yield chunk
+
+        res = cherrypy.response
+        etagval = res.headers.get('ETag', None) or etag.value()
+        if body is not None and etagval and not res.headers.get('X-Error-HTTP', None):
+            with self.lock:
+                self.entries[key] = {'etag': etagval, 'identity': "".join(body)}
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+    def reply(self, entry, available, compress_level):
+        """Reply the cached response `entry`, compressed with the encoding
+        negotiated as for `stream_compress()`."""
+        res = cherrypy.response
+        res.headers['ETag'] = entry['etag']
+        match, nomatch = _etag_conditions()
+        _etag_match(res.status or 200, entry['etag'], match, nomatch)
+
+        body = entry['identity']
+        enc = _accepted_encoding(available, compress_level)
+        if enc:
+            vary_by('Accept-Encoding')
+            res.headers['Content-Encoding'] = enc
+            if enc not in entry:
+                entry[enc] = "".join(_stream_compressor[enc]([body], compress_level, len(body) + 1))
+            body = entry[enc]
+
+        res.headers['Content-Length'] = len(body)
+        return body
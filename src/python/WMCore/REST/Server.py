@@ -501,6 +501,14 @@ class MiniRESTApi:
     These can be tuned per API with ``cherrypy.tools.expires(secs=n)``, or
     ``expires`` and ``expires_opts`` :func:`restcall` keyword arguments.
 
+    APIs whose responses are expensive to produce and depend only on their
+    arguments and some data version, e.g. a database update sequence, can
+    also keep their rendered responses in a :class:`~.ResponseCache` given
+    with the ``cache`` :func:`restcall` keyword argument. Cached responses
+    are replied without calling the API at all, with the ETag and the
+    compressed body computed when the response was first produced. Headers
+    set by the API itself are not replayed, only the expire headers above.
+
     .. rubric:: Notes
 
     .. note:: Only GET and HEAD requests are allowed to have a query string.
@@ -583,7 +591,7 @@ class MiniRESTApi:
 
        A list of accepted compression mechanisms to be matched against the
        "Accept-Encoding" HTTP request header. Currently supported values are
-       ``deflate`` and ``identity``. Using ``identity`` or emptying the list
+       ``deflate``, ``gzip`` and ``identity``. Using ``identity`` or emptying the list
        disables compression. The default is ``['deflate']``. Change this only
        for API mount points which are known to generate incompressible output,
        using ``compression`` keyword argument to :func:`restcall`.
@@ -783,16 +791,49 @@ class MiniRESTApi:
             v(apiobj, request.method, api, param, safe)
         validate_no_more_input(param)
 
+        # Reply from the API response cache if it has the response for these
+        # arguments and the current data version.
+        cache = apiobj.get('cache', None)
+        cachekey = None
+        if cache and (request.method == 'GET' or request.method == 'HEAD'):
+            cachekey = cache.key(api, safe, format)
+            entry = cachekey and cache.get(cachekey)
+            if entry:
+                vary_by('Accept')
+                self._set_expires(apiobj)
+                response.headers['X-REST-Status'] = 100
+                response.headers['Content-Type'] = format
+                return cache.reply(entry,
+                                   apiobj.get('compression', self.compression),
+                                   apiobj.get('compression_level', self.compression_level))
+
         # Invoke the method.
         obj = apiobj['call'](*safe.args, **safe.kwargs)
 
         # Add Vary: Accept header.
         vary_by('Accept')
 
-        # Set expires header if applicable. Note that POST/PUT/DELETE are not
-        # cacheable to begin with according to HTTP/1.1 specification. We must
-        # do this before actually streaming out the response below in case the
-        # ETag matching decides the previous response remains valid.
+        # Set expires header if applicable. We must do this before actually
+        # streaming out the response below in case the ETag matching decides
+        # the previous response remains valid.
+        self._set_expires(apiobj)
+
+        # Format the response.
+        response.headers['X-REST-Status'] = 100
+        response.headers['Content-Type'] = format
+        etagger = apiobj.get('etagger', None) or SHA1ETag()
+        reply = fmthandler(obj, etagger)
+        if cachekey:
+            reply = cache.store(cachekey, reply, etagger)
+        reply = stream_compress(reply,
+                                apiobj.get('compression', self.compression),
+                                apiobj.get('compression_level', self.compression_level),
+                                apiobj.get('compression_chunk', self.compression_chunk))
+        return stream_maybe_etag(apiobj.get('etag_limit', self.etag_limit), etagger, reply)
+
+    def _set_expires(self, apiobj):
+        """Set expires header if applicable. Note that POST/PUT/DELETE are not
+        cacheable to begin with according to HTTP/1.1 specification."""
         if request.method == 'GET' or request.method == 'HEAD':
             expires = self.default_expires
             cpcfg = getattr(apiobj['call'], '_cp_config', None)
@@ -811,16 +852,6 @@ class MiniRESTApi:
                 expires_opts = (expires_opts and ', '.join([''] + expires_opts)) or ''
                 response.headers['Cache-Control'] = 'max-age=%d%s' % (expires, expires_opts)
 
-        # Format the response.
-        response.headers['X-REST-Status'] = 100
-        response.headers['Content-Type'] = format
-        etagger = apiobj.get('etagger', None) or SHA1ETag()
-        reply = stream_compress(fmthandler(obj, etagger),
-                                apiobj.get('compression', self.compression),
-                                apiobj.get('compression_level', self.compression_level),
-                                apiobj.get('compression_chunk', self.compression_chunk))
-        return stream_maybe_etag(apiobj.get('etag_limit', self.etag_limit), etagger, reply)
-
     def _precall(self, param):
         """Point for derived classes to hook into prior to peeking at URL.
 
@@ -2339,6 +2370,7 @@ def restcall(func=None, args=None, generate="result", **kwargs):
     compression         "Accept-Encoding" methods, empty disables compression.
     compression_level   ZLIB compression level for output (0 .. 9).
     compression_chunk   Approximate amount of output to compress at once.
+    cache               :class:`~.ResponseCache` of the rendered responses.
     =================== ======================================================
 
     :returns: The original function suitably enriched with attributes if
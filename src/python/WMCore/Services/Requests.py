@@ -33,7 +33,7 @@ from WMCore.WMException import WMException
 from WMCore.Wrappers.JsonWrapper.JSONThunker import JSONThunker
 
 try:
-    from WMCore.Services.pycurl_manager import RequestHandler, ResponseHeader
+    from WMCore.Services.pycurl_manager import RequestHandler, ResponseHeader, getCurlHandlePool
 except ImportError:
     pass
 
@@ -66,6 +66,10 @@ class Requests(dict):
         """
         url should really be host - TODO fix that when have sufficient code
         coverage and change _getURLOpener if needed
+
+        With pycurl the curl handles are taken from a process wide pool with
+        pycurl_pool_size idle handles per host (0 disables the pool) that are
+        closed after pycurl_pool_timeout seconds without being used.
         """
         if not idict:
             idict = {}
@@ -73,7 +77,11 @@ class Requests(dict):
         self.pycurl = idict.get('pycurl', None)
         self.capath = idict.get('capath', None)
         if self.pycurl:
-            self.reqmgr = RequestHandler()
+            poolSize = idict.get('pycurl_pool_size', 10)
+            pool = None
+            if poolSize:
+                pool = getCurlHandlePool(poolSize, idict.get('pycurl_pool_timeout', 60))
+            self.reqmgr = RequestHandler({'pool': pool})
 
         # set up defaults
         self.setdefault("accept_type", 'text/html')
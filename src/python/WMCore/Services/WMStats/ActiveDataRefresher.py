@@ -0,0 +1,197 @@
+"""
+Keep the WMStats active data (the active requests with their latest agent
+job information, as returned by WMStatsReader.getActiveData) up to date by
+following the _changes feeds of the ReqMgr and WMStats databases, instead of
+reading all of it at each refresh.
+"""
+from __future__ import division, print_function
+
+import logging
+import time
+
+# filter of the WMStats _changes feed, agent request documents and deletions
+AGENT_REQUEST_FILTER = "WMStats/agentRequestFilter"
+
+
+class ActiveDataRefresher(object):
+    """
+    Incremental refresher of the active data.
+
+    The first refresh reads all the active data, after recording the update
+    sequence of both databases. The following ones only read the changes since
+    those sequences:
+      - changed request documents replace the cached ones, keeping their
+        agent job information, and requests which aren't active any more are
+        dropped. The job information of requests new to the cache is queried;
+      - changed agent request documents replace the cached ones when they are
+        newer, deleted ones get the job information of their request queried
+        again.
+
+    refresh returns a new dictionary every time, where only the changed
+    requests are new dictionaries, the others are shared with the previous
+    result and must not be modified. Any error during an incremental refresh
+    falls back to a full one.
+    """
+
+    def __init__(self, reader, changesLimit=1000, logger=None):
+        """
+        reader is a WMStatsReader with a ReqMgr database
+        """
+        self.reader = reader
+        self.changesLimit = changesLimit
+        self.logger = logger or logging.getLogger()
+        self.activeStatus = set(reader.ACTIVE_STATUS)
+        self.data = None
+        self.requestSeq = None
+        self.agentSeq = None
+        # agent request document id -> (workflow, agent url) of the cached ones
+        self.agentDocs = {}
+        self.stats = {"full": 0, "incremental": 0, "changedRequests": 0, "changedAgentDocs": 0,
+                      "lastRefreshTime": 0}
+
+    def refresh(self):
+        """
+        Return the up to date active data
+        """
+        startTime = time.time()
+        if self.data is None:
+            self.fullRefresh()
+        else:
+            try:
+                self.incrementalRefresh()
+            except Exception as ex:
+                self.logger.warning("Incremental refresh of the active data failed, reading all of it: %s",
+                                    str(ex))
+                self.fullRefresh()
+        self.stats["lastRefreshTime"] = time.time() - startTime
+        return self.data
+
+    def fullRefresh(self):
+        """
+        Read all the active data and the current update sequences
+        """
+        # sequences first, the changes happening during the read are applied again
+        requestSeq = self.reader.reqDB.couchDB.info()["update_seq"]
+        agentSeq = self.reader.couchDB.info()["update_seq"]
+        data = self.reader.getActiveData(jobInfoFlag=True)
+
+        self.agentDocs = {}
+        for workflow, reqDict in data.iteritems():
+            for agentURL, agentDoc in reqDict.get("AgentJobInfo", {}).iteritems():
+                self.agentDocs[agentDoc["_id"]] = (workflow, agentURL)
+        self.data = data
+        self.requestSeq = requestSeq
+        self.agentSeq = agentSeq
+        self.stats["full"] += 1
+        return
+
+    def incrementalRefresh(self):
+        """
+        Apply the changes since the last refresh to a copy of the active data
+        """
+        data = dict(self.data)
+        copied = set()
+        refetch = set()
+
+        requestChanges = self.reader.reqDB.couchDB.changes(self.requestSeq, includeDocs=True)
+        for row in requestChanges["results"]:
+            workflow = row["id"]
+            if workflow.startswith("_design/"):
+                continue
+            self.stats["changedRequests"] += 1
+            reqDict = row.get("doc")
+            if row.get("deleted") or not reqDict or reqDict.get("RequestStatus") not in self.activeStatus:
+                if workflow in data:
+                    self._forgetAgentDocs(data.pop(workflow))
+                continue
+            reqDict.pop("_rev", None)
+            reqDict.pop("_attachments", None)
+            if workflow in data:
+                if "AgentJobInfo" in data[workflow]:
+                    reqDict["AgentJobInfo"] = dict(data[workflow]["AgentJobInfo"])
+            else:
+                refetch.add(workflow)
+            data[workflow] = reqDict
+            copied.add(workflow)
+
+        agentSeq = self.agentSeq
+        while True:
+            agentChanges = self.reader.couchDB.changesWithFilter(AGENT_REQUEST_FILTER, self.changesLimit,
+                                                                 agentSeq, includeDocs=True)
+            for row in agentChanges["results"]:
+                self.stats["changedAgentDocs"] += 1
+                agentDoc = row.get("doc")
+                if row.get("deleted") or not agentDoc or agentDoc.get("_deleted"):
+                    self._removeAgentDoc(data, copied, row["id"], refetch)
+                    continue
+                if agentDoc.get("type") != "agent_request" or agentDoc.get("workflow") not in data:
+                    continue
+                self._updateAgentDoc(data, copied, agentDoc)
+            agentSeq = agentChanges["last_seq"]
+            if len(agentChanges["results"]) < self.changesLimit:
+                break
+
+        if refetch:
+            jobData = self.reader.getLatestJobInfoByRequests(list(refetch))
+            if jobData:
+                for row in jobData["rows"]:
+                    # ignore the documents deleted between calls
+                    if row.get("doc") and row["doc"]["workflow"] in data:
+                        self._updateAgentDoc(data, copied, row["doc"])
+
+        self.data = data
+        self.requestSeq = requestChanges["last_seq"]
+        self.agentSeq = agentSeq
+        self.stats["incremental"] += 1
+        return
+
+    def _writable(self, data, copied, workflow):
+        """
+        Return the request of data which can be modified, copying it and its
+        agent job information if it's shared with the previous data
+        """
+        if workflow not in copied:
+            reqDict = dict(data[workflow])
+            if "AgentJobInfo" in reqDict:
+                reqDict["AgentJobInfo"] = dict(reqDict["AgentJobInfo"])
+            data[workflow] = reqDict
+            copied.add(workflow)
+        return data[workflow]
+
+    def _updateAgentDoc(self, data, copied, agentDoc):
+        """
+        Put agentDoc in the job information of its request unless the cached
+        one of its agent is newer
+        """
+        workflow = agentDoc["workflow"]
+        agentURL = agentDoc["agent_url"]
+        current = data[workflow].get("AgentJobInfo", {}).get(agentURL)
+        if current is not None and current.get("timestamp", 0) > agentDoc.get("timestamp", 0):
+            return
+        reqDict = self._writable(data, copied, workflow)
+        reqDict.setdefault("AgentJobInfo", {})[agentURL] = agentDoc
+        if current is not None:
+            self.agentDocs.pop(current["_id"], None)
+        self.agentDocs[agentDoc["_id"]] = (workflow, agentURL)
+        return
+
+    def _removeAgentDoc(self, data, copied, docId, refetch):
+        """
+        Remove a deleted agent request document from the job information of its
+        request, which gets queried again for the previous document of the agent
+        """
+        key = self.agentDocs.pop(docId, None)
+        if key is None or key[0] not in data:
+            return
+        workflow, agentURL = key
+        reqDict = self._writable(data, copied, workflow)
+        reqDict["AgentJobInfo"].pop(agentURL, None)
+        if not reqDict["AgentJobInfo"]:
+            del reqDict["AgentJobInfo"]
+        refetch.add(workflow)
+        return
+
+    def _forgetAgentDocs(self, reqDict):
+        for agentDoc in reqDict.get("AgentJobInfo", {}).itervalues():
+            self.agentDocs.pop(agentDoc["_id"], None)
+        return
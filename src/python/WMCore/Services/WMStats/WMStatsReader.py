@@ -79,6 +79,9 @@ class WMStatsReader(object):
                         "AlcaSkim",
                         "completed"]
 
+    # up to this many requests, the job info is queried request by request
+    requestRangeLimit = 20
+
     def __init__(self, couchURL, appName="WMStats", reqdbURL=None, reqdbCouchApp="ReqMgr"):
         self._sanitizeURL(couchURL)
         # set the connection for local couchDB call
@@ -114,8 +117,14 @@ class WMStatsReader(object):
         jobInfoByRequestAndAgent = {}
 
         if len(requestNames) > 0:
-            requestAndAgentKey = self._getRequestAndAgent(requestNames)
-            jobDocIds = self._getLatestJobInfo(requestAndAgentKey)
+            if len(requestNames) <= self.requestRangeLimit:
+                # a few requests, query their own range instead of the whole view
+                jobDocIds = []
+                for requestName in requestNames:
+                    jobDocIds.extend(self._getLatestJobInfoByRequest(requestName))
+            else:
+                requestAndAgentKey = self._getRequestAndAgent(requestNames)
+                jobDocIds = self._getLatestJobInfo(requestAndAgentKey)
             jobInfoByRequestAndAgent = self._getAllDocsByIDs(jobDocIds)
         return jobInfoByRequestAndAgent
 
@@ -211,6 +220,7 @@ class WMStatsReader(object):
         if filterRequest is None:
             keys = [row['key'] for row in result["rows"]]
         else:
+            filterRequest = set(filterRequest)
             keys = [row['key'] for row in result["rows"] if row['key'][0] in filterRequest]
         return keys
 
@@ -228,6 +238,19 @@ class WMStatsReader(object):
         ids = [row['value']['id'] for row in result["rows"]]
         return ids
 
+    def _getLatestJobInfoByRequest(self, requestName):
+        """
+        returns the ids of the latest documents of each agent for requestName
+        """
+        options = {}
+        options["reduce"] = True
+        options["group"] = True
+        options["startkey"] = [requestName]
+        options["endkey"] = [requestName, {}]
+        result = self._getCouchView("latestRequest", options)
+        ids = [row['value']['id'] for row in result["rows"]]
+        return ids
+
     def _getAllDocsByIDs(self, ids, include_docs=True):
         """
         keys is [id, ....]
@@ -42,12 +42,18 @@ from __future__ import print_function
 import os
 import re
 import sys
+import collections
 import cStringIO as StringIO
+import heapq
 import httplib
 import json
 import logging
 import urllib
+import urlparse
 import subprocess
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 
 # python3
 if sys.version.startswith('3.'):
@@ -86,10 +92,163 @@ class ResponseHeader(object):
             except:
                 pass
 
+class CurlHandlePool(object):
+    """
+    Thread safe pool of reusable curl handles, kept per host (scheme and
+    network location of the url). A handle that goes back to the pool keeps
+    its open keep-alive connection, so the next request to the same host
+    doesn't pay the TCP and TLS setup again. All the handles share a DNS and
+    SSL session cache, so even new connections skip the DNS lookup and can
+    resume the TLS session.
+
+    At most size idle handles are kept per host, handles that have been idle
+    for more than idleTimeout seconds are closed instead of being reused.
+
+    The handles of the pool belong to the process that created them: after
+    a fork the child process starts again from an empty pool.
+    """
+    def __init__(self, size=10, idleTimeout=60):
+        super(CurlHandlePool, self).__init__()
+        self.size = size
+        self.idleTimeout = idleTimeout
+        self._handles = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        # handles inherited from the parent process
+        self._inherited = []
+        self._checkPid()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'discarded': 0,
+                       'connections': 0, 'reused_connections': 0}
+
+    def _checkPid(self):
+        """
+        (Re)build the pool if it was created by another process. The idle
+        handles inherited through a fork share their connections with the
+        parent process, they are kept aside but never used nor closed, since
+        closing them would also shut down the connections of the parent.
+        """
+        if self._pid == os.getpid():
+            return
+        self._inherited.extend(handle for idle in self._handles.values() for handle, _ in idle)
+        self._handles = {}
+        self._share = pycurl.CurlShare()
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+        self._pid = os.getpid()
+        return
+
+    @staticmethod
+    def host(url):
+        """Return the key of the pool a url belongs to"""
+        parts = urlparse.urlparse(url)
+        return '%s://%s' % (parts.scheme, parts.netloc)
+
+    def get(self, url):
+        """
+        Return a curl handle for the host of the given url, a pooled one if
+        there is one that isn't expired or a new one otherwise
+        """
+        now = time.time()
+        expired = []
+        curl = None
+        with self._lock:
+            self._checkPid()
+            idle = self._handles.get(self.host(url), [])
+            while idle:
+                handle, lastUsed = idle.pop()
+                if now - lastUsed > self.idleTimeout:
+                    expired.append(handle)
+                else:
+                    curl = handle
+                    break
+            self._stats['expired'] += len(expired)
+            self._stats['hits' if curl else 'misses'] += 1
+        for handle in expired:
+            handle.close()
+        if curl is None:
+            curl = pycurl.Curl()
+            # the share is kept when the handle is reset
+            curl.setopt(pycurl.SHARE, self._share)
+        return curl
+
+    def put(self, url, curl, connections=None):
+        """
+        Give a curl handle back to the pool after a request to the given url.
+        connections is the number of new connections the request made (the
+        NUM_CONNECTS info of the handle), 0 meaning an existing connection
+        was reused.
+        """
+        curl.reset()
+        with self._lock:
+            self._checkPid()
+            if connections is not None:
+                self._stats['connections' if connections else 'reused_connections'] += 1
+            idle = self._handles.setdefault(self.host(url), [])
+            if len(idle) < self.size:
+                idle.append((curl, time.time()))
+                curl = None
+            else:
+                self._stats['discarded'] += 1
+        if curl is not None:
+            curl.close()
+        return
+
+    def setopts(self, curl):
+        """Set the pool specific options on a handle"""
+        if hasattr(pycurl, 'TCP_KEEPALIVE'):
+            curl.setopt(pycurl.TCP_KEEPALIVE, 1)
+        return
+
+    def stats(self):
+        """
+        Return the pool counters: handles found in the pool (hits) or that had
+        to be created (misses), handles closed because they were idle for too
+        long (expired) or because the pool was full (discarded) and requests
+        that opened a new connection (connections) or reused one
+        (reused_connections)
+        """
+        with self._lock:
+            self._checkPid()
+            stats = dict(self._stats)
+            stats['idle'] = sum([len(idle) for idle in self._handles.values()])
+        return stats
+
+    def clear(self):
+        """Close all the idle handles"""
+        with self._lock:
+            self._checkPid()
+            handles = [handle for idle in self._handles.values() for handle, _ in idle]
+            self._handles = {}
+        for handle in handles:
+            handle.close()
+        return
+
+
+_curlPools = {}
+_curlPoolsLock = threading.Lock()
+
+
+def getCurlHandlePool(size=10, idleTimeout=60):
+    """
+    Return the process wide curl handle pool with the given settings, a new
+    one in a process forked after the pool of its parent was created
+    """
+    key = (os.getpid(), size, idleTimeout)
+    with _curlPoolsLock:
+        pool = _curlPools.get(key)
+        if pool is None:
+            pool = CurlHandlePool(size, idleTimeout)
+            _curlPools[key] = pool
+    return pool
+
+
 class RequestHandler(object):
     """
     RequestHandler provides APIs to fetch single/multiple
     URL requests based on pycurl library
+
+    With a CurlHandlePool in the pool config entry the curl handles (and
+    their keep-alive connections) are reused between requests.
     """
     def __init__(self, config=None, logger=None):
         super(RequestHandler, self).__init__()
@@ -100,6 +259,7 @@ class RequestHandler(object):
         self.connecttimeout = config.get('connecttimeout', 30)
         self.followlocation = config.get('followlocation', 1)
         self.maxredirs = config.get('maxredirs', 5)
+        self.pool = config.get('pool', None)
         self.logger = logger if logger else logging.getLogger()
 
     def encode_params(self, params, verb, doseq):
@@ -223,10 +383,21 @@ class RequestHandler(object):
                 verbose=0, ckey=None, cert=None, capath=None,
                 doseq=True, decode=False, cainfo=None, cookie=None):
         """Fetch data for given set of parameters"""
-        curl = pycurl.Curl()
+        if  self.pool:
+            curl = self.pool.get(url)
+            self.pool.setopts(curl)
+        else:
+            curl = pycurl.Curl()
         bbuf, hbuf = self.set_opts(curl, url, params, headers,
                 ckey, cert, capath, verbose, verb, doseq, cainfo, cookie)
-        curl.perform()
+        try:
+            curl.perform()
+        except pycurl.error:
+            # the handle may be left with a broken connection, don't reuse it
+            curl.close()
+            raise
+        if  self.pool:
+            self.pool.put(url, curl, curl.getinfo(pycurl.NUM_CONNECTS))
         if  verbose:
             print(verb, url, params, headers)
         header = self.parse_header(hbuf.getvalue())
@@ -337,119 +508,211 @@ def cern_sso_cookie(url, fname, cert, ckey):
     proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, env=os.environ)
     proc.wait()
 
-def getdata(urls, ckey, cert, headers=None, options=None, num_conn=100, cookie=None):
+def _decode_result(decode, result):
+    "Decode the body of a fetched url, a body that can't be decoded is an error"
+    try:
+        result['data'] = decode(result['data'])
+    except Exception as exc:
+        result['data'] = None
+        result['error'] = 'failed to decode data: %s' % str(exc)
+    return result
+
+class MultiFetcher(object):
     """
-    Get data for given list of urls, using provided number of connections
-    and user credentials
+    Fetch a list of urls concurrently over a CurlMulti stack of num_conn
+    handles. The urls wait in per host queues, served round robin, with at
+    most host_conn transfers in flight per host (no limit if None). A url
+    that fails with a curl error or a 5xx status is retried up to retries
+    times, waiting backoff, 2*backoff, 4*backoff... seconds between attempts.
+
+    Results are yielded as they complete, one per url, as dictionaries with
+    the url, data and headers, plus the error and code of the last attempt
+    for urls that couldn't be fetched. If a decode function is given (e.g.
+    json.loads) each body is decoded as soon as its transfer completes and
+    data holds the decoded value. Bodies are decoded in the fetching thread,
+    or by a pool of decode_threads threads while the other transfers go on;
+    with the GIL that only pays off for decoders which release it or slow
+    transfers. No new transfer is started while max_pending (num_conn by
+    default) bodies are waiting to be decoded, which bounds the memory held
+    by the fetcher.
     """
-
-    if not options:
-        options = pycurl_options()
-
-    # Make a queue with urls
-    queue = [u for u in urls if validate_url(u)]
-
-    # Check args
-    num_urls = len(queue)
-    num_conn = min(num_conn, num_urls)
-
-    # Pre-allocate a list of curl objects
-    mcurl = pycurl.CurlMulti()
-    mcurl.handles = []
-    for _ in range(num_conn):
+    def __init__(self, ckey, cert, headers=None, options=None, num_conn=100,
+                 cookie=None, host_conn=None, retries=0, backoff=1.0,
+                 decode=None, decode_threads=0, max_pending=None):
+        super(MultiFetcher, self).__init__()
+        self.ckey = ckey
+        self.cert = cert
+        self.headers = headers
+        self.options = options or pycurl_options()
+        self.num_conn = num_conn
+        self.cookie = cookie
+        self.host_conn = host_conn
+        self.retries = retries
+        self.backoff = backoff
+        self.decode = decode
+        self.decode_threads = decode_threads if decode else 0
+        self.max_pending = max_pending or num_conn
+
+    def make_curl(self):
+        "Create a curl handle with the fetcher options"
         curl = pycurl.Curl()
-        curl.fp = None
-        for key, val in options.items():
+        for key, val in self.options.items():
             curl.setopt(getattr(pycurl, key), val)
-        curl.setopt(pycurl.SSLKEY, ckey)
-        curl.setopt(pycurl.SSLCERT, cert)
-        mcurl.handles.append(curl)
-        if  headers:
+        curl.setopt(pycurl.SSLKEY, self.ckey)
+        curl.setopt(pycurl.SSLCERT, self.cert)
+        if  self.headers:
             curl.setopt(pycurl.HTTPHEADER, \
-                    ["%s: %s" % (k, v) for k, v in headers.items()])
+                    ["%s: %s" % (k, v) for k, v in self.headers.items()])
+        return curl
 
-    # Main loop
-    freelist = mcurl.handles[:]
-    num_processed = 0
-    while num_processed < num_urls:
-        # If there is an url to process and a free curl object,
-        # add to multi-stack
-        while queue and freelist:
-            url = queue.pop(0)
-            curl = freelist.pop()
-            curl.setopt(pycurl.URL, url.encode('ascii', 'ignore'))
-            if cookie and url in cookie:
-                curl.setopt(pycurl.COOKIEFILE, cookie[url])
-                curl.setopt(pycurl.COOKIEJAR, cookie[url])
-            if  sys.version.startswith('3.'):
-                bbuf = io.BytesIO()
-                hbuf = io.BytesIO()
-            else:
-                bbuf = StringIO.StringIO()
-                hbuf = StringIO.StringIO()
-            curl.setopt(pycurl.WRITEFUNCTION, bbuf.write)
-            curl.setopt(pycurl.HEADERFUNCTION, hbuf.write)
-            mcurl.add_handle(curl)
-            # store some info
-            curl.hbuf = hbuf
-            curl.bbuf = bbuf
-            curl.url = url
-        # Run the internal curl state machine for the multi stack
-        while True:
-            ret, _ = mcurl.perform()
-            if  ret != pycurl.E_CALL_MULTI_PERFORM:
-                break
-        # Check for curl objects which have terminated, and add them to the
-        # freelist
-        while True:
-            num_q, ok_list, err_list = mcurl.info_read()
-            for curl in ok_list:
-                if  sys.version.startswith('3.'):
-                    hdrs  = curl.hbuf.getvalue().decode('utf-8')
-                    data  = curl.bbuf.getvalue().decode('utf-8')
-                else:
-                    hdrs  = curl.hbuf.getvalue()
-                    data  = curl.bbuf.getvalue()
-                url   = curl.url
-                curl.bbuf.flush()
-                curl.bbuf.close()
-                curl.hbuf.close()
-                curl.hbuf = None
-                curl.bbuf = None
-                mcurl.remove_handle(curl)
-                freelist.append(curl)
-                yield {'url': url, 'data': data, 'headers': hdrs}
-            for curl, errno, errmsg in err_list:
-                hdrs  = curl.hbuf.getvalue()
-                data  = curl.bbuf.getvalue()
-                url   = curl.url
-                curl.bbuf.flush()
-                curl.bbuf.close()
-                curl.hbuf.close()
-                curl.hbuf = None
-                curl.bbuf = None
-                mcurl.remove_handle(curl)
-                freelist.append(curl)
-                yield {'url': url, 'data': None, 'headers': hdrs,\
-                        'error': errmsg, 'code': errno}
-            num_processed = num_processed + len(ok_list) + len(err_list)
-            if num_q == 0:
-                break
-        # Currently no more I/O is pending, could do something in the meantime
-        # (display a progress bar, etc.).
-        # We just call select() to sleep until some more data is available.
-        mcurl.select(1.0)
-
-    cleanup(mcurl)
+    def next_url(self, queues, active):
+        """
+        Pop the next url to fetch from the first host queue in round robin
+        order that is below its concurrency limit, None if there isn't any
+        """
+        for host in list(queues):
+            if  self.host_conn and active[host] >= self.host_conn:
+                continue
+            queue = queues.pop(host)
+            item = queue.popleft()
+            if  queue:
+                # move the host at the end of the round
+                queues[host] = queue
+            active[host] += 1
+            return item
+        return None
+
+    def start(self, mcurl, curl, url, attempt):
+        "Start the transfer of an url on a free curl handle"
+        curl.setopt(pycurl.URL, url.encode('ascii', 'ignore'))
+        if  self.cookie and url in self.cookie:
+            curl.setopt(pycurl.COOKIEFILE, self.cookie[url])
+            curl.setopt(pycurl.COOKIEJAR, self.cookie[url])
+        curl.bbuf = []
+        curl.hbuf = []
+        curl.setopt(pycurl.WRITEFUNCTION, curl.bbuf.append)
+        curl.setopt(pycurl.HEADERFUNCTION, curl.hbuf.append)
+        curl.url = url
+        curl.attempt = attempt
+        mcurl.add_handle(curl)
+
+    def finish(self, mcurl, curl, errno=None, errmsg=None):
+        """
+        Take a completed transfer off the multi stack, return its result and
+        whether it should be retried
+        """
+        hdrs = b''.join(curl.hbuf)
+        data = b''.join(curl.bbuf)
+        if  sys.version.startswith('3.'):
+            hdrs = hdrs.decode('utf-8')
+            data = data.decode('utf-8')
+        curl.hbuf = None
+        curl.bbuf = None
+        status = curl.getinfo(pycurl.RESPONSE_CODE) if errno is None else 0
+        mcurl.remove_handle(curl)
+        if  errno is not None:
+            result = {'url': curl.url, 'data': None, 'headers': hdrs, \
+                    'error': errmsg, 'code': errno}
+        else:
+            result = {'url': curl.url, 'data': data, 'headers': hdrs}
+        retry = (errno is not None or status >= 500) and curl.attempt < self.retries
+        return result, retry
+
+    def fetch(self, urls):
+        "Fetch the given urls, yield their results as they complete"
+        queues = collections.OrderedDict()
+        num_urls = 0
+        for url in urls:
+            if  validate_url(url):
+                queues.setdefault(CurlHandlePool.host(url), collections.deque()).append((url, 0))
+                num_urls += 1
+        if  not num_urls:
+            return
+
+        active = collections.defaultdict(int) # host -> transfers in flight
+        delayed = [] # heap of (due time, url, attempt) of urls to retry
+        decoded = collections.deque() # decoded results, filled by the pool
+        pending = 0 # bodies given to the pool and not yielded yet
+        mcurl = pycurl.CurlMulti()
+        mcurl.handles = [self.make_curl() for _ in range(min(self.num_conn, num_urls))]
+        freelist = mcurl.handles[:]
+        pool = ThreadPool(self.decode_threads) if self.decode_threads else None
+        num_processed = 0
+        try:
+            while num_processed < num_urls:
+                now = time.time()
+                while delayed and delayed[0][0] <= now:
+                    _, url, attempt = heapq.heappop(delayed)
+                    queues.setdefault(CurlHandlePool.host(url), collections.deque()).append((url, attempt))
+                # Start new transfers, unless too many bodies wait for decoding
+                while freelist and pending < self.max_pending:
+                    item = self.next_url(queues, active)
+                    if  item is None:
+                        break
+                    self.start(mcurl, freelist.pop(), *item)
+                # Run the internal curl state machine for the multi stack
+                while True:
+                    ret, _ = mcurl.perform()
+                    if  ret != pycurl.E_CALL_MULTI_PERFORM:
+                        break
+                # Collect the terminated transfers and give their curl
+                # objects back to the freelist
+                while True:
+                    num_q, ok_list, err_list = mcurl.info_read()
+                    done = [(curl, None, None) for curl in ok_list] + err_list
+                    for curl, errno, errmsg in done:
+                        result, retry = self.finish(mcurl, curl, errno, errmsg)
+                        freelist.append(curl)
+                        active[CurlHandlePool.host(curl.url)] -= 1
+                        if  retry:
+                            due = time.time() + self.backoff * 2 ** curl.attempt
+                            heapq.heappush(delayed, (due, curl.url, curl.attempt + 1))
+                        elif pool and 'error' not in result:
+                            pool.apply_async(_decode_result, (self.decode, result), \
+                                    callback=decoded.append)
+                            pending += 1
+                        else:
+                            if  self.decode and 'error' not in result:
+                                result = _decode_result(self.decode, result)
+                            num_processed += 1
+                            yield result
+                    if  num_q == 0:
+                        break
+                # Yield the decoded bodies
+                while decoded:
+                    pending -= 1
+                    num_processed += 1
+                    yield decoded.popleft()
+                # Sleep until there is some more data, a decoded body to
+                # yield or a url to retry
+                timeout = 0.001 if pending else 1.0
+                if  delayed:
+                    timeout = max(0, min(timeout, delayed[0][0] - time.time()))
+                if  len(freelist) < len(mcurl.handles):
+                    mcurl.select(timeout)
+                elif pending or delayed:
+                    time.sleep(timeout)
+        finally:
+            if  pool:
+                pool.terminate()
+            cleanup(mcurl)
+
+def getdata(urls, ckey, cert, headers=None, options=None, num_conn=100, cookie=None,
+            host_conn=None, retries=0, backoff=1.0, decode=None, decode_threads=0):
+    """
+    Get data for given list of urls, using provided number of connections
+    and user credentials, see MultiFetcher for the other arguments
+    """
+    fetcher = MultiFetcher(ckey, cert, headers=headers, options=options, \
+            num_conn=num_conn, cookie=cookie, host_conn=host_conn, \
+            retries=retries, backoff=backoff, decode=decode, \
+            decode_threads=decode_threads)
+    return fetcher.fetch(urls)
 
 def cleanup(mcurl):
     "Clean-up MultiCurl handles"
     for curl in mcurl.handles:
-        if  curl.hbuf is not None:
-            curl.hbuf.close()
-            curl.hbuf = None
-        if  curl.bbuf is not None:
-            curl.bbuf.close()
-            curl.bbuf = None
+        curl.hbuf = None
+        curl.bbuf = None
         curl.close()
     mcurl.close()
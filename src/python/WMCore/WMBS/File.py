@@ -8,10 +8,14 @@ A simple object representing a file in WMBS.
 import logging
 import threading
 
+from Utils.Patterns import LRUCache
 from WMCore.DataStructs.File import File as WMFile
 from WMCore.DataStructs.Run import Run
 from WMCore.WMBS.WMBSBase import WMBSBase
 
+# file id -> lfn, shared by the getFileLFNs(useCache=True) calls
+_fileLFNCache = LRUCache(maxsize=100000)
+
 
 class File(WMBSBase, WMFile):
     """
@@ -40,6 +44,33 @@ class File(WMBSBase, WMFile):
         self.setdefault("id", id)
         self['locations'] = set()
 
+    def __missing__(self, key):
+        """
+        _missing_
+
+        Files handed to a ChecksumLoader don't have checksums until the first
+        time they are looked up, which loads them for the whole batch.
+        """
+        checksumLoader = getattr(self, "checksumLoader", None)
+        if key == "checksums" and checksumLoader is not None:
+            checksumLoader.load(conn=self.getDBConn(),
+                                transaction=self.existingTransaction())
+            return self["checksums"]
+        raise KeyError(key)
+
+    def __getstate__(self):
+        """
+        __getstate__
+
+        Load the checksums deferred to a ChecksumLoader before the file is
+        pickled or copied, the loader and its database access can't follow it.
+        """
+        if getattr(self, "checksumLoader", None) is not None:
+            self.__missing__("checksums")
+        state = WMBSBase.__getstate__(self)
+        state.pop("checksumLoader", None)
+        return state
+
     def exists(self):
         """
         if id is exist (not -1) check with id first
@@ -100,39 +131,7 @@ class File(WMBSBase, WMFile):
         level indicates the level of ancestors. default value is 2
         (grand parents). level should be bigger than >= 1
         """
-        existingTransaction = self.beginTransaction()
-
-        def _getAncestorIDs(ids, level):
-            action = self.daofactory(classname="Files.GetParentIDsByID")
-            parentIDs = sorted(action.execute(ids, conn=self.getDBConn(), transaction=self.existingTransaction()))
-
-            if level == 1 or len(parentIDs) == 0:
-                return parentIDs
-            else:
-                return _getAncestorIDs(parentIDs, level - 1)
-
-        if self["id"] < 0:
-            self.load()
-
-        idList = _getAncestorIDs(self["id"], level)
-
-        if type == "id":
-            results = idList
-        elif type == "lfn":
-            results = []
-            for fileID in idList:
-                anceFile = File(id=fileID)
-                anceFile.load()
-                results.append(anceFile["lfn"])
-        elif type == "file":
-            results = []
-            for fileID in idList:
-                anceFile = File(id=fileID)
-                anceFile.load()
-                results.append(anceFile)
-
-        self.commitTransaction(existingTransaction)
-        return results
+        return self._getAncestry(level, type, descendants=False)
 
     def getDescendants(self, level=2, type="id"):
         """
@@ -140,36 +139,36 @@ class File(WMBSBase, WMFile):
         level indicates the level of ancestors. default value is 2
         (grand parents). level should be bigger than >= 1
         """
-        existingTransaction = self.beginTransaction()
+        return self._getAncestry(level, type, descendants=True)
 
-        def _getDescendantIDs(ids, level):
-            action = self.daofactory(classname="Files.GetChildIDsByID")
-            childIDs = sorted(action.execute(ids, conn=self.getDBConn(), transaction=self.existingTransaction()))
+    def _getAncestry(self, level, type, descendants):
+        """
+        _getAncestry_
 
-            if level == 1 or len(childIDs) == 0:
-                return childIDs
-            else:
-                return _getDescendantIDs(childIDs, level - 1)
+        Return the ids, lfns or loaded files of the ancestors (descendants)
+        of this file at the given level.
+        """
+        existingTransaction = self.beginTransaction()
 
         if self["id"] < 0:
             self.load()
 
-        idList = _getDescendantIDs(self["id"], level)
+        idList = []
+        if level >= 1:
+            idList = getFileAncestry(self.daofactory, [self["id"]], level, descendants=descendants,
+                                     conn=self.getDBConn(),
+                                     transaction=self.existingTransaction())[self["id"]][-1]
 
         if type == "id":
             results = idList
         elif type == "lfn":
-            results = []
-            for fileID in idList:
-                descFile = File(id=fileID)
-                descFile.load()
-                results.append(descFile['lfn'])
+            lfns = getFileLFNs(self.daofactory, idList, conn=self.getDBConn(),
+                               transaction=self.existingTransaction())
+            results = [lfns[fileID] for fileID in idList]
         elif type == "file":
-            results = []
-            for fileID in idList:
-                descFile = File(id=fileID)
-                descFile.load()
-                results.append(descFile)
+            files = loadFilesByID(self.daofactory, idList, conn=self.getDBConn(),
+                                  transaction=self.existingTransaction())
+            results = [files[fileID] for fileID in idList]
 
         self.commitTransaction(existingTransaction)
         return results
@@ -502,6 +501,138 @@ class File(WMBSBase, WMFile):
         return file
 
 
+class ChecksumLoader(object):
+    """
+    _ChecksumLoader_
+
+    Defer loading the checksums of a batch of WMBS files: the first
+    file["checksums"] lookup on any of them loads the checksums of all the
+    files in the batch with a single Files.GetChecksumBulk call. Until then
+    the files have no "checksums" key, so get(), "in" and json() don't see it.
+    """
+
+    def __init__(self, daofactory):
+        self.daofactory = daofactory
+        self.files = {}
+
+    def add(self, wmbsFile):
+        """
+        _add_
+
+        Drop the checksums of the file until they are loaded with the batch
+        """
+        wmbsFile.pop("checksums", None)
+        wmbsFile.checksumLoader = self
+        self.files[wmbsFile["id"]] = wmbsFile
+        return
+
+    def load(self, conn=None, transaction=False):
+        """
+        _load_
+
+        Load the checksums of all the files in the batch
+        """
+        if not self.files:
+            return
+
+        action = self.daofactory(classname="Files.GetChecksumBulk")
+        checksums = action.execute(files=list(self.files), conn=conn,
+                                   transaction=transaction)
+        for fileID, wmbsFile in self.files.iteritems():
+            wmbsFile["checksums"] = checksums.get(fileID, {})
+            wmbsFile.checksumLoader = None
+        self.files = {}
+        return
+
+
+def getFileAncestry(daofactory, fileIDs, level=2, descendants=False,
+                    conn=None, transaction=False):
+    """
+    _getFileAncestry_
+
+    Return a dictionary of each file id to a list of level lists with the
+    sorted ids of its parents, grandparents and so on (children,
+    grandchildren... with descendants set). Each level is loaded for all the
+    files with a single Files.GetParentMapByID (GetChildMapByID) call.
+    """
+    if descendants:
+        action = daofactory(classname="Files.GetChildMapByID")
+    else:
+        action = daofactory(classname="Files.GetParentMapByID")
+
+    relatives = {}
+    ancestry = dict((fileID, []) for fileID in fileIDs)
+    current = dict((fileID, set([fileID])) for fileID in fileIDs)
+    for _ in range(level):
+        toLoad = set().union(*current.values()).difference(relatives)
+        if toLoad:
+            loaded = action.execute(list(toLoad), conn=conn, transaction=transaction)
+            for fileID in toLoad:
+                relatives[fileID] = loaded.get(fileID, set())
+
+        for fileID, levelIDs in current.items():
+            nextLevel = set().union(*[relatives[x] for x in levelIDs])
+            current[fileID] = nextLevel
+            ancestry[fileID].append(sorted(nextLevel))
+
+    return ancestry
+
+
+def getFileLFNs(daofactory, fileIDs, useCache=False, conn=None, transaction=False):
+    """
+    _getFileLFNs_
+
+    Return a dictionary of file ids to lfns, loaded with a single bulk
+    Files.GetByID call. With useCache the lfns are also looked up in and
+    added to an in process LRU cache, file ids and lfns don't change.
+    """
+    lfns = {}
+    toLoad = set()
+    for fileID in fileIDs:
+        lfn = _fileLFNCache.get(fileID) if useCache else None
+        if lfn is None:
+            toLoad.add(fileID)
+        else:
+            lfns[fileID] = lfn
+
+    if toLoad:
+        action = daofactory(classname="Files.GetByID")
+        for fileID, fileInfo in action.execute(list(toLoad), conn=conn,
+                                               transaction=transaction).iteritems():
+            lfns[fileID] = fileInfo["lfn"]
+            if useCache:
+                _fileLFNCache.put(fileID, fileInfo["lfn"])
+
+    return lfns
+
+
+def loadFilesByID(daofactory, fileIDs, conn=None, transaction=False):
+    """
+    _loadFilesByID_
+
+    Return a dictionary of file ids to File objects loaded as File.load()
+    would, with one bulk query for their details and one for their checksums.
+    """
+    fileIDs = list(fileIDs)
+    if not fileIDs:
+        return {}
+
+    fileInfoAct = daofactory(classname="Files.GetByID")
+    checksumAct = daofactory(classname="Files.GetChecksumBulk")
+    fileInfo = fileInfoAct.execute(fileIDs, conn=conn, transaction=transaction)
+    checksums = checksumAct.execute(files=fileIDs, conn=conn, transaction=transaction)
+
+    files = {}
+    for fileID, info in fileInfo.iteritems():
+        wmbsFile = File(id=fileID)
+        wmbsFile.update(info)
+        if fileID in checksums:
+            wmbsFile["checksums"] = checksums[fileID]
+        files[fileID] = wmbsFile
+
+    return files
+
+
 def addFilesToWMBSInBulk(filesetId, workflowName, files, isDBS=True,
                          conn=None, transaction=None):
     """
@@ -18,6 +18,8 @@ class GetBulkRunLumi(DBFormatter):
                WHERE flr.fileid = :id
     """
 
+    inListBind = "id"
+
     def getBinds(self, files = None):
         binds = []
         files = self.dbi.makelist(files)
@@ -46,5 +48,6 @@ class GetBulkRunLumi(DBFormatter):
         binds = self.getBinds(files)
 
         result = self.dbi.processData(self.sql, binds,
-                         conn = conn, transaction = transaction)
+                         conn = conn, transaction = transaction,
+                         inListBind = self.inListBind)
         return self.format(result)
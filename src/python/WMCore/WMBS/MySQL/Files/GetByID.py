@@ -7,6 +7,8 @@ class GetByID(DBFormatter):
     sql = """SELECT id, lfn, filesize, events, first_event, merged
              FROM wmbs_file_details WHERE id = :fileid"""
 
+    inListBind = "fileid"
+
     def formatOneDict(self, result):
         """
         _formatOneDict_
@@ -47,6 +49,7 @@ class GetByID(DBFormatter):
             tmpDict["lfn"]         = entry["lfn"]
             tmpDict["events"]      = int(entry["events"])
             tmpDict["first_event"] = int(entry["first_event"])
+            tmpDict["merged"]      = bool(int(entry["merged"]))
             if "size" in entry.keys():
                 tmpDict["size"]    = int(entry["size"])
             else:
@@ -70,7 +73,8 @@ class GetByID(DBFormatter):
                 binds.append({'fileid': id})
 
             result = self.dbi.processData(self.sql, binds,
-                                          conn = conn, transaction = transaction)
+                                          conn = conn, transaction = transaction,
+                                          inListBind = self.inListBind)
             return self.formatBulkDict(result)
         else:
             #We only have one file ID
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+_GetChecksumBulk_
+
+MySQL implementation of Files.GetChecksumBulk
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+
+class GetChecksumBulk(DBFormatter):
+    """
+    _GetChecksumBulk_
+
+    Load the checksums of a list of files, returns a dictionary of file IDs
+    to {cktype: cksum} dictionaries. Files without checksums are left out.
+    """
+    sql = """SELECT fcs.fileid AS fileid, cst.type AS cktype, fcs.cksum AS cksum
+               FROM wmbs_file_checksums fcs
+               INNER JOIN wmbs_checksum_type cst ON fcs.typeid = cst.id
+             WHERE fcs.fileid = :fileid"""
+
+    inListBind = "fileid"
+
+    def format(self, result):
+        """
+        _format_
+
+        Group the checksums by file
+        """
+        results = {}
+        for entry in self.formatDict(result):
+            results.setdefault(int(entry["fileid"]), {})[entry["cktype"]] = entry["cksum"]
+
+        return results
+
+    def execute(self, files=None, conn=None, transaction=False):
+        files = files or []
+        if len(files) == 0:
+            # Nothing to do
+            return {}
+
+        binds = [{"fileid": fileid} for fileid in files]
+        result = self.dbi.processData(self.sql, binds, conn=conn,
+                                      transaction=transaction,
+                                      inListBind=self.inListBind)
+        return self.format(result)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+_GetChildMapByID_
+
+MySQL implementation of Files.GetChildMapByID
+
+Return the ids of the children of each of a list of file ids.
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+
+class GetChildMapByID(DBFormatter):
+    sql = """SELECT parent, child FROM wmbs_file_parent WHERE parent = :parent"""
+
+    inListBind = "parent"
+
+    def format(self, result):
+        """
+        _format_
+
+        Return a dictionary of file ids to the set of their children's ids,
+        files without children are left out
+        """
+        out = {}
+        for r in result:
+            for f in r.fetchall():
+                out.setdefault(int(f[0]), set()).add(int(f[1]))
+            r.close()
+        return out
+
+    def execute(self, ids=None, conn=None, transaction=False):
+        ids = self.dbi.makelist(ids)
+        if len(ids) == 0:
+            return {}
+
+        binds = [{'parent': fileID} for fileID in ids]
+        result = self.dbi.processData(self.sql, binds,
+                                      conn=conn, transaction=transaction,
+                                      inListBind=self.inListBind)
+        return self.format(result)
@@ -16,6 +16,9 @@ class GetForJobSplittingByID(GetByID):
              LEFT OUTER JOIN wmbs_file_runlumi_map wfr ON wfr.fileid = wfd.id
              WHERE id = :fileid"""
 
+    # MIN(run) is computed per file, can't be batched into an IN list
+    inListBind = None
+
     def formatBulkDict(self, result):
         """
         _formatBulkDict_
@@ -15,6 +15,8 @@ class GetLocationBulk(DBFormatter):
              WHERE wfl.fileid = :id
             """
 
+    inListBind = "id"
+
     def format(self, rawResults):
         """
         _format_
@@ -42,6 +44,7 @@ class GetLocationBulk(DBFormatter):
             binds.append({'id': fid})
 
         result = self.dbi.processData(self.sql, binds,
-                                      conn=conn, transaction=transaction)
+                                      conn=conn, transaction=transaction,
+                                      inListBind=self.inListBind)
 
         return self.format(self.formatDict(result))
@@ -20,6 +20,8 @@ class GetCouchID(DBFormatter):
 
     bulkSQL = """SELECT couch_record AS couch_record, id AS jobid FROM wmbs_job WHERE id = :jobid"""
 
+    inListBind = "jobid"
+
     def format(self, results):
         """
         _format_
@@ -48,7 +50,8 @@ class GetCouchID(DBFormatter):
                 binds.append({'jobid': entry})
 
             result = self.dbi.processData(self.bulkSQL, binds, conn = conn,
-                                          transaction = transaction)
+                                          transaction = transaction,
+                                          inListBind = self.inListBind)
 
             return self.formatDict(result)
 
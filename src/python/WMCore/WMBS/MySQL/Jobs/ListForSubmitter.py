@@ -38,6 +38,8 @@ class ListForSubmitter(DBFormatter):
 
     limit_sql = " limit %d"
 
+    streamResults = True
+
     def execute(self, conn=None, transaction=False, limitRows=None):
         if limitRows:
             extraSql = self.limit_sql % limitRows
@@ -45,5 +47,6 @@ class ListForSubmitter(DBFormatter):
             extraSql = ""
 
         result = self.dbi.processData(self.sql + extraSql, conn=conn,
-                                      transaction=transaction)
+                                      transaction=transaction,
+                                      streamResults=self.streamResults)
         return self.formatDict(result)
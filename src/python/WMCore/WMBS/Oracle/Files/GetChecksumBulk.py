@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""
+_GetChecksumBulk_
+
+Oracle implementation of Files.GetChecksumBulk
+"""
+
+from WMCore.WMBS.MySQL.Files.GetChecksumBulk import GetChecksumBulk as MySQLGetChecksumBulk
+
+
+class GetChecksumBulk(MySQLGetChecksumBulk):
+    """
+    Identical to MySQL
+    """
+    pass
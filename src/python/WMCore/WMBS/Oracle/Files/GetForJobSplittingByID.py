@@ -18,3 +18,6 @@ class GetForJobSplittingByID(MySQLGetByID):
              LEFT OUTER JOIN wmbs_file_runlumi_map wfr ON wfr.fileid = wfd.id
              WHERE id = :fileid GROUP BY wfd.id, wfd.lfn, wfd.filesize, wfd.events, wfd.first_event,
              wfd.merged"""
+
+    # grouped by file, so it can be batched into IN lists
+    inListBind = "fileid"
@@ -14,9 +14,10 @@ import logging
 from collections import Counter
 
 from WMCore.DataStructs.Fileset import Fileset as WMFileset
+from WMCore.DataStructs.Run import Run
 from WMCore.DataStructs.Subscription import Subscription as WMSubscription
 from WMCore.Services.UUIDLib import makeUUID
-from WMCore.WMBS.File import File
+from WMCore.WMBS.File import ChecksumLoader, File
 from WMCore.WMBS.Fileset import Fileset
 from WMCore.WMBS.WMBSBase import WMBSBase
 from WMCore.WMBS.Workflow import Workflow
@@ -171,12 +172,16 @@ class Subscription(WMBSBase, WMSubscription):
         self.commitTransaction(existingTransaction)
         return result
 
-    def filesOfStatus(self, status, loadChecksums=True, doingJobSplitting=False):
+    def filesOfStatus(self, status, loadChecksums=True, doingJobSplitting=False,
+                      lazyChecksums=False, loadRunLumis=False):
         """
         _filesOfStatus_
 
         Return a Set of File objects that have the given status with respect
-        to this subscription.
+        to this subscription. File details, checksums and run/lumi information
+        are loaded in bulk for all the files. With lazyChecksums the checksums
+        are only loaded the first time a file's checksums are looked up (see
+        ChecksumLoader).
         """
         existingTransaction = self.beginTransaction()
 
@@ -185,22 +190,43 @@ class Subscription(WMBSBase, WMSubscription):
         action = self.daofactory(classname="Subscriptions.Get%sFiles" % status)
         fileList = action.execute(self["id"], conn=self.getDBConn(),
                                   transaction=self.existingTransaction())
+        fileIDs = [x["file"] for x in fileList]
 
         if doingJobSplitting:
             fileInfoAct = self.daofactory(classname="Files.GetForJobSplittingByID")
         else:
             fileInfoAct = self.daofactory(classname="Files.GetByID")
 
-        fileInfoDict = fileInfoAct.execute(file=[x["file"] for x in fileList],
+        fileInfoDict = fileInfoAct.execute(file=fileIDs,
                                            conn=self.getDBConn(),
                                            transaction=self.existingTransaction())
 
+        checksumDict = {}
+        checksumLoader = None
+        if loadChecksums and lazyChecksums:
+            checksumLoader = ChecksumLoader(self.daofactory)
+        elif loadChecksums and fileIDs:
+            checksumAct = self.daofactory(classname="Files.GetChecksumBulk")
+            checksumDict = checksumAct.execute(files=fileIDs, conn=self.getDBConn(),
+                                               transaction=self.existingTransaction())
+
+        runLumiDict = {}
+        if loadRunLumis and fileIDs:
+            runLumiAct = self.daofactory(classname="Files.GetBulkRunLumi")
+            runLumiDict = runLumiAct.execute(files=[{"id": fileID} for fileID in fileIDs],
+                                             conn=self.getDBConn(),
+                                             transaction=self.existingTransaction())
+
         # Run through all files
         for f in fileList:
             fl = File(id=f['file'])
-            if loadChecksums:
-                fl.loadChecksum()
             fl.update(fileInfoDict[f['file']])
+            if checksumLoader is not None:
+                checksumLoader.add(fl)
+            elif f['file'] in checksumDict:
+                fl['checksums'] = checksumDict[f['file']]
+            for run, lumis in runLumiDict.get(f['file'], {}).iteritems():
+                fl.addRun(Run(run, *lumis))
             if 'locations' in f.keys():
                 fl.setLocation(f['locations'], immediateSave=False)
             files.add(fl)
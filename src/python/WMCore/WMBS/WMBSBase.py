@@ -21,6 +21,7 @@ class WMBSBase(WMConnectionBase):
         Initialize all the database connection attributes and the logging
         attritbutes.  Create a DAO factory for WMCore.WMBS as well. Finally,
         check to see if a transaction object has been created.  If none exists,
-        create one but leave the transaction closed.
+        create one but leave the transaction closed. The WMBS DAOs don't keep
+        any state, so the instances are shared by all the WMBS objects.
         """
-        WMConnectionBase.__init__(self, daoPackage = "WMCore.WMBS")
+        WMConnectionBase.__init__(self, daoPackage = "WMCore.WMBS", cacheDAOs = True)
@@ -23,7 +23,7 @@ class WMConnectionBase:
     """
     Generic db connection and transaction methods used by all of the WMCore classes.
     """
-    def __init__(self, daoPackage, logger = None, dbi = None):
+    def __init__(self, daoPackage, logger = None, dbi = None, cacheDAOs = False):
         """
         ___init___
 
@@ -31,6 +31,8 @@ class WMConnectionBase:
         attritbutes.  Create a DAO factory for given daoPackage as well. Finally,
         check to see if a transaction object has been created.  If none exists,
         create one but leave the transaction closed.
+        Set cacheDAOs if the package DAOs are stateless and can be reused by
+        every object sharing the same dbi.
         """
         myThread = threading.currentThread()
         if logger:
@@ -44,9 +46,10 @@ class WMConnectionBase:
 
         self.daofactory = DAOFactory(package = daoPackage,
                                      logger = self.logger,
-                                     dbinterface = self.dbi)
+                                     dbinterface = self.dbi,
+                                     cacheInstances = cacheDAOs)
 
-        if "transaction" not in dir(myThread):
+        if not hasattr(myThread, "transaction"):
             myThread.transaction = Transaction(self.dbi)
 
         return
@@ -64,7 +67,7 @@ class WMConnectionBase:
         """
         myThread = threading.currentThread()
 
-        if "transaction" not in dir(myThread):
+        if not hasattr(myThread, "transaction"):
             return None
 
         return myThread.transaction.conn
@@ -77,7 +80,7 @@ class WMConnectionBase:
         """
         myThread = threading.currentThread()
 
-        if "transaction" not in dir(myThread):
+        if not hasattr(myThread, "transaction"):
             myThread.transaction = Transaction(self.dbi)
             return False
 
@@ -95,7 +98,7 @@ class WMConnectionBase:
         """
         myThread = threading.currentThread()
 
-        if "transaction" not in dir(myThread):
+        if not hasattr(myThread, "transaction"):
             return False
         elif myThread.transaction.transaction != None:
             return True
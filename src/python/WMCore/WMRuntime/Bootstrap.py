@@ -15,6 +15,7 @@ import threading
 from logging.handlers import RotatingFileHandler
 
 import WMCore.FwkJobReport.Report as Report
+from WMCore.FwkJobReport.ReportSummary import writeReportSummary
 from WMCore.DataStructs.JobPackage import JobPackage
 from WMCore.Storage.SiteLocalConfig import loadSiteLocalConfig, SiteConfigError
 from WMCore.WMException import WMException
@@ -258,6 +259,7 @@ def createInitialReport(job, reportName):
     # job fails early
     reportPath = os.path.join(os.getcwd(), '../', reportName)
     report.save(reportPath)
+    writeReportSummary(report, reportPath)
 
     return
 
@@ -293,6 +295,7 @@ def createErrorReport(exitCode, errorType, errorDetails=None,
 
     reportPath = os.path.join(os.getcwd(), '../', logLocation)
     report.save(reportPath)
+    writeReportSummary(report, reportPath)
 
     return
 
@@ -18,6 +18,7 @@ import traceback
 
 import WMCore.Algorithms.SubprocessAlgos as subprocessAlgos
 import WMCore.FwkJobReport.Report        as Report
+from WMCore.FwkJobReport.ReportSummary import writeReportSummary
 from WMCore.WMException import WMException
 from WMCore.WMRuntime.Monitors.DashboardMonitor import getStepPID
 from WMCore.WMRuntime.Monitors.WMRuntimeMonitor import WMRuntimeMonitor
@@ -255,6 +256,7 @@ class PerformanceMonitor(WMRuntimeMonitor):
                 report.addError(stepName="PerformanceError", exitCode=errorCodeLookup[reason],
                                 errorType="PerformanceKill", errorDetails=msg)
                 report.save(logPath)
+                writeReportSummary(report, logPath)
             except Exception as ex:
                 # Basically, we can't write a log report and we're hosed
                 # Kill anyway, and hope the logging file gets written out
@@ -113,6 +113,37 @@ def allNodeNames(node):
 
 
 
+def nodeIndex(node):
+    """
+    _nodeIndex_
+
+    Return the map of node name to node data instance of the tree containing
+    the node provided. The map is cached on the top node of the tree and is
+    reset by addNode, addTopNode and deleteNode, so the tree must only be
+    changed through those.
+
+    """
+    topNode = findTopNode(node)
+    index = getattr(topNode, "_internal_nodeIndex", None)
+    if index is None:
+        index = nodeMap(topNode)
+        if isinstance(topNode, ConfigSectionTree):
+            topNode._internal_nodeIndex = index
+    return index
+
+def resetNodeIndex(node):
+    """
+    _resetNodeIndex_
+
+    Drop the cached node index of every tree containing the node provided
+
+    """
+    while node is not None:
+        if getattr(node, "_internal_nodeIndex", None) is not None:
+            node._internal_nodeIndex = None
+        node = nodeParent(node)
+    return
+
 def addNode(currentNode, newNode):
     """
     _addNode_
@@ -121,16 +152,16 @@ def addNode(currentNode, newNode):
 
     """
     newName = nodeName(newNode)
-    allNames = allNodeNames(currentNode)
 
-    if newName in allNames:
+    if newName in nodeIndex(currentNode):
         msg = "Duplicate Node Name %s already exists in tree\n" % newName
-        msg += "%s\n" % allNames
+        msg += "%s\n" % allNodeNames(currentNode)
         raise RuntimeError(msg)
 
     setattr(currentNode.tree.children, newName, newNode)
     currentNode.tree.childNames.append(newName)
     newNode.tree.parent = nodeName(currentNode)
+    resetNodeIndex(newNode)
     return
 
 def addTopNode(currentNode, newNode):
@@ -141,16 +172,16 @@ def addTopNode(currentNode, newNode):
     at the head of the childNames list.
     """
     newName = nodeName(newNode)
-    allNames = allNodeNames(currentNode)
 
-    if newName in allNames:
+    if newName in nodeIndex(currentNode):
         msg = "Duplicate Node Name %s already exists in tree\n" % newName
-        msg += "%s\n" % allNames
+        msg += "%s\n" % allNodeNames(currentNode)
         raise RuntimeError(msg)
 
     setattr(currentNode.tree.children, newName, newNode)
     currentNode.tree.childNames.insert(0, newName)
     newNode.tree.parent = nodeName(currentNode)
+    resetNodeIndex(newNode)
     return
 
 def deleteNode(topNode, childName):
@@ -163,6 +194,7 @@ def deleteNode(topNode, childName):
     if hasattr(topNode.tree.children, childName):
         delattr(topNode.tree.children, childName)
         topNode.tree.childNames.remove(childName)
+        resetNodeIndex(topNode)
 
 def getNode(node, nodeNameToGet):
     """
@@ -173,9 +205,12 @@ def getNode(node, nodeNameToGet):
     returns None if not found
 
     """
-    topNode = findTopNode(node)
-    mapping = nodeMap(topNode)
-    return mapping.get(nodeNameToGet, None)
+    result = nodeIndex(node).get(nodeNameToGet, None)
+    if result is None:
+        # not there, or the tree was changed behind our back
+        resetNodeIndex(node)
+        result = nodeIndex(node).get(nodeNameToGet, None)
+    return result
 
 def findTop(node):
     """
@@ -270,6 +305,7 @@ class TreeHelper:
         flag this node as the top of the tree
         """
         self.data._internal_treetop = True
+        resetNodeIndex(self.data)
 
     def isTopOfTree(self):
         """
@@ -439,3 +475,11 @@ class ConfigSectionTree(ConfigSection):
         self.tree.section_("children")
         self.tree.childNames = []
         self.tree.parent = None
+
+    def __getstate__(self):
+        """
+        Don't pickle the cached node index, it is rebuilt when needed
+        """
+        state = self.__dict__.copy()
+        state.pop("_internal_nodeIndex", None)
+        return state
@@ -1109,6 +1109,7 @@ class WMTaskHelper(TreeHelper):
         If necessary, output to Dashboard
         """
         from WMCore.FwkJobReport.Report import Report
+        from WMCore.FwkJobReport.ReportSummary import writeReportSummary
 
         finalReport = Report()
         # We left the master report at the pilot scratch area level
@@ -1144,6 +1145,7 @@ class WMTaskHelper(TreeHelper):
 
         finalReport.data.completed = True
         finalReport.persist(reportName)
+        writeReportSummary(finalReport, reportName)
 
         return finalReport
 
@@ -5,12 +5,15 @@ from __future__ import (division, print_function)
 
 from WMCore.REST.CherryPyPeriodicTask import CherryPyPeriodicTask
 from WMCore.WMStats.DataStructs.DataCache import DataCache
+from WMCore.Services.WMStats.ActiveDataRefresher import ActiveDataRefresher
 from WMCore.Services.WMStats.WMStatsReader import WMStatsReader
 
 class DataCacheUpdate(CherryPyPeriodicTask):
 
     def __init__(self, rest, config):
 
+        # follows the couch changes, only the first update reads all the active data
+        self.refresher = None
         super(DataCacheUpdate, self).__init__(config)
 
     def setConcurrentTasks(self, config):
@@ -25,11 +28,14 @@ class DataCacheUpdate(CherryPyPeriodicTask):
         """
         try:
             if DataCache.islatestJobDataExpired():
-                wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
-                                          reqdbCouchApp="ReqMgr")
-                jobData = wmstatsDB.getActiveData(jobInfoFlag = True)
+                if self.refresher is None:
+                    wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
+                                              reqdbCouchApp="ReqMgr")
+                    self.refresher = ActiveDataRefresher(wmstatsDB, logger=self.logger)
+                jobData = self.refresher.refresh()
                 DataCache.setlatestJobData(jobData)
-                self.logger.info("DataCache is updated: %s", len(jobData))
+                self.logger.info("DataCache is updated: %s, refresh stats: %s", len(jobData),
+                                 self.refresher.stats)
         except Exception as ex:
             self.logger.error(str(ex))
         return
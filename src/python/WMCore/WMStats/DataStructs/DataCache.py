@@ -1,12 +1,122 @@
 import time
 from WMCore.ReqMgr.DataStructs.Request import RequestInfo, protectedLFNs
 
+# request properties with a secondary index in the cache
+INDEXED_PROPERTIES = ("RequestStatus", "Campaign", "Team", "AgentURL", "InputDataset", "OutputDatasets")
+_BOOL_STRINGS = ["false", "False", "FALSE", "true", "True", "TRUE"]
+
+
+class RequestIndex(object):
+    """
+    Secondary indexes of a snapshot of the active requests, value -> set of
+    request keys for each of the indexed properties (the values as returned
+    by RequestInfo.get, each element of the list values being indexed).
+
+    match returns the same requests as RequestInfo.andFilterCheck on each of
+    the requests, in the same order, by intersecting the sets of the filtered
+    properties. The filters the indexes can't answer (other properties, true
+    or false values...) are checked on the remaining requests only.
+    """
+
+    def __init__(self, requests, properties=INDEXED_PROPERTIES):
+        self.requests = requests
+        self.order = {}
+        self.indexes = dict((prop, {}) for prop in properties)
+        # requests with values which can't be indexed, always checked
+        self.unindexed = dict((prop, set()) for prop in properties)
+        self._protectedLFNs = None
+
+        for position, (key, reqDict) in enumerate(requests.iteritems()):
+            self.order[key] = position
+            reqInfo = RequestInfo(reqDict)
+            for prop in properties:
+                try:
+                    value = reqInfo.get(prop)
+                except Exception:
+                    # malformed request, left to andFilterCheck
+                    self.unindexed[prop].add(key)
+                    continue
+                self._add(prop, key, value)
+
+    def _add(self, prop, key, value):
+        if value is None or isinstance(value, bool):
+            # never matched by a list of values
+            return
+        if not isinstance(value, list):
+            value = [value]
+        index = self.indexes[prop]
+        try:
+            for item in value:
+                index.setdefault(item, set()).add(key)
+        except TypeError:
+            self.unindexed[prop].add(key)
+
+    def _lookup(self, prop, value):
+        """
+        Return the keys of the requests which might match the filter on prop,
+        and whether they all do
+        """
+        if not isinstance(value, list):
+            value = [value]
+        index = self.indexes[prop]
+        keys = set()
+        for item in value:
+            keys.update(index.get(item, ()))
+        if self.unindexed[prop]:
+            return keys.union(self.unindexed[prop]), False
+        return keys, True
+
+    def match(self, filterDict):
+        """
+        Return the keys of the requests matching all the filters
+        """
+        candidates = []
+        exact = True
+        for key, value in filterDict.iteritems():
+            if isinstance(value, dict):
+                # ignored by andFilterCheck
+                continue
+            if key not in self.indexes or value in _BOOL_STRINGS:
+                exact = False
+                continue
+            try:
+                keys, keysExact = self._lookup(key, value)
+            except TypeError:
+                exact = False
+                continue
+            exact = exact and keysExact
+            candidates.append(keys)
+
+        if candidates:
+            candidates.sort(key=len)
+            matches = candidates[0].intersection(*candidates[1:])
+            matches = sorted(matches, key=self.order.get)
+        else:
+            matches = list(self.requests)
+
+        if not exact:
+            matches = [key for key in matches if RequestInfo(self.requests[key]).andFilterCheck(filterDict)]
+        return matches
+
+    def getProtectedLFNs(self):
+        """
+        Return the protected LFNs of all the requests, computed once
+        """
+        if self._protectedLFNs is None:
+            result = []
+            for _, reqInfo in self.requests.iteritems():
+                result.extend(protectedLFNs(reqInfo))
+            self._protectedLFNs = result
+        return self._protectedLFNs
+
+
 class DataCache(object):
     # TODO: need to change to  store in  db instead of storing in the memory
     # When mulitple server run for load balancing it could have different result
     # from each server.
     _duration = 300  # 5 minitues
     _lastedActiveDataFromAgent = {}
+    _requestIndex = RequestIndex({})
 
     @staticmethod
     def getDuration():
@@ -25,8 +135,19 @@ class DataCache(object):
 
     @staticmethod
     def setlatestJobData(jobData):
+        # build the indexes before the new data gets visible
+        requestIndex = RequestIndex(jobData)
         DataCache._lastedActiveDataFromAgent["time"] = int(time.time())
         DataCache._lastedActiveDataFromAgent["data"] = jobData
+        DataCache._requestIndex = requestIndex
+
+    @staticmethod
+    def getRequestIndex():
+        requestIndex = DataCache._requestIndex
+        if requestIndex.requests is not DataCache.getlatestJobData():
+            requestIndex = RequestIndex(DataCache.getlatestJobData())
+            DataCache._requestIndex = requestIndex
+        return requestIndex
 
     @staticmethod
     def islatestJobDataExpired():
@@ -39,23 +160,22 @@ class DataCache(object):
 
     @staticmethod
     def filterData(filterDict, maskList):
-        reqData = DataCache.getlatestJobData()
+        requestIndex = DataCache.getRequestIndex()
 
-        for _, reqInfo in reqData.iteritems():
-            reqData = RequestInfo(reqInfo)
-            if reqData.andFilterCheck(filterDict):
-                for prop in maskList:
-                    result = reqData.get(prop, [])
+        for key in requestIndex.match(filterDict):
+            reqData = RequestInfo(requestIndex.requests[key])
+            for prop in maskList:
+                result = reqData.get(prop, [])
 
-                    if isinstance(result, list):
-                        for value in result:
-                            yield value
-                    elif result is not None and result != "":
-                        yield result
+                if isinstance(result, list):
+                    for value in result:
+                        yield value
+                elif result is not None and result != "":
+                    yield result
 
     @staticmethod
     def filterDataByRequest(filterDict, maskList=None):
-        reqData = DataCache.getlatestJobData()
+        requestIndex = DataCache.getRequestIndex()
 
         if maskList is not None:
             if isinstance(maskList, basestring):
@@ -63,22 +183,18 @@ class DataCache(object):
             if "RequestName" not in maskList:
                 maskList.append("RequestName")
 
-        for _, reqDict in reqData.iteritems():
-            reqInfo = RequestInfo(reqDict)
-            if reqInfo.andFilterCheck(filterDict):
-
-                if maskList is None:
-                    yield reqDict
-                else:
-                    resultItem = {}
-                    for prop in maskList:
-                        resultItem[prop] = reqInfo.get(prop, None)
-                    yield resultItem
+        for key in requestIndex.match(filterDict):
+            reqDict = requestIndex.requests[key]
+            if maskList is None:
+                yield reqDict
+            else:
+                reqInfo = RequestInfo(reqDict)
+                resultItem = {}
+                for prop in maskList:
+                    resultItem[prop] = reqInfo.get(prop, None)
+                yield resultItem
 
     @staticmethod
     def getProtectedLFNs():
-        reqData = DataCache.getlatestJobData()
-
-        for _, reqInfo in reqData.iteritems():
-            for dirPath in protectedLFNs(reqInfo):
-                yield dirPath
\ No newline at end of file
+        for dirPath in DataCache.getRequestIndex().getProtectedLFNs():
+            yield dirPath
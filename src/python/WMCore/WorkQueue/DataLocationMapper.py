@@ -2,6 +2,8 @@
 """Map data to locations for WorkQueue"""
 
 from collections import defaultdict
+from functools import partial
+from multiprocessing.pool import ThreadPool
 import time
 import logging
 
@@ -15,6 +17,9 @@ from WMCore.WorkQueue.DataStructs.ACDCBlock import ACDCBlock
 # round update times. Avoid cache misses from too precise time's
 UPDATE_INTERVAL_COARSENESS = 5 * 60
 
+# maximum total length of the data names given to one PhEDEx query
+MAX_NAMES_LENGTH = 7000
+
 
 def isGlobalDBS(dbs):
     """Is this the global dbs"""
@@ -56,6 +61,21 @@ def isDataset(inputData):
     return True
 
 
+def chunkNames(names, maxLength=MAX_NAMES_LENGTH):
+    """Split names in chunks of at most maxLength characters, with at least one name each"""
+    chunk = []
+    length = 0
+    for name in names:
+        if chunk and length + len(name) > maxLength:
+            yield chunk
+            chunk = []
+            length = 0
+        chunk.append(name)
+        length += len(name)
+    if chunk:
+        yield chunk
+
+
 class DataLocationMapper(object):
     """Map data to locations for WorkQueue"""
 
@@ -66,9 +86,17 @@ class DataLocationMapper(object):
         self.params.setdefault('requireBlocksSubscribed', True)
         self.params.setdefault('fullRefreshInterval', 7200)
         self.params.setdefault('updateIntervalCoarseness', UPDATE_INTERVAL_COARSENESS)
+        self.params.setdefault('maxNamesLength', MAX_NAMES_LENGTH)
+        # threads querying the locations, more than one needs services usable from several threads
+        self.params.setdefault('fetchThreads', 1)
+        # seconds during which the location of a data item isn't queried again between full resyncs
+        self.params.setdefault('locationCacheTTL', 0)
 
         self.lastFullResync = 0
         self.lastLocationUpdate = 0
+        self.fetchPool = None
+        # data item -> time of the last query of its location
+        self.locationChecked = {}
 
         validLocationFrom = ('subscription', 'location')
         if self.params['locationFrom'] not in validLocationFrom:
@@ -121,53 +149,107 @@ class DataLocationMapper(object):
                 args['subscribed'] = 'y'
             if not fullResync and self.lastLocationUpdate:
                 args['update_since'] = timeFloor(self.lastLocationUpdate, self.params['updateIntervalCoarseness'])
-            for dataItem in dataItems:
-                try:
-                    if datasetSearch or isDataset(dataItem):
-                        response = self.phedex.getReplicaInfoForBlocks(dataset=[dataItem], **args)['phedex']
+
+            now = time.time()
+            if fullResync:
+                self.locationChecked = {}
+            elif self.params['locationCacheTTL']:
+                dataItems = [dataItem for dataItem in dataItems
+                             if self.locationChecked.get(dataItem, 0) + self.params['locationCacheTTL'] <= now]
+
+            # query the datasets and the blocks by chunks
+            queries = []
+            datasets = [dataItem for dataItem in dataItems if datasetSearch or isDataset(dataItem)]
+            for chunk in chunkNames(datasets, self.params['maxNamesLength']):
+                queries.append(('dataset', chunk))
+            blocks = [dataItem for dataItem in dataItems if not (datasetSearch or isDataset(dataItem))]
+            for chunk in chunkNames(blocks, self.params['maxNamesLength']):
+                queries.append(('block', chunk))
+
+            responses = self._fetch(partial(self._replicasFromPhEDEx, args), queries)
+            for (dataType, _), (replicas, queried) in zip(queries, responses):
+                queried = set(queried)
+                for block in replicas:
+                    nodes = [replica['node'] for replica in block['replica']]
+                    if dataType == 'dataset':
+                        dataset = block['name'].split('#')[0]
+                        if dataset in queried:
+                            result[dataset].update(nodes)
                     else:
-                        response = self.phedex.getReplicaInfoForBlocks(block=[dataItem], **args)['phedex']
-                    for block in response['block']:
-                        nodes = [replica['node'] for replica in block['replica']]
-                        if datasetSearch or isDataset(dataItem):
-                            result[dataItem].update(nodes)
-                        else:
-                            result[block['name']].update(nodes)
-                except Exception as ex:
-                    logging.error('Error getting block location from phedex for %s: %s', dataItem, str(ex))
+                        result[block['name']].update(nodes)
+                for dataItem in queried:
+                    self.locationChecked[dataItem] = now
         else:
             raise RuntimeError("shouldn't get here")
 
         # convert from PhEDEx name to cms site name
-        for name, nodes in result.items():
-            psns = set()
-            psns.update(self.sitedb.PNNstoPSNs(nodes))
-            result[name] = list(psns)
+        self._convertToPSNs(result)
 
         return result, fullResync
 
+    def _replicasFromPhEDEx(self, args, query):
+        """
+        Get the block replicas of a chunk of datasets or blocks, with the data
+        items queried successfully. If the chunk query fails each item is
+        queried on its own.
+        """
+        dataType, chunk = query
+        try:
+            return self.phedex.getReplicaInfoForBlocks(**dict(args, **{dataType: chunk}))['phedex']['block'], chunk
+        except Exception as ex:
+            if len(chunk) == 1:
+                logging.error('Error getting block location from phedex for %s: %s', chunk[0], str(ex))
+                return [], []
+        blocks = []
+        queried = []
+        for dataItem in chunk:
+            itemBlocks, itemQueried = self._replicasFromPhEDEx(args, (dataType, [dataItem]))
+            blocks.extend(itemBlocks)
+            queried.extend(itemQueried)
+        return blocks, queried
+
+    def _fetch(self, func, queries):
+        """Run func on each query, with the fetch threads if there are several, and return the results"""
+        if self.params['fetchThreads'] > 1 and len(queries) > 1:
+            if self.fetchPool is None:
+                self.fetchPool = ThreadPool(self.params['fetchThreads'])
+            return self.fetchPool.map(func, queries)
+        return [func(query) for query in queries]
+
+    def _convertToPSNs(self, result):
+        """Convert the PNNs of each data item in result to a list of PSNs"""
+        psnsByNodes = {}
+        for name, nodes in result.items():
+            nodes = frozenset(nodes)
+            if nodes not in psnsByNodes:
+                psnsByNodes[nodes] = set(self.sitedb.PNNstoPSNs(nodes))
+            result[name] = list(psnsByNodes[nodes])
+        return
+
     def locationsFromDBS(self, dbs, dataItems,
                          datasetSearch=False):
         """Get data location from dbs"""
         result = defaultdict(set)
-        for dataItem in dataItems:
-            try:
-                if datasetSearch or isDataset(dataItem):
-                    phedexNodeNames = dbs.listDatasetLocation(dataItem, dbsOnly=True)
-                else:
-                    phedexNodeNames = dbs.listFileBlockLocation(dataItem, dbsOnly=True)
+        responses = self._fetch(partial(self._locationFromDBS, dbs, datasetSearch), dataItems)
+        for dataItem, phedexNodeNames in zip(dataItems, responses):
+            if phedexNodeNames is not None:
                 result[dataItem].update(phedexNodeNames)
-            except Exception as ex:
-                logging.error('Error getting block location from dbs for %s: %s', dataItem, str(ex))
 
         # convert the sets to lists
-        for name, nodes in result.items():
-            psns = set()
-            psns.update(self.sitedb.PNNstoPSNs(nodes))
-            result[name] = list(psns)
+        self._convertToPSNs(result)
 
         return result, True  # partial dbs updates not supported
 
+    def _locationFromDBS(self, dbs, datasetSearch, dataItem):
+        """Get the location of a dataset or block from dbs, None on error"""
+        try:
+            if datasetSearch or isDataset(dataItem):
+                return dbs.listDatasetLocation(dataItem, dbsOnly=True)
+            return dbs.listFileBlockLocation(dataItem, dbsOnly=True)
+        except Exception as ex:
+            logging.error('Error getting block location from dbs for %s: %s', dataItem, str(ex))
+        return None
+
     def organiseByDbs(self, dataItems):
         """Sort items by dbs instances - return dict with DBSReader as key & data items as values"""
         itemsByDbs = defaultdict(list)
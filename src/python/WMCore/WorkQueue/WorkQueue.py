@@ -88,11 +88,14 @@ class WorkQueue(WorkQueueBase):
         self.params.setdefault('DbName', 'workqueue')
         self.params.setdefault('InboxDbName', self.params['DbName'] + '_inbox')
         self.params.setdefault('ParentQueueCouchUrl', None)  # We get work from here
+        # keep the available elements in memory, updated from the couch changes feed
+        self.params.setdefault('AvailableWorkIndex', False)
 
         self.backend = WorkQueueBackend(self.params['CouchUrl'], self.params['DbName'],
                                         self.params['InboxDbName'],
                                         self.params['ParentQueueCouchUrl'], self.params.get('QueueURL'),
-                                        logger=self.logger)
+                                        logger=self.logger,
+                                        availableWorkIndex=self.params['AvailableWorkIndex'])
         self.workqueueDS = WorkQueueDS(self.params['CouchUrl'], self.params['DbName'],
                                        self.params['InboxDbName'])
         if self.params.get('ParentQueueCouchUrl'):
@@ -100,10 +103,12 @@ class WorkQueue(WorkQueueBase):
                 if self.params.get('ParentQueueInboxCouchDBName'):
                     self.parent_queue = WorkQueueBackend(self.params['ParentQueueCouchUrl'].rsplit('/', 1)[0],
                                                          self.params['ParentQueueCouchUrl'].rsplit('/', 1)[1],
-                                                         self.params['ParentQueueInboxCouchDBName'])
+                                                         self.params['ParentQueueInboxCouchDBName'],
+                                                         availableWorkIndex=self.params['AvailableWorkIndex'])
                 else:
                     self.parent_queue = WorkQueueBackend(self.params['ParentQueueCouchUrl'].rsplit('/', 1)[0],
-                                                         self.params['ParentQueueCouchUrl'].rsplit('/', 1)[1])
+                                                         self.params['ParentQueueCouchUrl'].rsplit('/', 1)[1],
+                                                         availableWorkIndex=self.params['AvailableWorkIndex'])
             except IndexError as ex:
                 # Probable cause: Someone didn't put the global WorkQueue name in
                 # the ParentCouchUrl
@@ -120,6 +125,8 @@ class WorkQueue(WorkQueueBase):
         self.params.setdefault('WorkPerCycle', 100)
         self.params.setdefault('LocationRefreshInterval', 600)
         self.params.setdefault('FullLocationRefreshInterval', 7200)
+        self.params.setdefault('LocationFetchThreads', 1)
+        self.params.setdefault('LocationCacheTTL', 0)
         self.params.setdefault('TrackLocationOrSubscription', 'location')
         self.params.setdefault('ReleaseIncompleteBlocks', False)
         self.params.setdefault('ReleaseRequireSubscribed', True)
@@ -203,7 +210,9 @@ class WorkQueue(WorkQueueBase):
                                                               fullRefreshInterval=self.params[
                                                                   'FullLocationRefreshInterval'],
                                                               updateIntervalCoarseness=self.params[
-                                                                  'LocationRefreshInterval'])
+                                                                  'LocationRefreshInterval'],
+                                                              fetchThreads=self.params['LocationFetchThreads'],
+                                                              locationCacheTTL=self.params['LocationCacheTTL'])
 
         # used for only global WQ
         if self.params.get('ReqMgrServiceURL'):
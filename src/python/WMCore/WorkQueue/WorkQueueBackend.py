@@ -5,6 +5,8 @@ WorkQueueBackend
 Interface to WorkQueue persistent storage
 """
 
+import bisect
+import copy
 import json
 import random
 import time
@@ -33,6 +35,132 @@ def formatReply(answer, *items):
     return result, errors
 
 
+class PriorityJobCounts(object):
+    """
+    Number of jobs running at each site with a priority greater than or
+    equal to a given one, from site job counts by priority.
+
+    The priorities must be queried in decreasing order, so the counts of each
+    site are only summed once, and jobs can only be added at the last queried
+    priority.
+    """
+
+    def __init__(self, siteJobCounts):
+        self.siteJobCounts = siteJobCounts
+        # site -> job counts by increasing priority, of the priorities not queried yet
+        self.pending = {}
+        # site -> jobs with a priority greater than or equal to the last queried one
+        self.counts = {}
+
+    def count(self, site, prio):
+        """Number of jobs running at site with a priority greater than or equal to prio"""
+        if site not in self.counts:
+            self.pending[site] = sorted(self.siteJobCounts.get(site, {}).items())
+            self.counts[site] = 0
+        pending = self.pending[site]
+        while pending and pending[-1][0] >= prio:
+            self.counts[site] += pending.pop()[1]
+        return self.counts[site]
+
+    def add(self, site, prio, jobs):
+        """Add jobs running at site with priority prio, to the counts and the site job counts"""
+        self.count(site, prio)
+        self.counts[site] += jobs
+        siteCounts = self.siteJobCounts.setdefault(site, {})
+        siteCounts[prio] = siteCounts.get(prio, 0) + jobs
+        return
+
+
+class AvailableElementsIndex(object):
+    """
+    Available elements of a workqueue database, by decreasing priority and
+    increasing creation time.
+
+    The elements are loaded once from the availableByPriority view, then kept
+    up to date from the couch changes feed.
+    """
+
+    def __init__(self, db, logger):
+        self.db = db
+        self.logger = logger
+        self.eleKey = 'WMCore.WorkQueue.DataStructs.WorkQueueElement.WorkQueueElement'
+        # element id -> (document, element)
+        self.elements = {}
+        # sorted (-Priority, CreationTime, id) of the elements
+        self.order = []
+        # element id -> its key in self.order
+        self.keys = {}
+        self.lastSeq = None
+
+    def _remove(self, docId):
+        """Remove an element from the index, if there"""
+        key = self.keys.pop(docId, None)
+        if key is not None:
+            del self.order[bisect.bisect_left(self.order, key)]
+            del self.elements[docId]
+
+    def _update(self, doc):
+        """Add, update or remove the element of a document according to its status"""
+        self._remove(doc['_id'])
+        ele = doc.get(self.eleKey)
+        if not ele or ele.get('Status') != 'Available':
+            return
+        element = self.copyElement(doc)
+        key = (-element['Priority'], element['CreationTime'], doc['_id'])
+        bisect.insort(self.order, key)
+        self.keys[doc['_id']] = key
+        self.elements[doc['_id']] = (doc, element)
+
+    def _load(self):
+        """Load all the available elements"""
+        self.elements, self.order, self.keys = {}, [], {}
+        # changes made while loading are applied again at the next refresh
+        lastSeq = self.db.info()['update_seq']
+        result = self.db.loadView('WorkQueue', 'availableByPriority', {'include_docs': True})
+        for row in result['rows']:
+            if row.get('doc'):
+                self._update(row['doc'])
+        self.lastSeq = lastSeq
+        self.logger.info("Loaded %d available elements from %s", len(self.elements), self.db.name)
+
+    def refresh(self):
+        """Apply the changes made since the last refresh, or load the elements the first time"""
+        if self.lastSeq is None:
+            return self._load()
+        try:
+            changes = self.db.changes(since=self.lastSeq, includeDocs=True)
+        except Exception as ex:
+            self.logger.warning("Failed to read the changes of %s, reloading the available elements: %s",
+                                self.db.name, str(ex))
+            return self._load()
+        for row in changes['results']:
+            if row.get('deleted') or not row.get('doc'):
+                self._remove(row['id'])
+            else:
+                self._update(row['doc'])
+        self.lastSeq = changes['last_seq']
+        self.logger.debug("Applied %d changes, %d available elements in %s",
+                          len(changes['results']), len(self.elements), self.db.name)
+        return
+
+    def available(self, team=None, wfs=None):
+        """
+        Available elements by decreasing priority and increasing creation time,
+        with the team and workflow restrictions of the workRestrictions list
+        """
+        for key in self.order:
+            doc, element = self.elements[key[2]]
+            if team and element.get('TeamName') and team != element['TeamName']:
+                continue
+            if wfs and element['RequestName'] not in wfs:
+                continue
+            yield doc, element
+
+    def copyElement(self, doc):
+        """New element for a document of the index, which can be changed freely"""
+        return CouchWorkQueueElement.fromDocument(self.db, copy.deepcopy(doc))
+
+
 class WorkQueueBackend(object):
     """
     Represents persistent storage for WorkQueue
@@ -40,7 +168,7 @@ class WorkQueueBackend(object):
 
     def __init__(self, db_url, db_name='workqueue',
                  inbox_name=None, parentQueue=None,
-                 queueUrl=None, logger=None):
+                 queueUrl=None, logger=None, availableWorkIndex=False):
         if logger:
             self.logger = logger
         else:
@@ -61,6 +189,10 @@ class WorkQueueBackend(object):
         self.inbox = self.server.connectDatabase(inbox_name, create=False, size=10000)
         self.queueUrl = sanitizeURL(queueUrl or (db_url + '/' + db_name))['url']
         self.eleKey = 'WMCore.WorkQueue.DataStructs.WorkQueueElement.WorkQueueElement'
+        # keep the available elements in memory instead of loading them for each availableWork
+        self.availableIndex = None
+        if availableWorkIndex:
+            self.availableIndex = AvailableElementsIndex(self.db, self.logger)
 
     def forceQueueSync(self):
         """Force a blocking replication - used only in tests"""
@@ -351,57 +483,69 @@ class WorkQueueBackend(object):
             self.logger.error("No thresholds is set: Please check")
             return elements, thresholds, siteJobCounts
 
-        options = {}
-        options['include_docs'] = True
-        options['descending'] = True
-        options['resources'] = thresholds
-        if team:
-            options['team'] = team
-            self.logger.info("setting team to %s" % team)
-        if wfs:
-            result = []
-            for i in xrange(0, len(wfs), 20):
-                options['wfs'] = wfs[i:i + 20]
-                data = self.db.loadList('WorkQueue', 'workRestrictions', 'availableByPriority', options)
-                result.extend(json.loads(data))
+        if self.availableIndex:
+            # elements without a site in thresholds are skipped below, like the workRestrictions list does
+            self.availableIndex.refresh()
+            indexDocs = {}
+            for doc, element in self.availableIndex.available(team, wfs):
+                if element['RequestName'] not in excludeWorkflows:
+                    sortedElements.append(element)
+                    indexDocs[element.id] = doc
         else:
-            result = self.db.loadList('WorkQueue', 'workRestrictions', 'availableByPriority', options)
-            result = json.loads(result)
-            if len(result) == 0:
-                self.logger.info("""No available work in WQ or didn't pass workqueue restriction
-                                    - check Pileup, site white list, etc""")
-            self.logger.debug("Available Work:\n %s \n for resources\n %s" % (result, thresholds))
-        # Iterate through the results; apply whitelist / blacklist / data
-        # locality restrictions.  Only assign jobs if they are high enough
-        # priority.
-        for i in result:
-            element = CouchWorkQueueElement.fromDocument(self.db, i)
-            # filter out exclude list from abvaling
-            if element['RequestName'] not in excludeWorkflows:
-                sortedElements.append(element)
-
-        # sort elements to get them in priority first and timestamp order
-        sortedElements.sort(key=lambda element: element['CreationTime'])
-        sortedElements.sort(key=lambda x: x['Priority'], reverse=True)
-
+            options = {}
+            options['include_docs'] = True
+            options['descending'] = True
+            options['resources'] = thresholds
+            if team:
+                options['team'] = team
+                self.logger.info("setting team to %s" % team)
+            if wfs:
+                result = []
+                for i in xrange(0, len(wfs), 20):
+                    options['wfs'] = wfs[i:i + 20]
+                    data = self.db.loadList('WorkQueue', 'workRestrictions', 'availableByPriority', options)
+                    result.extend(json.loads(data))
+            else:
+                result = self.db.loadList('WorkQueue', 'workRestrictions', 'availableByPriority', options)
+                result = json.loads(result)
+                if len(result) == 0:
+                    self.logger.info("""No available work in WQ or didn't pass workqueue restriction
+                                        - check Pileup, site white list, etc""")
+                self.logger.debug("Available Work:\n %s \n for resources\n %s" % (result, thresholds))
+            # Iterate through the results; apply whitelist / blacklist / data
+            # locality restrictions.  Only assign jobs if they are high enough
+            # priority.
+            for i in result:
+                element = CouchWorkQueueElement.fromDocument(self.db, i)
+                # filter out exclude list from abvaling
+                if element['RequestName'] not in excludeWorkflows:
+                    sortedElements.append(element)
+
+            # sort elements to get them in priority first and timestamp order
+            sortedElements.sort(key=lambda element: (-element['Priority'], element['CreationTime']))
+
+        # the elements come by decreasing priority
+        jobCounts = PriorityJobCounts(siteJobCounts)
         for element in sortedElements:
             if numElems <= 0:
                 self.logger.info("Reached the maximum number of elements to be pulled: %d", len(elements))
                 break
 
-            if not possibleSites(element):
+            elementSites = possibleSites(element)
+            if not elementSites:
                 self.logger.info("No possible sites for %s with doc id %s", element['RequestName'], element.id)
                 continue
 
+            # the sites passing the site restrictions are among the possible sites
+            sites = [site for site in set(elementSites) if site in thresholds]
             prio = element['Priority']
             possibleSite = None
-            sites = thresholds.keys()
             random.shuffle(sites)
             for site in sites:
                 if element.passesSiteRestriction(site):
                     # Count the number of jobs currently running of greater priority
-                    curJobCount = sum([x[1] if x[0] >= prio else 0 for x in siteJobCounts.get(site, {}).items()])
-                    self.logger.debug("Job Count: %s, site: %s thresholds: %s" % (curJobCount, site, thresholds[site]))
+                    curJobCount = jobCounts.count(site, prio)
+                    self.logger.debug("Job Count: %s, site: %s thresholds: %s", curJobCount, site, thresholds[site])
                     if curJobCount < thresholds[site]:
                         possibleSite = site
                         break
@@ -409,11 +553,11 @@ class WorkQueueBackend(object):
             if possibleSite:
                 numElems -= 1
                 self.logger.debug("Possible site exists %s" % str(possibleSite))
+                if self.availableIndex:
+                    # the callers change the elements they get
+                    element = self.availableIndex.copyElement(indexDocs[element.id])
                 elements.append(element)
-                if possibleSite not in siteJobCounts:
-                    siteJobCounts[possibleSite] = {}
-                siteJobCounts[possibleSite][prio] = siteJobCounts[possibleSite].setdefault(prio, 0) + \
-                                                    element['Jobs'] * element.get('blowupFactor', 1.0)
+                jobCounts.add(possibleSite, prio, element['Jobs'] * element.get('blowupFactor', 1.0))
             else:
                 self.logger.debug("No available resources for %s with doc id %s", element['RequestName'], element.id)
 
@@ -8,7 +8,7 @@ from __future__ import division, print_function
 import time
 import unittest
 from future.utils import with_metaclass
-from Utils.Patterns import Singleton
+from Utils.Patterns import Singleton, LRUCache
 
 
 class Test(with_metaclass(Singleton, object)):
@@ -29,5 +29,23 @@ class PatternsTests(unittest.TestCase):
         self.assertEqual(obj1.time, obj2.time)
         self.assertEqual(id(obj1), id(obj2))
 
+    def testLRUCache(self):
+        "Test LRUCache class"
+        cache = LRUCache(maxsize=2)
+        cache.put(1, 'a')
+        cache.put(2, 'b')
+        self.assertEqual(cache.get(1), 'a')
+        cache.put(3, 'c')
+        self.assertEqual(len(cache), 2)
+        self.assertFalse(2 in cache)
+        self.assertEqual(cache.get(2), None)
+        self.assertEqual(cache.get(2, 'x'), 'x')
+        cache.put(1, 'd')
+        cache.put(4, 'e')
+        self.assertEqual(cache.get(1), 'd')
+        self.assertEqual(cache.get(3), None)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
 if __name__ == '__main__':
     unittest.main()
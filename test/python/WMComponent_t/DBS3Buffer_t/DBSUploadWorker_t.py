@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+_DBSUploadWorker_t_
+
+Unit tests for the DBS3 uploader worker processes, with a local DBS stand-in
+(no database or DBS server needed).
+"""
+from __future__ import print_function, division
+
+import Queue
+import copy
+import time
+import unittest
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from nose.plugins.attrib import attr
+
+from WMComponent.DBS3Buffer import DBSUploadPoller as PollerModule
+from WMComponent.DBS3Buffer.DBSBufferBlock import DBSBufferBlock, convertToDBSBlock
+from WMComponent.DBS3Buffer.DBSUploadPoller import DBSUploadPoller, uploadBlock, uploadWorker
+
+
+class LocalDbsApi(object):
+    """
+    DBS stand-in keeping the inserted blocks in memory, answering after
+    latency seconds and raising the errors queued for a block name
+    """
+    latency = 0
+    errors = {}
+
+    def __init__(self, url):
+        self.url = url
+        self.blocks = {}
+        self.errors = copy.deepcopy(self.errors)
+
+    def insertBulkBlock(self, blockDump):
+        time.sleep(self.latency)
+        name = blockDump['block']['block_name']
+        if self.errors.get(name):
+            raise Exception(self.errors[name].pop(0))
+        if name in self.blocks:
+            raise Exception("Block %s already exists" % name)
+        self.blocks[name] = blockDump
+        return
+
+
+def makeBlockData(name, nFiles=10):
+    """
+    Data of a closed DBSBufferBlock with nFiles files of 20 lumis
+    """
+    block = DBSBufferBlock(name=name, location="T1_US_FNAL_Disk", datasetpath=name.split('#')[0])
+    block.setPendingAndCloseBlock()
+    for i in range(nFiles):
+        lfn = "/store/data/Run2018A/%s/%08d.root" % (name.split('#')[1], i)
+        block.data['files'].append({'logical_file_name': lfn, 'file_size': 1024, 'event_count': 1000,
+                                    'file_lumi_list': [{'run_num': 1, 'lumi_section_num': lumi}
+                                                       for lumi in range(i * 20, i * 20 + 20)]})
+        block.data['file_conf_list'].append({'lfn': lfn, 'release_version': "CMSSW_10_2_0", 'pset_hash': "hash",
+                                             'app_name': "cmsRun", 'output_module_label': "RAWoutput"})
+    return block.data
+
+
+class DBSUploadWorkerTest(unittest.TestCase):
+    """
+    _DBSUploadWorkerTest_
+
+    Unit tests for the DBS3 uploader workers.
+    """
+
+    def setUp(self):
+        self.dbsApi = PollerModule.DbsApi
+        PollerModule.DbsApi = LocalDbsApi
+        LocalDbsApi.latency = 0
+        LocalDbsApi.errors = {}
+        return
+
+    def tearDown(self):
+        PollerModule.DbsApi = self.dbsApi
+        return
+
+    def testConvertToDBSBlock(self):
+        """
+        _testConvertToDBSBlock_
+
+        Test that the block dump built from a snapshot of the block data is
+        the one of the block, leaving the block data untouched.
+        """
+        data = makeBlockData("/Primary/Processed-v1/RAW#block1")
+        block = DBSBufferBlock(name="/Primary/Processed-v1/RAW#block1", location="T1_US_FNAL_Disk",
+                               datasetpath="/Primary/Processed-v1/RAW")
+        block.data = data
+        blockDump = convertToDBSBlock(pickle.loads(pickle.dumps(data)), copyData=False)
+        self.assertEqual(blockDump, block.convertToDBSBlock())
+        self.assertNotIn('close_settings', blockDump)
+        self.assertNotIn('block_events', blockDump['block'])
+        self.assertEqual(blockDump['block']['open_for_writing'], 0)
+        self.assertIn('block_events', data['block'])
+        return
+
+    def testUploadBlock(self):
+        """
+        _testUploadBlock_
+
+        Test the classification of the DBS answers and the retries of the
+        transient errors.
+        """
+        LocalDbsApi.errors = {"/A/B/C#parent": ["Missing data when inserting to dataset_parents"],
+                              "/A/B/C#proxy": ["Proxy Error, the block may be inserted"],
+                              "/A/B/C#retry": ["Service Unavailable", "Connection refused"],
+                              "/A/B/C#down": ["Service Unavailable"] * 3,
+                              "/A/B/C#bad": ["Invalid block"]}
+        dbsApi = LocalDbsApi("local")
+        results = {}
+        for name in ["/A/B/C#good", "/A/B/C#good", "/A/B/C#parent", "/A/B/C#proxy",
+                     "/A/B/C#retry", "/A/B/C#down", "/A/B/C#bad"]:
+            blockDump = convertToDBSBlock(makeBlockData(name, nFiles=2))
+            results[name] = uploadBlock(dbsApi, name, blockDump, nRetries=2, retryWait=0.01)
+
+        self.assertEqual(results["/A/B/C#good"]['success'], "uploaded")
+        self.assertEqual(results["/A/B/C#good"]['files'], 2)
+        self.assertTrue(results["/A/B/C#good"]['size'] > 0)
+        self.assertEqual(results["/A/B/C#parent"]['success'], "error")
+        self.assertEqual(results["/A/B/C#proxy"]['success'], "check")
+        self.assertEqual(results["/A/B/C#retry"]['success'], "uploaded")
+        self.assertEqual(results["/A/B/C#retry"]['tries'], 3)
+        self.assertEqual(results["/A/B/C#down"]['success'], "error")
+        self.assertEqual(results["/A/B/C#down"]['tries'], 3)
+        self.assertEqual(results["/A/B/C#bad"]['success'], "error")
+        self.assertEqual(results["/A/B/C#bad"]['tries'], 1)
+        self.assertItemsEqual(dbsApi.blocks.keys(), ["/A/B/C#good", "/A/B/C#retry"])
+
+        # a dump which can't be serialized is reported, not raised
+        blockDump = convertToDBSBlock(makeBlockData("/A/B/C#unserializable", nFiles=2))
+        blockDump['block']['workflows'] = set(["workflow"])
+        result = uploadBlock(dbsApi, "/A/B/C#unserializable", blockDump, nRetries=2, retryWait=0.01)
+        self.assertEqual(result['success'], "error")
+        self.assertEqual(result['tries'], 1)
+        return
+
+    def testUploadWorker(self):
+        """
+        _testUploadWorker_
+
+        Test that the worker uploads the blocks it is given until told to stop.
+        """
+        workInput = Queue.Queue()
+        workResult = Queue.Queue()
+        names = ["/A/B/C#block%d" % i for i in range(5)]
+        for name in names:
+            workInput.put({'name': name, 'data': pickle.dumps(makeBlockData(name), pickle.HIGHEST_PROTOCOL)})
+        workInput.put('STOP')
+        uploadWorker(workInput, workResult, "local")
+        results = [workResult.get_nowait() for _ in names]
+        self.assertTrue(workResult.empty())
+        self.assertEqual([result['name'] for result in results], names)
+        self.assertTrue(all(result['success'] == "uploaded" for result in results))
+        return
+
+    @attr('performance')
+    def testUploadPerformance(self):
+        """
+        _testUploadPerformance_
+
+        Time uploading 200 blocks of 100 files to a DBS answering in 50ms,
+        with 1 and 4 worker processes.
+        """
+        LocalDbsApi.latency = 0.05
+        blocks = [makeBlockData("/A/B/C#block%d" % i, nFiles=100) for i in range(200)]
+        for nProc in (1, 4):
+            poller = DBSUploadPoller.__new__(DBSUploadPoller)
+            poller.pool = []
+            poller.nProc = nProc
+            poller.dbsUrl = "local"
+            poller.nRetries = 0
+            poller.retryWait = 0
+            poller.setupPool()
+
+            startTime = time.time()
+            for data in blocks:
+                poller.workInput.put({'name': data['block']['block_name'],
+                                      'data': pickle.dumps(data, pickle.HIGHEST_PROTOCOL)})
+            queueTime = time.time() - startTime
+            results = [poller.workResult.get(timeout=60) for _ in blocks]
+            totalTime = time.time() - startTime
+            poller.close()
+            self.assertTrue(all(result['success'] == "uploaded" for result in results))
+            print("%d processes: %.1f blocks/sec, %.1f MB of block dumps, %.2f secs to queue the blocks" %
+                  (nProc, len(blocks) / totalTime, sum(result['size'] for result in results) / 1e6, queueTime))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
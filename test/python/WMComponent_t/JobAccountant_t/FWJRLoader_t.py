@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+_FWJRLoader_t_
+
+Unit tests for the JobAccountant job report loader (no database needed).
+"""
+from __future__ import print_function, division
+
+import os
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from Utils.IteratorTools import grouper
+from WMComponent.JobAccountant.FWJRLoader import FWJRLoader
+from WMCore.FwkJobReport.Report import Report
+
+# job reports of the test directory which can't be loaded
+BAD_FWJRS = ["EmptyJobReport.pkl", "MergeSuccessBadPKL.pkl"]
+
+
+def loadReport(path):
+    report = Report()
+    report.load(path)
+    return report
+
+
+class FWJRLoaderTest(unittest.TestCase):
+    """
+    _FWJRLoaderTest_
+
+    Unit tests for the job report loader.
+    """
+
+    def setUp(self):
+        self.fwjrDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fwjrs")
+        fwjrNames = [fwjrName for fwjrName in sorted(os.listdir(self.fwjrDir))
+                     if fwjrName.endswith(".pkl") and fwjrName not in BAD_FWJRS]
+        self.jobs = [{'id': jobID, 'fwjr_path': os.path.join(self.fwjrDir, fwjrName)}
+                     for jobID, fwjrName in enumerate(fwjrNames)]
+        return
+
+    def testLoadSlices(self):
+        """
+        _testLoadSlices_
+
+        Test that the reports are loaded in the order of the jobs, with or
+        without threads.
+        """
+        expected = [loadReport(job['fwjr_path']) for job in self.jobs]
+        for numThreads in (0, 1, 3):
+            loader = FWJRLoader(loadReport, numThreads=numThreads, prefetchSlices=2)
+            jobs = []
+            reports = []
+            for jobsSlice, jobReports, loadTime, waitTime in loader.loadSlices(grouper(self.jobs, 10)):
+                self.assertEqual(len(jobsSlice), len(jobReports))
+                self.assertTrue(loadTime >= 0 and waitTime >= 0)
+                jobs.extend(jobsSlice)
+                reports.extend(jobReports)
+            self.assertEqual(jobs, self.jobs)
+            self.assertEqual([report.data for report in reports], [report.data for report in expected])
+
+            # loading errors are raised with the slice of the job
+            jobSlices = loader.loadSlices([self.jobs[:2], [{'fwjr_path': "Missing.pkl"}]])
+            next(jobSlices)
+            self.assertRaises(IOError, next, jobSlices)
+            loader.close()
+        return
+
+    def testPrefetch(self):
+        """
+        _testPrefetch_
+
+        Test that at most prefetchSlices slices are loaded ahead.
+        """
+        loaded = []
+
+        def loadFunc(path):
+            loaded.append(path)
+            return path
+
+        loader = FWJRLoader(loadFunc, numThreads=0)
+        jobSlices = loader.loadSlices(grouper(self.jobs, 10))
+        next(jobSlices)
+        self.assertEqual(len(loaded), 10)
+
+        del loaded[:]
+        loader = FWJRLoader(loadFunc, numThreads=2, prefetchSlices=2)
+        jobSlices = loader.loadSlices(grouper(self.jobs, 10))
+        next(jobSlices)
+        loader.pool.close()
+        loader.pool.join()
+        self.assertEqual(len(loaded), 30)
+        return
+
+    @attr('performance')
+    def testLoadSlicesPerformance(self):
+        """
+        _testLoadSlicesPerformance_
+
+        Time accounting the job reports with a database stage taking 5ms per
+        job, loading the reports inline and with threads.
+        """
+        jobs = self.jobs * 5
+        for numThreads in (0, 2):
+            loader = FWJRLoader(loadReport, numThreads=numThreads)
+            startTime = time.time()
+            totalLoad = totalWait = 0
+            for jobsSlice, _, loadTime, waitTime in loader.loadSlices(grouper(jobs, 100)):
+                totalLoad += loadTime
+                totalWait += waitTime
+                time.sleep(0.005 * len(jobsSlice))
+            totalTime = time.time() - startTime
+            loader.close()
+            print("%d loader threads: %.1f jobs/sec, load %.2f secs, waited %.2f secs" %
+                  (numThreads, len(jobs) / totalTime, totalLoad, totalWait))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
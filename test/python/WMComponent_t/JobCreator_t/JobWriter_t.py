@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+_JobWriter_t_
+
+Unit tests for the background writer of the JobCreator job objects.
+"""
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from nose.plugins.attrib import attr
+
+from WMCore.DataStructs.File import File
+from WMCore.DataStructs.Job import Job
+from WMComponent.JobCreator.JobWriter import JobArchiveReader, JobWriter, JobWriterException
+
+
+class JobWriterTest(unittest.TestCase):
+    """
+    _JobWriterTest_
+
+    Unit tests for the background writer of the job objects.
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
+    def makeJobs(self, numJobs, jobsPerCollection=1000, subDir=""):
+        """
+        Jobs with a few input files, in their cache directories
+        """
+        jobs = []
+        for jobID in range(numJobs):
+            job = Job(name="job%d" % jobID)
+            job['id'] = jobID
+            for i in range(5):
+                job.addFile(File(lfn="/store/data/file_%d_%d.root" % (jobID, i), size=1000, events=100))
+            job['mask'].setMaxAndSkipEvents(100, jobID * 100)
+            job.addBaggageParameter("numberOfCores", 4)
+            job['cache_dir'] = os.path.join(self.testDir, subDir, "JobCollection_1_%d" % (jobID // jobsPerCollection),
+                                            "job_%d" % jobID)
+            os.makedirs(job['cache_dir'])
+            jobs.append(job)
+        return jobs
+
+    def loadJob(self, job):
+        with open(os.path.join(job['cache_dir'], 'job.pkl'), 'rb') as handle:
+            return pickle.load(handle)
+
+    def testWriter(self):
+        """
+        _testWriter_
+
+        Test writing the jobs with threads and inline.
+        """
+        jobs = self.makeJobs(50)
+        for numThreads in [0, 4]:
+            writer = JobWriter(numThreads=numThreads, maxPending=5)
+            for job in jobs:
+                writer.write(job)
+            writer.wait()
+            for job in jobs:
+                loadedJob = self.loadJob(job)
+                self.assertEqual(loadedJob['name'], job['name'])
+                self.assertEqual(loadedJob['mask']['FirstEvent'], job['id'] * 100)
+                self.assertEqual(loadedJob.getBaggage().numberOfCores, 4)
+                os.remove(os.path.join(job['cache_dir'], 'job.pkl'))
+
+        # the failures are raised by wait
+        writer = JobWriter(numThreads=2)
+        shutil.rmtree(jobs[0]['cache_dir'])
+        for job in jobs:
+            writer.write(job)
+        self.assertRaises(JobWriterException, writer.wait)
+        writer.wait()
+        return
+
+    def testArchive(self):
+        """
+        _testArchive_
+
+        Test writing the jobs in one archive per job collection.
+        """
+        jobs = self.makeJobs(50, jobsPerCollection=20)
+        writer = JobWriter(numThreads=2, archive=True)
+        for job in jobs:
+            writer.write(job)
+        writer.wait()
+        self.assertFalse(os.path.exists(os.path.join(jobs[0]['cache_dir'], 'job.pkl')))
+        self.assertItemsEqual(os.listdir(os.path.dirname(jobs[0]['cache_dir'])),
+                              ["job_%d" % i for i in range(20)] + ["JobArchive.pkl", "JobArchive.idx"])
+
+        reader = JobArchiveReader()
+        for job in reversed(jobs):
+            loadedJob = reader.loadJob(job['cache_dir'], job['id'])
+            self.assertEqual(loadedJob['name'], job['name'])
+            self.assertEqual(len(loadedJob['input_files']), 5)
+        self.assertEqual(len(reader.indexes), 3)
+        self.assertEqual(reader.loadJob(jobs[0]['cache_dir'], 1000), None)
+        self.assertEqual(reader.loadJob(os.path.join(self.testDir, "JobCollection_2_0", "job_1"), 1), None)
+        return
+
+    @attr('performance')
+    def testWriterPerformance(self):
+        """
+        _testWriterPerformance_
+
+        Time writing 10k new jobs inline, with threads and in archives.
+        """
+        for numThreads, archive in [(0, False), (4, False), (4, True)]:
+            jobs = self.makeJobs(10000, subDir="%d_%s" % (numThreads, archive))
+            startTime = time.time()
+            writer = JobWriter(numThreads=numThreads, archive=archive)
+            for job in jobs:
+                writer.write(job)
+            writer.wait()
+            print("10k jobs with %d threads, archive %s: %.2f secs" % (numThreads, archive, time.time() - startTime))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
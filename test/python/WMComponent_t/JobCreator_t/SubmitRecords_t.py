@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+_SubmitRecords_t_
+
+Unit tests for the submit records written by the JobCreator and read by the
+JobSubmitter cache (no database needed).
+"""
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from WMCore.DataStructs.Job import Job
+from WMComponent.JobCreator.SubmitRecords import (getRecordsPath, makeSubmitRecord, readSubmitRecords,
+                                                  updateSubmitPackages, writeSubmitRecords)
+from WMComponent.JobSubmitter.JobSubmitterPoller import JobPriorityIndex, JobSubmitterPoller
+
+
+class SubmitRecordsTest(unittest.TestCase):
+    """
+    _SubmitRecordsTest_
+
+    Unit tests for the submit records.
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.collectionDir = os.path.join(self.testDir, "JobCollection_1_0")
+        self.jobs = []
+        for jobID in range(1, 4):
+            job = Job(name="job%d" % jobID)
+            job['id'] = jobID
+            job['cache_dir'] = os.path.join(self.collectionDir, "job_%d" % jobID)
+            job['possiblePSN'] = set(["T1_US_FNAL", "T2_CH_CERN"])
+            job['sandbox'] = os.path.join(self.testDir, "sandbox.tar.bz2")
+            job['ownerDN'] = "/DC=ch/CN=user"
+            job['numberOfCores'] = 1
+            self.jobs.append(job)
+            os.makedirs(job['cache_dir'])
+        self.jobs[1].addBaggageParameter("numberOfCores", 8)
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
+    def testRecords(self):
+        """
+        _testRecords_
+
+        Test writing the records of a job group and recording their packages.
+        """
+        recordsPath = getRecordsPath(self.jobs[0]['cache_dir'])
+        self.assertEqual(recordsPath, os.path.join(self.collectionDir, "submitRecords.pkl"))
+        self.assertEqual(readSubmitRecords(recordsPath), {})
+
+        writeSubmitRecords(self.jobs[:2])
+        writeSubmitRecords(self.jobs[2:])
+        records = readSubmitRecords(recordsPath)
+        self.assertItemsEqual(records.keys(), [1, 2, 3])
+        self.assertEqual(records[1], makeSubmitRecord(self.jobs[0]))
+        self.assertEqual(records[1]['possiblePSN'], set(["T1_US_FNAL", "T2_CH_CERN"]))
+        self.assertEqual(records[1]['numberOfCores'], 1)
+        self.assertEqual(records[2]['numberOfCores'], 8)
+        self.assertNotIn('packageDir', records[1])
+
+        updateSubmitPackages({recordsPath: {1: (0, "/batch_1-0"), 4: (0, "/batch_4-0")}})
+        records = readSubmitRecords(recordsPath)
+        self.assertEqual(records[1]['packageRetryCount'], 0)
+        self.assertEqual(records[1]['packageDir'], "/batch_1-0")
+        self.assertNotIn(4, records)
+
+        with open(recordsPath, 'w') as handle:
+            handle.write("not a pickle")
+        self.assertEqual(readSubmitRecords(recordsPath), {})
+        return
+
+    def testSubmitterCache(self):
+        """
+        _testSubmitterCache_
+
+        Test that the JobSubmitter caches the jobs with a record and a package
+        without their pickled job object.
+        """
+        writeSubmitRecords(self.jobs)
+        packageDir = os.path.join(self.testDir, "PackageCollection_0", "batch_1-0")
+        os.makedirs(packageDir)
+        open(os.path.join(packageDir, "JobPackage.pkl"), 'w').close()
+        updateSubmitPackages({getRecordsPath(self.jobs[0]['cache_dir']): {1: (0, packageDir),
+                                                                          2: (0, packageDir),
+                                                                          3: (0, packageDir)}})
+
+        failedJobs = {}
+        poller = JobSubmitterPoller.__new__(JobSubmitterPoller)
+        poller.sender = None
+        poller.jobsByPrio = JobPriorityIndex()
+        poller.jobDataCache = {}
+        poller.jobsToPackage = {}
+        poller.maxJobsToCache = 100
+        poller.maxTaskPriority = 1e7
+        poller.useReqMgrForCompletionCheck = False
+        poller.enableAllSites = False
+        poller.abortSites = set()
+        poller.drainSites = set()
+        poller.ioboundTypes = ('LogCollect', 'Merge', 'Cleanup', 'Harvesting')
+        poller._handleSubmitFailedJobs = lambda jobs, exitCode: failedJobs.setdefault(exitCode, jobs)
+        # the third job was retried since its package was written, and has no pickle
+        newJobs = [{'id': job['id'], 'name': job['name'], 'cache_dir': job['cache_dir'], 'task_type': "Processing",
+                    'task_prio': 0, 'retry_count': 1 if job['id'] == 3 else 0, 'request_name': "request",
+                    'task_id': 1, 'wf_priority': 10, 'task_name': "/request/Processing"} for job in self.jobs]
+        poller.listJobsAction = type("ListJobs", (), {"execute": staticmethod(lambda limitRows: newJobs)})
+
+        poller.refreshCache()
+        self.assertItemsEqual(poller.jobDataCache.keys(), [1, 2])
+        self.assertEqual(poller.jobDataCache[1]['packageDir'], packageDir)
+        self.assertEqual(poller.jobDataCache[1]['possibleSites'], frozenset(["T1_US_FNAL", "T2_CH_CERN"]))
+        self.assertEqual(poller.jobDataCache[2]['numberOfCores'], 8)
+        self.assertEqual(poller.jobDataCache[2]['userdn'], "/DC=ch/CN=user")
+        self.assertEqual([job['id'] for job in failedJobs[71103]], [3])
+        self.assertEqual(len(poller.jobsByPrio), 2)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
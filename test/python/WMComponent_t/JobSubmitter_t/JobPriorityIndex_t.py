@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+_JobPriorityIndex_t_
+
+Unit tests for the JobSubmitter job index and site assignment, on synthetic
+jobs and thresholds (no database needed).
+"""
+from __future__ import print_function, division
+
+import copy
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMComponent.JobSubmitter.JobSubmitterPoller import JobPriorityIndex, JobSubmitterPoller
+
+TASK_TYPES = ["Processing", "Production", "Merge", "LogCollect", "Cleanup"]
+
+
+def makeThresholds(numSites, rand):
+    """
+    Build the site thresholds as returned by ResourceControl.listThresholdsForSubmit
+    """
+    thresholds = {}
+    for i in range(numSites):
+        siteName = "T2_XX_Site%d" % i
+        siteInfo = {"state": "Normal",
+                    "total_pending_slots": rand.randint(0, 300),
+                    "total_pending_jobs": rand.randint(0, 200),
+                    "total_running_slots": rand.randint(0, 3000),
+                    "total_running_jobs": rand.randint(0, 2000),
+                    "thresholds": {}}
+        for jobType in TASK_TYPES:
+            siteInfo["thresholds"][jobType] = {"pending_slots": rand.choice([0, 10, 50, 100]),
+                                               "task_pending_jobs": rand.randint(0, 50),
+                                               "max_slots": rand.randint(0, 1000),
+                                               "task_running_jobs": rand.randint(0, 500),
+                                               "wf_highest_priority": rand.choice([None, 10, 100000])}
+        thresholds[siteName] = siteInfo
+    return thresholds
+
+
+def makePoller(thresholds, maxJobs):
+    """
+    A JobSubmitterPoller with only what assignJobLocations needs
+    """
+    poller = JobSubmitterPoller.__new__(JobSubmitterPoller)
+    poller.sender = None
+    poller.jobsByPrio = JobPriorityIndex()
+    poller.jobDataCache = {}
+    poller.currentRcThresholds = thresholds
+    poller.maxJobsThisCycle = maxJobs
+    poller.maxTaskPriority = 1e7
+    poller.condorOverflowFraction = 0.2
+    poller.ioboundTypes = ('LogCollect', 'Merge', 'Cleanup', 'Harvesting')
+    return poller
+
+
+def fillCache(poller, numJobs, rand):
+    """
+    Cache numJobs jobs of a few workflows, each of them with a set of sites
+    """
+    siteNames = sorted(poller.currentRcThresholds)
+    workflows = []
+    for _ in range(max(1, numJobs // 500)):
+        workflows.append((rand.randint(0, 3), rand.choice([1000, 50000, 200000]),
+                          frozenset(rand.sample(siteNames, rand.randint(1, min(10, len(siteNames)))))))
+    for jobID in range(1, numJobs + 1):
+        taskPrio, wfPrio, sites = rand.choice(workflows)
+        jobType = rand.choice(TASK_TYPES)
+        jobPrio = taskPrio * poller.maxTaskPriority + wfPrio
+        poller.jobDataCache[jobID] = {'id': jobID, 'task_type': jobType, 'possibleSites': sites,
+                                      'packageDir': "package%d" % (jobID // 100), 'jobPrio': jobPrio}
+        poller.jobsByPrio.add(jobID, jobPrio, jobType, sites)
+
+
+def referenceAssignJobLocations(poller):
+    """
+    The site assignment checking each job and site, as done before the index
+    """
+    jobsByPrio = {}
+    for jobID, jobInfo in poller.jobDataCache.items():
+        jobsByPrio.setdefault(jobInfo['jobPrio'], set()).add(jobID)
+    jobsToSubmit = {}
+    jobsCount = 0
+    for jobPrio in sorted(jobsByPrio, reverse=True):
+        for jobid in sorted(jobsByPrio[jobPrio]):
+            jobType = poller.jobDataCache[jobid]['task_type']
+            possibleSites = poller.checkZeroTaskThresholds(jobType, poller.jobDataCache[jobid]['possibleSites'])
+            for siteName in possibleSites:
+                if poller._getJobSubmitCondition(jobPrio, siteName, jobType) != "JobSubmitReady":
+                    continue
+                cachedJob = poller.jobDataCache.pop(jobid)
+                cachedJob['custom'] = {'location': siteName}
+                jobsToSubmit.setdefault(cachedJob['packageDir'], []).append(cachedJob)
+                poller.currentRcThresholds[siteName]["total_pending_jobs"] += 1
+                poller.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"] += 1
+                jobsCount += 1
+                break
+            if jobsCount >= poller.maxJobsThisCycle:
+                return jobsToSubmit
+    return jobsToSubmit
+
+
+def submitted(jobsToSubmit):
+    return dict((package, [(job['id'], job['custom']['location']) for job in jobs])
+                for package, jobs in jobsToSubmit.items())
+
+
+class JobPriorityIndexTest(unittest.TestCase):
+    """
+    _JobPriorityIndexTest_
+
+    Unit tests for the JobSubmitter job index and site assignment.
+    """
+
+    def testIndex(self):
+        """
+        _testIndex_
+
+        Test adding, moving and removing jobs.
+        """
+        index = JobPriorityIndex()
+        index.add(3, 10, "Merge", frozenset(["T1_A"]))
+        index.add(1, 10, "Merge", frozenset(["T1_A"]))
+        index.add(2, 20, "Processing", frozenset(["T1_A", "T2_B"]))
+        index.add(4, 10, "Processing", frozenset(["T1_A"]))
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.priorities(), [20, 10])
+        groups = index.groups(10)
+        self.assertItemsEqual(groups, [("Merge", ("T1_A",), [1, 3]), ("Processing", ("T1_A",), [4])])
+
+        # the lists returned before a change aren't modified
+        index.discard(1)
+        index.discard(5)
+        self.assertItemsEqual(groups, [("Merge", ("T1_A",), [1, 3]), ("Processing", ("T1_A",), [4])])
+        self.assertItemsEqual(index.groups(10), [("Merge", ("T1_A",), [3]), ("Processing", ("T1_A",), [4])])
+
+        index.add(2, 10, "Merge", frozenset(["T1_A"]))
+        self.assertEqual(index.priorities(), [10])
+        self.assertIn(2, index)
+        self.assertNotIn(1, index)
+        index.clear()
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.priorities(), [])
+        return
+
+    def testAssignJobLocations(self):
+        """
+        _testAssignJobLocations_
+
+        Test that the jobs are submitted to the same sites as when checking
+        each of them, on random loads.
+        """
+        for seed in range(30):
+            rand = random.Random(seed)
+            thresholds = makeThresholds(rand.randint(1, 20), rand)
+            maxJobs = rand.choice([0, 10, 500, 5000])
+            poller = makePoller(thresholds, maxJobs)
+            fillCache(poller, rand.randint(1, 3000), rand)
+            reference = makePoller(copy.deepcopy(thresholds), maxJobs)
+            reference.jobDataCache = copy.deepcopy(poller.jobDataCache)
+
+            self.assertEqual(submitted(poller.assignJobLocations()),
+                             submitted(referenceAssignJobLocations(reference)))
+            self.assertEqual(poller.currentRcThresholds, reference.currentRcThresholds)
+            self.assertEqual(sorted(poller.jobDataCache), sorted(reference.jobDataCache))
+            self.assertEqual(len(poller.jobsByPrio), len(poller.jobDataCache))
+        return
+
+    @attr('performance')
+    def testAssignJobLocationsPerformance(self):
+        """
+        _testAssignJobLocationsPerformance_
+
+        Time the site assignment of 300k cached jobs over 300 sites, with the
+        index and checking each job.
+        """
+        rand = random.Random(1)
+        thresholds = makeThresholds(300, rand)
+        poller = makePoller(thresholds, 5000)
+        fillCache(poller, 300000, rand)
+        reference = makePoller(copy.deepcopy(thresholds), 5000)
+        reference.jobDataCache = dict((jobID, dict(jobInfo)) for jobID, jobInfo in poller.jobDataCache.items())
+
+        startTime = time.time()
+        jobsToSubmit = poller.assignJobLocations()
+        print("Site assignment with the index: %.2f secs" % (time.time() - startTime))
+
+        startTime = time.time()
+        referenceJobs = referenceAssignJobLocations(reference)
+        print("Site assignment checking each job: %.2f secs" % (time.time() - startTime))
+        self.assertEqual(submitted(jobsToSubmit), submitted(referenceJobs))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+_DAOFactory_t_
+
+Unit tests for the DAOFactory class registry, which don't need a database.
+"""
+from __future__ import print_function
+
+import logging
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.DAOFactory import DAOFactory, clearDAOCache, getDAOCacheStats
+from WMCore.Database.Dialects import MySQLDialect, OracleDialect
+
+
+class FakeEngine(object):
+    """
+    Just enough of a SQLAlchemy engine for DAOFactory to pick the dialect
+    """
+
+    def __init__(self, dialect):
+        self.dialect = dialect
+
+
+class FakeDBInterface(object):
+    """
+    Just enough of a DBInterface for DAOFactory to pick the dialect
+    """
+
+    def __init__(self, dialect):
+        self.engine = FakeEngine(dialect)
+
+
+class DAOFactoryTest(unittest.TestCase):
+    """
+    _DAOFactoryTest_
+
+    Test the DAO class and instance caching of DAOFactory.
+    """
+
+    def setUp(self):
+        clearDAOCache()
+        self.logger = logging.getLogger()
+        self.mysqlDBI = FakeDBInterface(MySQLDialect())
+        self.oracleDBI = FakeDBInterface(OracleDialect())
+        return
+
+    def tearDown(self):
+        clearDAOCache()
+        return
+
+    def testClassCache(self):
+        """
+        _testClassCache_
+
+        Classes are imported once and new DAO instances are made every time
+        unless instance caching is asked for.
+        """
+        daoFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger, dbinterface=self.mysqlDBI)
+        newJob = daoFactory(classname="Jobs.New")
+        self.assertEqual(newJob.__module__, "WMCore.WMBS.MySQL.Jobs.New")
+        self.assertTrue(newJob.dbi is self.mysqlDBI)
+        self.assertTrue(newJob.logger is self.logger)
+
+        otherFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger, dbinterface=self.mysqlDBI)
+        otherJob = otherFactory(classname="Jobs.New")
+        self.assertFalse(otherJob is newJob)
+        self.assertTrue(otherJob.__class__ is newJob.__class__)
+        self.assertEqual(getDAOCacheStats(), {"classHits": 1, "classMisses": 1, "instanceHits": 0,
+                                              "instanceMisses": 0, "classes": 1})
+
+        oracleFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger, dbinterface=self.oracleDBI)
+        self.assertEqual(oracleFactory(classname="Jobs.New").__module__, "WMCore.WMBS.Oracle.Jobs.New")
+        self.assertEqual(getDAOCacheStats()["classes"], 2)
+
+        self.assertRaises(ImportError, daoFactory, classname="Jobs.DoesNotExist")
+        self.assertEqual(getDAOCacheStats()["classes"], 2)
+        self.assertRaises(TypeError, DAOFactory(package="WMCore.WMBS", logger=self.logger,
+                                                dbinterface=FakeDBInterface(None)), "Jobs.New")
+        return
+
+    def testInstanceCache(self):
+        """
+        _testInstanceCache_
+
+        Cached instances are shared per dbinterface, logger and owner.
+        """
+        daoFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger, dbinterface=self.mysqlDBI,
+                                cacheInstances=True)
+        newJob = daoFactory(classname="Jobs.New")
+        otherFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger, dbinterface=self.mysqlDBI,
+                                  cacheInstances=True)
+        self.assertTrue(otherFactory(classname="Jobs.New") is newJob)
+
+        otherFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger,
+                                  dbinterface=FakeDBInterface(MySQLDialect()), cacheInstances=True)
+        self.assertFalse(otherFactory(classname="Jobs.New") is newJob)
+        otherFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger, dbinterface=self.mysqlDBI)
+        self.assertFalse(otherFactory(classname="Jobs.New") is newJob)
+
+        self.assertEqual(getDAOCacheStats(), {"classHits": 2, "classMisses": 1, "instanceHits": 1,
+                                              "instanceMisses": 2, "classes": 1})
+        return
+
+    def testPreload(self):
+        """
+        _testPreload_
+
+        Preloaded classes are served from the registry.
+        """
+        daoFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger, dbinterface=self.mysqlDBI)
+        self.assertEqual(daoFactory.preload(["Jobs.New", "Jobs.ChangeState", "Files.GetByID"]), 3)
+        self.assertEqual(daoFactory.preload(["Jobs.New", "Jobs.GetCouchID"]), 1)
+        self.assertRaises(ImportError, daoFactory.preload, ["Jobs.DoesNotExist"])
+
+        daoFactory(classname="Files.GetByID")
+        daoFactory(classname="Jobs.GetCouchID")
+        self.assertEqual(getDAOCacheStats(), {"classHits": 2, "classMisses": 4, "instanceHits": 0,
+                                              "instanceMisses": 0, "classes": 4})
+        return
+
+    @attr('performance')
+    def testDAOFactoryPerformance(self):
+        """
+        _testDAOFactoryPerformance_
+
+        Time creating a DAO per file for 100k files.
+        """
+        for cacheInstances in (False, True):
+            startTime = time.time()
+            for _ in range(100000):
+                daoFactory = DAOFactory(package="WMCore.WMBS", logger=self.logger, dbinterface=self.mysqlDBI,
+                                        cacheInstances=cacheInstances)
+                daoFactory(classname="Files.GetByID")
+            print("100k DAOs with cacheInstances=%s: %.2f secs" % (cacheInstances, time.time() - startTime))
+        print(getDAOCacheStats())
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,29 @@
 #! /usr/bin/env python
 
+from __future__ import print_function
+
+import random
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 # import FWCore.ParameterSet.Config as cms
 from WMCore.DataStructs.LumiList import LumiList
 
 
+def makeRandomLumis(nRuns, nLumis, seed):
+    """
+    Build a dict of runs to a random subset (about two thirds) of the
+    lumis in [1, nLumis]
+    """
+    rng = random.Random(seed)
+    runsAndLumis = {}
+    for run in range(1, nRuns + 1):
+        runsAndLumis[run] = [lumi for lumi in range(1, nLumis + 1) if rng.random() < 0.66]
+    return runsAndLumis
+
+
 class LumiListTest(unittest.TestCase):
     """
     _LumiListTest_
@@ -366,6 +384,81 @@ class LumiListTest(unittest.TestCase):
 
         self.assertEqual(c1.getCMSSWString(), w2.getCMSSWString())
 
+    def testSetAlgebraRandom(self):
+        """
+        Compare the set operations and the membership checks against
+        plain python sets of (run, lumi) pairs on random lumi lists
+        """
+        for seed in range(10):
+            aLumis = makeRandomLumis(5, 300, seed)
+            bLumis = makeRandomLumis(7, 200, seed + 100)
+            aList = LumiList(runsAndLumis=aLumis)
+            bList = LumiList(runsAndLumis=bLumis)
+            aSet = set(aList.getLumis())
+            bSet = set(bList.getLumis())
+
+            self.assertEqual(set((aList - bList).getLumis()), aSet - bSet)
+            self.assertEqual(set((aList & bList).getLumis()), aSet & bSet)
+            self.assertEqual(set((aList | bList).getLumis()), aSet | bSet)
+            self.assertEqual(set(aList.filterLumis(sorted(bSet))), aSet & bSet)
+            for runLumi in bSet:
+                self.assertEqual(aList.contains(runLumi), runLumi in aSet)
+
+            # the operands must not be modified by the operations
+            self.assertEqual(set(aList.getLumis()), aSet)
+            self.assertEqual(set(bList.getLumis()), bSet)
+
+    def testOpenEndedContains(self):
+        """
+        A range ending in 0 extends up to the end of the run
+        """
+        lumiList = LumiList(compactList={'1': [[1, 0], [5, 10]], '2': [[3, 4]]})
+        self.assertTrue(lumiList.contains(1, 1))
+        self.assertTrue(lumiList.contains(1, 100))
+        self.assertTrue(lumiList.contains(2, 4))
+        self.assertFalse(lumiList.contains(2, 5))
+        self.assertFalse(lumiList.contains(3, 1))
+
+        lumiList.compactList['2'] = [[3, 4], [10, 12]]
+        self.assertTrue(lumiList.contains(2, 11))
+
+    @attr('performance')
+    def testLargeSetAlgebraPerformance(self):
+        """
+        Time the set operations and the membership checks on lumi lists
+        with 1M lumis each, checking the results against plain python sets
+        """
+        aLumis = makeRandomLumis(100, 15000, 1)
+        bLumis = makeRandomLumis(100, 15000, 2)
+        startTime = time.time()
+        aList = LumiList(runsAndLumis=aLumis)
+        bList = LumiList(runsAndLumis=bLumis)
+        print("Building the LumiLists took %.2f secs" % (time.time() - startTime))
+
+        aSet = set(aList.getLumis())
+        bSet = set(bList.getLumis())
+        self.assertTrue(len(aSet) > 900000)
+        self.assertTrue(len(bSet) > 900000)
+
+        for label, operation, expected in [("sub", lambda: aList - bList, aSet - bSet),
+                                           ("and", lambda: aList & bList, aSet & bSet),
+                                           ("or", lambda: aList | bList, aSet | bSet)]:
+            startTime = time.time()
+            result = operation()
+            print("LumiList %s took %.2f secs" % (label, time.time() - startTime))
+            self.assertEqual(set(result.getLumis()), expected)
+
+        bPairs = sorted(bSet)
+        startTime = time.time()
+        filtered = aList.filterLumis(bPairs)
+        print("filterLumis over %d lumis took %.2f secs" % (len(bPairs), time.time() - startTime))
+        self.assertEqual(set(filtered), aSet & bSet)
+
+        startTime = time.time()
+        found = sum(1 for runLumi in bPairs if runLumi in aList)
+        print("contains over %d lumis took %.2f secs" % (len(bPairs), time.time() - startTime))
+        self.assertEqual(found, len(aSet & bSet))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -6,8 +6,19 @@ Unittest for the WMCore.DataStructs.Run class
 
 """
 
+from __future__ import print_function
+
+import copy
+import json
+import os
+import pickle
+import time
 import unittest
 
+import psutil
+from nose.plugins.attrib import attr
+
+from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Run import Run
 
 
@@ -171,6 +182,105 @@ class RunTest(unittest.TestCase):
         s.add(run10)
         s.add(run11)
 
+    def testIndexing(self):
+        """
+        indexed access, replacement and deletion of lumis
+
+        """
+        run1 = Run(1, *[(5, 50), (1, 10), (3, None)])
+        self.assertEqual(run1.lumis, [1, 3, 5])
+        self.assertEqual(run1[0], 1)
+        self.assertEqual(run1[-1], 5)
+        self.assertEqual(run1[1:], [3, 5])
+        self.assertEqual(run1.getEventsByLumi(5), 50)
+        self.assertEqual(run1.getEventsByLumi(3), None)
+        self.assertEqual(run1.getEventsByLumi(4), None)
+
+        run1[1] = 4
+        self.assertDictEqual(run1.eventsPerLumi, {1: 10, 4: None, 5: 50})
+        run1[10] = (2, 20)
+        self.assertDictEqual(run1.eventsPerLumi, {1: 10, 2: 20, 4: None, 5: 50})
+        del run1[0]
+        del run1[10]
+        self.assertDictEqual(run1.eventsPerLumi, {2: 20, 4: None, 5: 50})
+
+        run1.appendLumi(2)
+        run1.appendLumi((4, 40))
+        run1.appendLumi((5, 5))
+        self.assertDictEqual(run1.eventsPerLumi, {2: 20, 4: 40, 5: 55})
+
+        run1.lumis = [7, (8, 80)]
+        self.assertDictEqual(run1.eventsPerLumi, {7: None, 8: 80})
+        run1.eventsPerLumi = {9: 90, 6: None}
+        self.assertEqual(run1.lumis, [6, 9])
+        self.assertEqual(str(run1), "Run1:{9: 90, 6: None}")
+
+    def testEventComparison(self):
+        """
+        runs with the same lumis are ordered by their event counts
+
+        """
+        run1 = Run(1, *[(1, None), (2, 5)])
+        run2 = Run(1, *[(1, 0), (2, 1)])
+        run3 = Run(1, *[(1, 0), (2, 3)])
+        self.assertEqual(sorted([run3, run2, run1]), [run1, run2, run3])
+        self.assertNotEqual(run2, run3)
+
+    def testSerialization(self):
+        """
+        pickle, deepcopy and JSON round trips
+
+        """
+        run1 = Run(10, *[(1, 11), (2, None), (3, 33)])
+        expected = {"Run": 10, "Lumis": {1: 11, 2: None, 3: 33},
+                    "thunker_encoded_json": True, "type": "WMCore.DataStructs.Run.Run"}
+        self.assertEqual(run1.__to_json__(), expected)
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(run1, protocol)), run1)
+        self.assertEqual(copy.deepcopy(run1), run1)
+
+        jsonRun = json.loads(json.dumps(run1.__to_json__()))
+        self.assertEqual(Run().__from_json__(jsonRun, None), run1)
+
+        # runs pickled with the old dict based layout can still be loaded
+        oldRun = Run.__new__(Run)
+        oldRun.__setstate__({'config': {}, 'run': 10, 'eventsPerLumi': {3: 33, 1: 11, 2: None}})
+        self.assertEqual(oldRun, run1)
+        self.assertEqual(hash(oldRun), hash(run1))
+
+    @attr('performance')
+    def testSubscriptionPerformance(self):
+        """
+        memory and time used by the runs of a 50k file subscription
+
+        """
+        process = psutil.Process(os.getpid())
+        rssBefore = process.memory_info().rss
+        startTime = time.time()
+        files = []
+        for fileNum in range(50000):
+            firstLumi = fileNum * 20 + 1
+            newFile = File(lfn="/store/data/file%d.root" % fileNum)
+            newFile.addRun(Run(1 + fileNum // 1000, *[(lumi, 100) for lumi in range(firstLumi, firstLumi + 20)]))
+            files.append(newFile)
+        print("Creating 50k files with 20 lumis each took %.2f secs and %.1f MB" %
+              (time.time() - startTime, (process.memory_info().rss - rssBefore) / 1024.0 / 1024.0))
+
+        runs = [list(newFile["runs"])[0] for newFile in files]
+        startTime = time.time()
+        runs.sort(reverse=True)
+        firstLumis = [run[0] for run in runs]
+        totalEvents = sum(run.getEventsByLumi(run[-1]) for run in runs)
+        print("Sorting and indexing the runs took %.2f secs" % (time.time() - startTime))
+        self.assertEqual(firstLumis[0], 49999 * 20 + 1)
+        self.assertEqual(totalEvents, 50000 * 100)
+
+        startTime = time.time()
+        pickled = pickle.dumps(files, pickle.HIGHEST_PROTOCOL)
+        self.assertEqual(len(pickle.loads(pickled)), 50000)
+        print("Pickle round trip of %.1f MB took %.2f secs" % (len(pickled) / 1024.0 / 1024.0, time.time() - startTime))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -391,6 +391,77 @@ class CMSCouchTest(unittest.TestCase):
         for item in result:
             self.assertEqual(222, item['doc']['foo'])
 
+    def testUpdateBulkDocumentsWithFunction(self):
+        """
+        Test client side bulk updates and request counting
+        """
+        self.db.queue(Document(id="1", inputDict={'foo': 123}))
+        self.db.queue(Document(id="2", inputDict={'foo': 123}))
+        self.db.commit()
+
+        def increment(doc):
+            if doc is None:
+                return {'_id': "3", 'foo': 0}
+            doc['foo'] += 1
+            return doc
+
+        requestCount = self.db.requestCount
+        result = self.db.updateBulkDocumentsWithFunction(dict.fromkeys(["1", "2", "3"], increment), 2)
+        self.assertEqual(result['failed'], [])
+        self.assertEqual(sorted(result['updated']), ["1", "2", "3"])
+        # two _all_docs and two _bulk_docs requests
+        self.assertEqual(self.db.requestCount - requestCount, 4)
+        docs = dict((row['id'], row['doc']) for row in self.db.allDocs({"include_docs": True})['rows'])
+        self.assertEqual(docs["1"]['foo'], 124)
+        self.assertEqual(docs["3"]['foo'], 0)
+        self.assertEqual(docs["2"]['_rev'], result['updated']["2"]['_rev'])
+
+        result = self.db.updateBulkDocumentsWithFunction({"1": lambda doc: None})
+        self.assertEqual(result['updated'], {})
+
+        # a failing update only fails its own document
+        result = self.db.updateBulkDocumentsWithFunction({"1": lambda doc: doc["missing"], "2": increment})
+        self.assertEqual(result['failed'], ["1"])
+        self.assertEqual(sorted(result['updated']), ["2"])
+
+    def testAsyncCommit(self):
+        """
+        Test committing full batches from the background committer
+        """
+        self.db._queue_size = 10
+        self.db.enableAsyncCommit(maxPendingCommits=2)
+        self.db.commitOne({'_id': "0", 'foo': 0})
+
+        conflicts = []
+
+        def onConflict(database, data, result):
+            conflicts.append(result['id'])
+            return result
+
+        for i in range(100):
+            self.db.queue({'_id': str(i), 'foo': i}, callback=onConflict)
+        self.db.commitAsync(callback=onConflict)
+        self.db.flush()
+        self.assertEqual(self.db.info()['doc_count'], 100)
+        self.assertEqual(conflicts, ["0"])
+
+        stats = self.db.asyncCommitStats()
+        self.assertEqual(stats['commits'], 10)
+        self.assertEqual(stats['docs'], 100)
+        self.assertEqual(stats['conflicts'], 1)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(stats['depth'], 0)
+        self.assertTrue(stats['maxDepth'] <= 2)
+
+        # a plain commit waits for the pending batches and returns the results
+        self.db.queue({'_id': "100"})
+        self.db.commitAsync()
+        self.assertEqual(self.db.commit({'_id': "101"})[0]['id'], "101")
+        self.assertEqual(self.db.info()['doc_count'], 102)
+
+        self.db.disableAsyncCommit()
+        self.assertEqual(self.db.asyncCommitStats(), None)
+
     def testUpdateHandlerAndBulkUpdateProfile(self):
         """
         Test that update function support works
@@ -8,12 +8,45 @@ Unit tests for the DBInterface class
 
 
 
+from __future__ import print_function
+
 import unittest
 import logging
 import threading
+import time
+
+from nose.plugins.attrib import attr
+from sqlalchemy import create_engine
 
+from WMCore.Database.DBCore import DBInterface
 from WMQuality.TestInit import TestInit
 
+
+def timeInListLookups(dbi, nRows):
+    """
+    _timeInListLookups_
+
+    Fill test_tablea with nRows rows and time a lookup of all of them by
+    column1 (indexed, like the ids DAOs look up), once with one query per bind
+    and once with IN list queries. Returns the two lists of ResultSets.
+    """
+    dbi.processData("CREATE INDEX test_tablea_column1 ON test_tablea (column1)")
+    dbi.processData("INSERT INTO test_tablea VALUES (:one, :two, :three)",
+                    [{"one": i, "two": i % 7, "three": "row%d" % i} for i in range(nRows)])
+    selectSQL = "SELECT column1, column2, column3 FROM test_tablea WHERE column1 = :one"
+    binds = [{"one": i} for i in range(nRows)]
+
+    startTime = time.time()
+    perBindResults = dbi.processData(selectSQL, binds)
+    print("%d lookups with one query per bind took %.2f secs" % (nRows, time.time() - startTime))
+
+    startTime = time.time()
+    inListResults = dbi.processData(selectSQL, binds, inListBind="one")
+    print("%d lookups with %d IN list queries took %.2f secs" % (nRows, len(inListResults), time.time() - startTime))
+
+    return perBindResults, inListResults
+
+
 class DBCoreTest(unittest.TestCase):
     def setUp(self):
         self.testInit = TestInit(__file__)
@@ -315,5 +348,109 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testProcessDataInList(self):
+        """
+        _testProcessDataInList_
+
+        Verify that a single column lookup run for a list of binds returns
+        the same rows with IN list queries as with one query per bind.
+        """
+        myThread = threading.currentThread()
+        perBindResults, inListResults = timeInListLookups(myThread.dbi, 1200)
+
+        perBindRows = sorted(tuple(row) for result in perBindResults for row in result.fetchall())
+        inListRows = sorted(tuple(row) for result in inListResults for row in result.fetchall())
+        self.assertEqual(len(perBindRows), 1200)
+        self.assertEqual(inListRows, perBindRows)
+        self.assertEqual(len(inListResults), 3)
+
+        return
+
+    @attr('performance')
+    def testProcessDataInListPerformance(self):
+        """
+        _testProcessDataInListPerformance_
+
+        Time 100k single column lookups with and without IN list batching.
+        """
+        myThread = threading.currentThread()
+        timeInListLookups(myThread.dbi, 100000)
+
+        return
+
+
+class DBCoreInListTest(unittest.TestCase):
+    """
+    _DBCoreInListTest_
+
+    Test the IN list batching of DBInterface against an in-memory SQLite
+    database, which doesn't need any database setup.
+    """
+
+    def setUp(self):
+        self.dbi = DBInterface(logging.getLogger(), create_engine("sqlite://"))
+        self.dbi.processData("""CREATE TABLE test_tablea (
+                                  column1 INTEGER,
+                                  column2 INTEGER,
+                                  column3 VARCHAR(255))""")
+        return
+
+    def testSplitInListStatement(self):
+        """
+        _testSplitInListStatement_
+
+        Only single column lookups can be batched into IN lists.
+        """
+        selectSQL = "SELECT column1 FROM test_tablea WHERE column1 = :one AND column2 > 3"
+        self.assertEqual(self.dbi.splitInListStatement(selectSQL, [{"one": 1}, {"one": 2}], "one"),
+                         ["SELECT column1 FROM test_tablea WHERE column1 ", " AND column2 > 3"])
+        self.assertEqual(self.dbi.splitInListStatement(selectSQL, [{"one": 1, "two": 2}], "one"), None)
+        self.assertEqual(self.dbi.splitInListStatement(selectSQL, [{"one": 1}], "two"), None)
+        self.assertEqual(self.dbi.splitInListStatement("SELECT column1 FROM test_tablea WHERE column1 = :oneb",
+                                                       [{"one": 1}], "one"), None)
+        self.assertEqual(self.dbi.splitInListStatement("DELETE FROM test_tablea WHERE column1 = :one",
+                                                       [{"one": 1}], "one"), None)
+        return
+
+    def testProcessDataInList(self):
+        """
+        _testProcessDataInList_
+
+        IN list queries return every matching row once, in one ResultSet per
+        maxBindsPerQuery distinct values, and ignore missing values.
+        """
+        perBindResults, inListResults = timeInListLookups(self.dbi, 1200)
+
+        perBindRows = sorted(tuple(row) for result in perBindResults for row in result.fetchall())
+        inListRows = sorted(tuple(row) for result in inListResults for row in result.fetchall())
+        self.assertEqual(len(perBindRows), 1200)
+        self.assertEqual(inListRows, perBindRows)
+        self.assertEqual(len(inListResults), 3)
+
+        selectSQL = "SELECT column1 FROM test_tablea WHERE column1 = :one"
+        binds = [{"one": 5}, {"one": 5000}, {"one": 7}, {"one": 5}]
+        results = self.dbi.processData(selectSQL, binds, inListBind="one")
+        self.assertEqual(len(results), 1)
+        self.assertEqual(sorted(row[0] for row in results[0].fetchall()), [5, 7])
+
+        # not eligible, falls back to one query per bind
+        selectSQL = "SELECT column1 FROM test_tablea WHERE column1 = :one AND column2 = :two"
+        binds = [{"one": 5, "two": 5}, {"one": 12, "two": 5}]
+        results = self.dbi.processData(selectSQL, binds, inListBind="one")
+        self.assertEqual(sorted(row[0] for result in results for row in result.fetchall()), [5, 12])
+        return
+
+    @attr('performance')
+    def testProcessDataInListPerformance(self):
+        """
+        _testProcessDataInListPerformance_
+
+        Time 100k single column lookups with and without IN list batching.
+        """
+        perBindResults, inListResults = timeInListLookups(self.dbi, 100000)
+        self.assertEqual(sum(len(result.fetchall()) for result in inListResults), 100000)
+        return
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -7,12 +7,18 @@ Unit tests for the DBFormatter class
 """
 from __future__ import print_function
 
+import logging
 import threading
+import time
 import unittest
 
+import psutil
 from nose.plugins.attrib import attr
+from sqlalchemy import create_engine
 
+from WMCore.Database.DBCore import DBInterface
 from WMCore.Database.DBFormatter import DBFormatter
+from WMCore.Database.ResultSet import StreamingResultSet
 from WMCore.Database.Transaction import Transaction
 from WMQuality.TestInit import TestInit
 
@@ -92,5 +98,120 @@ insert into test (bind1, bind2) values (:bind1, :bind2) """
         self.assertEqual(output, {'bind2': 'value2a', 'bind1': 'value1a'})
 
 
+class DBFormatterStreamingTest(unittest.TestCase):
+    """
+    _DBFormatterStreamingTest_
+
+    Test the streamed results and the column oriented formats against an
+    in-memory SQLite database, which doesn't need any database setup.
+    """
+
+    def setUp(self):
+        self.dbi = DBInterface(logging.getLogger(), create_engine("sqlite://"))
+        self.dbformatter = DBFormatter(logging.getLogger(), self.dbi)
+        self.dbi.processData("create table test (bind1 integer, bind2 varchar(20))")
+        return
+
+    def insertRows(self, nRows):
+        """
+        _insertRows_
+
+        Fill the test table with nRows rows.
+        """
+        binds = [{'bind1': i, 'bind2': u'value%d' % i} for i in range(nRows)]
+        self.dbi.processData("insert into test (bind1, bind2) values (:bind1, :bind2)", binds)
+        return
+
+    def testStreamResults(self):
+        """
+        _testStreamResults_
+
+        Streamed and buffered results are formatted the same way.
+        """
+        self.insertRows(2500)
+        select = "select bind1 AS BIND1, bind2 from test where bind1 < :limit order by bind1"
+
+        result = self.dbi.processData(select, {'limit': 2100}, streamResults=True)
+        self.assertEqual(len(result), 1)
+        self.assertTrue(isinstance(result[0], StreamingResultSet))
+        self.assertEqual(result[0].keys, ['BIND1', 'bind2'])
+        self.assertEqual(len(result[0].fetchmany(10)), 10)
+        self.assertEqual(len(list(result[0])), 2090)
+        self.assertEqual(list(result[0]), [])
+        self.assertEqual(result[0].resultproxy, None)
+
+        streamed = self.dbformatter.formatDict(self.dbi.processData(select, {'limit': 2100},
+                                                                    streamResults=True))
+        buffered = self.dbformatter.formatDict(self.dbi.processData(select, {'limit': 2100}))
+        self.assertEqual(len(streamed), 2100)
+        self.assertEqual(streamed, buffered)
+        self.assertEqual(streamed[7], {'bind1': 7, 'bind2': 'value7'})
+        self.assertEqual(type(streamed[7]['bind2']), str)
+
+        # fetchall keeps the rows around once they have been read
+        result = self.dbi.processData(select, {'limit': 3}, streamResults=True)
+        self.assertEqual(result[0].fetchone()[0], 0)
+        self.assertEqual(len(result[0].fetchall()), 3)
+        self.assertEqual([row[0] for row in result[0]], [0, 1, 2])
+
+        # no rows, or not a select: nothing is streamed
+        result = self.dbi.processData(select, {'limit': 0}, streamResults=True)
+        self.assertEqual(result[0].fetchall(), [])
+        result = self.dbi.processData("delete from test where bind1 = :bind1",
+                                      [{'bind1': 1}, {'bind1': 2}], streamResults=True)
+        self.assertFalse(isinstance(result[0], StreamingResultSet))
+        self.assertEqual(len(self.dbformatter.format(self.dbi.processData("select * from test",
+                                                                          streamResults=True))), 2498)
+        return
+
+    def testColumnFormats(self):
+        """
+        _testColumnFormats_
+
+        Test the namedtuple and column formats.
+        """
+        self.insertRows(3)
+        select = "select bind1 AS BIND1, bind2 from test order by bind1"
+
+        output = self.dbformatter.formatNamedTuple(self.dbi.processData(select))
+        self.assertEqual(output, [(0, 'value0'), (1, 'value1'), (2, 'value2')])
+        self.assertEqual(output[1].bind1, 1)
+        self.assertEqual(output[1].bind2, 'value1')
+        self.assertEqual(type(output[1].bind2), str)
+
+        output = self.dbformatter.formatColumns(self.dbi.processData(select, streamResults=True))
+        self.assertEqual(output, {'bind1': [0, 1, 2], 'bind2': ['value0', 'value1', 'value2']})
+
+        # several result sets are merged into the same columns
+        output = self.dbformatter.formatColumns(self.dbi.processData([select, select]))
+        self.assertEqual(output['bind1'], [0, 1, 2, 0, 1, 2])
+        self.assertEqual(self.dbformatter.formatColumns(self.dbi.processData("select * from test where bind1 > 5")),
+                         {})
+        return
+
+    @attr('performance')
+    def testStreamResultsPerformance(self):
+        """
+        _testStreamResultsPerformance_
+
+        Compare time and memory footprint of formatting 500k rows with and
+        without streaming them from the database.
+        """
+        self.insertRows(500000)
+        process = psutil.Process()
+        select = "select * from test"
+
+        for streamResults in (False, True):
+            for formatter in (self.dbformatter.formatDict, self.dbformatter.formatColumns):
+                startRSS = process.memory_info().rss
+                startTime = time.time()
+                output = formatter(self.dbi.processData(select, streamResults=streamResults))
+                print("%s streamResults=%s: %.2f secs, %.1f MB" % (formatter.__name__, streamResults,
+                                                                   time.time() - startTime,
+                                                                   (process.memory_info().rss - startRSS) / 1024. ** 2))
+                del output
+        return
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+_ReportSummary_t_
+
+Unit tests for the job report summary sidecars.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.ReportSummary import (getSummaryPath, readReportSummaries, readReportSummary,
+                                               writeReportSummary)
+from WMCore.WMBase import getTestBase
+
+
+class ReportSummaryTest(unittest.TestCase):
+    """
+    _ReportSummaryTest_
+
+    Unit tests for the job report summary sidecars.
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        xmlPath = os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t/CMSSWProcessingReport.xml")
+
+        self.report = Report("cmsRun1")
+        self.report.parse(xmlPath)
+        self.report.setStepStartTime("cmsRun1")
+        self.report.setStepStopTime("cmsRun1")
+        self.report.addError("cmsRun1", 8020, "FileOpenError", "Failed to open a file")
+        self.report.data.siteName = "T2_CH_CERN"
+        self.reportPath = os.path.join(self.testDir, "Report.0.pkl")
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
+    def testSummary(self):
+        """
+        _testSummary_
+
+        Verify that the sidecar holds the same information as the report.
+        """
+        self.report.save(self.reportPath)
+        writeReportSummary(self.report, self.reportPath)
+        summaryPath = os.path.join(self.testDir, "Report.0.summary.json")
+        self.assertEqual(getSummaryPath(self.reportPath), summaryPath)
+        self.assertTrue(os.path.isfile(summaryPath))
+
+        summary = readReportSummary(self.reportPath)
+        self.assertEqual(summary["exitCodes"], set([8020]))
+        self.assertEqual(summary["siteName"], "T2_CH_CERN")
+        self.assertEqual(summary["times"], self.report.getFirstStartLastStop())
+
+        # the report itself isn't read when the sidecar matches it
+        reportSize = os.path.getsize(self.reportPath)
+        with open(self.reportPath, 'w') as handle:
+            handle.write("x" * reportSize)
+        self.assertEqual(readReportSummary(self.reportPath), summary)
+        return
+
+    def testFallback(self):
+        """
+        _testFallback_
+
+        Verify that missing, empty or stale sidecars are ignored.
+        """
+        self.report.save(self.reportPath)
+        fullSummary = readReportSummary(self.reportPath)
+        self.assertEqual(fullSummary["exitCodes"], set([8020]))
+
+        # empty sidecar, like the ones touched by the runtime
+        open(getSummaryPath(self.reportPath), 'w').close()
+        self.assertEqual(readReportSummary(self.reportPath), fullSummary)
+
+        # sidecar of a report that was modified afterwards
+        writeReportSummary(self.report, self.reportPath)
+        self.report.addError("cmsRun1", 50660, "PerformanceKill", "Job used too much memory")
+        self.report.save(self.reportPath)
+        self.assertEqual(readReportSummary(self.reportPath)["exitCodes"], set([8020, 50660]))
+
+        missingPath = os.path.join(self.testDir, "Report.1.pkl")
+        badPath = os.path.join(self.testDir, "Report.2.pkl")
+        with open(badPath, 'w') as handle:
+            handle.write("not a report")
+        summaries = readReportSummaries([self.reportPath, missingPath, badPath])
+        self.assertEqual(summaries.keys(), [self.reportPath])
+        return
+
+    @attr('performance')
+    def testSummaryPerformance(self):
+        """
+        _testSummaryPerformance_
+
+        Time reading the summaries of 10k reports, with and without sidecars.
+        """
+        reportPaths = [os.path.join(self.testDir, "Report.%d.pkl" % i) for i in range(10000)]
+        for reportPath in reportPaths:
+            self.report.save(reportPath)
+
+        startTime = time.time()
+        summaries = readReportSummaries(reportPaths)
+        print("10k summaries from full reports: %.2f secs" % (time.time() - startTime))
+        self.assertEqual(len(summaries), 10000)
+
+        for reportPath in reportPaths:
+            writeReportSummary(self.report, reportPath)
+        startTime = time.time()
+        summaries = readReportSummaries(reportPaths)
+        print("10k summaries from sidecars: %.2f secs" % (time.time() - startTime))
+        self.assertEqual(len(summaries), 10000)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,13 +4,19 @@ _Report_t_
 
 Unit tests for the Report class.
 """
+from __future__ import print_function
 
+import copy
 import os
+import pickle
 import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from Utils import FileTools
 from WMCore.Configuration import ConfigSection
+from WMCore.FwkJobReport.FlatReport import LazySection, dumpReportData, loadReportData
 from WMCore.FwkJobReport.Report import Report
 from WMCore.WMBase import getTestBase
 from WMQuality.TestInitCouchApp import TestInitCouchApp
@@ -724,6 +730,99 @@ class ReportTest(unittest.TestCase):
 
         return
 
+    def testFlatReport(self):
+        """
+        _testFlatReport_
+
+        Verify that a report persisted as flat JSON reads back the same as
+        the pickled one, that its sections are only built when accessed and
+        that unpersist still reads pickled reports.
+        """
+        myReport = Report("cmsRun1")
+        myReport.parse(self.xmlPath)
+        myReport.addStep("stageOut1")
+        myReport.addError("cmsRun1", 8001, "SomeError", "Some details \xff")
+        myReport.data.extra = {1: (u"unicode", "str"), "key": [1.5, None, True, 10 ** 20]}
+
+        picklePath = os.path.join(self.testDir, "Report.pkl")
+        jsonPath = os.path.join(self.testDir, "Report.json")
+        myReport.persist(picklePath)
+        myReport.persist(jsonPath, persistFormat="json")
+
+        pickleReport = Report()
+        pickleReport.unpersist(picklePath)
+        jsonReport = Report()
+        jsonReport.unpersist(jsonPath, "cmsRun1")
+        self.assertTrue(isinstance(jsonReport.data, LazySection))
+        self.assertEqual(jsonReport.data._internal_lazyChildren.keys(), ["stageOut1"])
+
+        self.assertEqual(jsonReport.getExitCodes(), set([8001]))
+        self.assertEqual(jsonReport.getSiteName(), pickleReport.getSiteName())
+        self.assertEqual(jsonReport.data.extra, {1: (u"unicode", "str"), "key": [1.5, None, True, 10 ** 20]})
+        self.assertTrue(isinstance(jsonReport.data.extra[1][0], unicode))
+        self.assertEqual(jsonReport.getAllFiles(), pickleReport.getAllFiles())
+        self.assertEqual(jsonReport.getAllInputFiles(), pickleReport.getAllInputFiles())
+        self.assertEqual(jsonReport.report.errors.error0.details, pickleReport.data.cmsRun1.errors.error0.details)
+
+        # pickles and copies of a partially loaded report hold the whole tree
+        jsonReport = Report()
+        jsonReport.unpersist(jsonPath)
+        self.assertEqual(pickle.loads(pickle.dumps(jsonReport.data)).__class__, ConfigSection)
+        jsonReport = Report()
+        jsonReport.unpersist(jsonPath)
+        reportCopy = copy.deepcopy(jsonReport.data)
+        self.assertEqual(reportCopy.cmsRun1.errors.error0.type, "SomeError")
+        self.assertEqual(dumpReportData(reportCopy), dumpReportData(pickleReport.data))
+
+        # a section can be changed before its children are built
+        jsonReport = Report()
+        jsonReport.unpersist(jsonPath)
+        jsonReport.addStep("cmsRun2")
+        jsonReport.data.cmsRun1.status = 1
+        self.assertEqual(jsonReport.listSteps(), ["cmsRun1", "stageOut1", "cmsRun2"])
+        self.assertEqual(jsonReport.getStepExitCode("cmsRun1"), 8001)
+
+        self.assertRaises(ValueError, loadReportData, {"format": "FWJR", "version": 0, "sections": []})
+        return
+
+    @attr('performance')
+    def testFlatReportPerformance(self):
+        """
+        _testFlatReportPerformance_
+
+        Time reading the exit codes, site name and times, then the files,
+        out of 10k pickled and flat JSON reports.
+        """
+        myReport = Report("cmsRun1")
+        myReport.parse(self.xmlPath)
+        myReport.addStep("stageOut1")
+        myReport.addStep("logArch1")
+        myReport.addError("cmsRun1", 8001, "SomeError", "Some details")
+
+        for persistFormat in ("pickle", "json"):
+            paths = [os.path.join(self.testDir, "Report%d.%s" % (i, persistFormat)) for i in range(10000)]
+            for path in paths:
+                myReport.persist(path, persistFormat=persistFormat)
+            print("10k %s reports: %d bytes each" % (persistFormat, os.path.getsize(paths[0])))
+
+            startTime = time.time()
+            for path in paths:
+                report = Report()
+                report.unpersist(path)
+                report.getExitCodes()
+                report.getSiteName()
+                report.getFirstStartLastStop()
+            print("  exit codes, site and times: %.2f secs" % (time.time() - startTime))
+
+            startTime = time.time()
+            for path in paths:
+                report = Report()
+                report.unpersist(path)
+                report.getAllFiles()
+                report.getAllInputFiles()
+            print("  all files: %.2f secs" % (time.time() - startTime))
+        return
+
     def testDuplicatStep(self):
         """
         _testDuplicateStep_
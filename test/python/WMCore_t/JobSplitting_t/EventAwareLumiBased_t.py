@@ -10,8 +10,11 @@ Created on Sep 25, 2012
 
 @author: dballest
 """
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Fileset import Fileset
 from WMCore.DataStructs.Run import Run
@@ -731,6 +734,63 @@ class EventAwareLumiBasedTest(unittest.TestCase):
         jobs = jobGroups[0].jobs
         self.assertEqual(len(jobs), 3)
 
+    def testI_LumiBlocks(self):
+        """
+        _testI_LumiBlocks_
+
+        Test splitting files with long blocks of consecutive lumis, with gaps
+        and a total events limit.
+        """
+        splitter = SplitterFactory()
+        testFileset = Fileset(name="LumiBlocks")
+        for i in range(4):
+            # 100 events per lumi, lumis 1-30 and 41-70
+            newFile = File(lfn="lumiBlocks_%d" % i, size=1000, events=6000)
+            newFile.addRun(Run(i // 2, *(range(i * 100 + 1, i * 100 + 31) + range(i * 100 + 41, i * 100 + 71))))
+            newFile.setLocation('blenheim')
+            testFileset.addFile(newFile)
+        testSubscription = Subscription(fileset=testFileset, workflow=self.testWorkflow,
+                                        split_algo="EventAwareLumiBased", type="Processing")
+
+        jobFactory = splitter(package="WMCore.DataStructs", subscription=testSubscription)
+        jobGroups = jobFactory(events_per_job=2500, total_events=20000,
+                               performance=self.performanceParams)
+        jobs = jobGroups[0].jobs
+        self.assertEqual(len(jobs), 9)
+        self.assertEqual(jobs[0]['mask'].getRunAndLumis(), {0: [[1, 25]]})
+        self.assertEqual(jobs[1]['mask'].getRunAndLumis(), {0: [[26, 30], [41, 60]]})
+        self.assertEqual(jobs[2]['mask'].getRunAndLumis(), {0: [[61, 70], [101, 115]]})
+        self.assertEqual([x['lfn'] for x in jobs[2]['input_files']], ["lumiBlocks_0", "lumiBlocks_1"])
+        self.assertEqual(jobs[4]['mask'].getRunAndLumis(), {0: [[151, 170]]})
+        self.assertEqual(jobs[5]['mask'].getRunAndLumis(), {1: [[201, 225]]})
+        # the total events are reached with the 200th lumi
+        self.assertEqual(jobs[8]['mask'].getRunAndLumis(), {1: [[316, 320]]})
+        return
+
+    @attr('performance')
+    def testLargeDatasetPerformance(self):
+        """
+        _testLargeDatasetPerformance_
+
+        Time the splitting of 20k files with 50 lumis each.
+        """
+        splitter = SplitterFactory()
+        testFileset = Fileset(name="LargeDataset")
+        for i in range(20000):
+            newFile = File(lfn="largeDataset_%d" % i, size=1000, events=100 + (i * 37) % 400)
+            newFile.addRun(Run(1000 + i // 200, *range((i % 200) * 50 + 1, (i % 200) * 50 + 51)))
+            newFile.setLocation('blenheim')
+            testFileset.addFile(newFile)
+        testSubscription = Subscription(fileset=testFileset, workflow=self.testWorkflow,
+                                        split_algo="EventAwareLumiBased", type="Processing")
+
+        jobFactory = splitter(package="WMCore.DataStructs", subscription=testSubscription)
+        startTime = time.time()
+        jobGroups = jobFactory(events_per_job=5000, performance=self.performanceParams)
+        print("Splitting 20k files with 1M lumis: %.2f secs" % (time.time() - startTime))
+        self.assertEqual(len(jobGroups[0].jobs), 1250)
+        self.assertEqual(sum(len(job['input_files']) for job in jobGroups[0].jobs), 21100)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -12,7 +12,8 @@ from WMCore.DAOFactory import DAOFactory
 from WMCore.Database.CMSCouch import CouchServer
 from WMCore.FwkJobReport.Report import Report
 from WMCore.JobSplitting.SplitterFactory import SplitterFactory
-from WMCore.JobStateMachine.ChangeState import ChangeState, Transitions
+from WMCore.JobStateMachine.ChangeState import (ChangeState, Transitions, jobSummaryTransitionUpdate,
+                                                 locationTransitionUpdate, stateTransitionUpdate)
 from WMCore.WMBS.File import File
 from WMCore.WMBS.Fileset import Fileset
 from WMCore.WMBS.Subscription import Subscription
@@ -217,6 +218,126 @@ class TestChangeState(unittest.TestCase):
 
         return
 
+    def testTransitionUpdates(self):
+        """
+        _testTransitionUpdates_
+
+        Verify that the client side transition updates do the same as the
+        couch update handlers.
+        """
+        transition = {"oldstate": "created", "newstate": "executing", "location": "T2_CH_CERN", "timestamp": 10}
+        doc = stateTransitionUpdate("1", [transition])(None)
+        self.assertEqual(doc, {"_id": "1", "states": {"1": transition}})
+        doc = {"_id": "1", "states": {"0": {"newstate": "new"}, "9": {"newstate": "created"}, "10": {}}}
+        doc = stateTransitionUpdate("1", [transition, transition])(doc)
+        self.assertEqual(sorted(doc["states"]), ["0", "10", "11", "12", "9"])
+        self.assertEqual(stateTransitionUpdate("1", [transition])({"_id": "1", "jobid": 1}), None)
+
+        self.assertEqual(locationTransitionUpdate("T1_US_FNAL")(None), None)
+        doc = locationTransitionUpdate("T1_US_FNAL")(doc)
+        self.assertEqual(doc["states"]["12"]["location"], "T1_US_FNAL")
+        self.assertEqual(doc["states"]["11"]["location"], "T2_CH_CERN")
+
+        self.assertEqual(jobSummaryTransitionUpdate([transition])(None), None)
+        doc = jobSummaryTransitionUpdate([transition])({"_id": "job", "state": "created"})
+        self.assertEqual(doc, {"_id": "job", "state": "executing", "timestamp": 10,
+                               "state_history": [transition]})
+        return
+
+    def testBulkTransitions(self):
+        """
+        _testBulkTransitions_
+
+        Verify that the state transitions of many jobs are written with a
+        couple of bulk requests and that the couch stats are kept.
+        """
+        change = ChangeState(self.config, "changestate_t")
+
+        testWorkflow = Workflow(spec=self.specUrl, owner="Steve",
+                                name="wf001", task=self.taskName)
+        testWorkflow.create()
+        testFileset = Fileset(name="TestFileset")
+        testFileset.create()
+        for i in range(50):
+            testFile = File(lfn="SomeLFN%s" % i, events=1024, size=2048)
+            testFile.create()
+            testFileset.addFile(testFile)
+        testFileset.commit()
+        testSubscription = Subscription(fileset=testFileset, workflow=testWorkflow,
+                                        split_algo="FileBased")
+        testSubscription.create()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package="WMCore.WMBS", subscription=testSubscription)
+        jobs = jobFactory(files_per_job=1)[0].jobs
+        self.assertEqual(len(jobs), 50)
+
+        change.propagate(jobs, "new", "none")
+        change.getCouchStats(reset=True)
+        change.propagate(jobs, "created", "new")
+        change.propagate(jobs, "executing", "created")
+        stats = change.getCouchStats(reset=True)
+        self.assertEqual(stats["transitions"], 100)
+        self.assertEqual(stats["failed"], 0)
+        # one _all_docs and one _bulk_docs per propagate
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(change.getCouchStats()["requests"], 0)
+
+        change.recordLocationChange([{"jobid": job["id"], "location": "T2_CH_CERN"} for job in jobs])
+        self.assertEqual(change.getCouchStats()["requests"], 2)
+
+        for job in jobs:
+            jobDoc = change.jobsdatabase.document(job["couch_record"])
+            self.assertEqual(sorted(jobDoc["states"]), ["0", "1", "2"])
+            self.assertEqual(jobDoc["states"]["1"]["newstate"], "created")
+            self.assertEqual(jobDoc["states"]["2"]["oldstate"], "created")
+            self.assertEqual(jobDoc["states"]["2"]["newstate"], "executing")
+            self.assertEqual(jobDoc["states"]["2"]["location"], "T2_CH_CERN")
+        return
+
+    def testAsyncCommits(self):
+        """
+        _testAsyncCommits_
+
+        Verify that the job documents committed in the background are in
+        couch before their state transitions are recorded.
+        """
+        self.config.JobStateMachine.asyncCouchCommits = True
+        change = ChangeState(self.config, "changestate_t")
+
+        testWorkflow = Workflow(spec=self.specUrl, owner="Steve",
+                                name="wf001", task=self.taskName)
+        testWorkflow.create()
+        testFileset = Fileset(name="TestFileset")
+        testFileset.create()
+        for i in range(20):
+            testFile = File(lfn="SomeLFN%s" % i, events=1024, size=2048)
+            testFile.create()
+            testFileset.addFile(testFile)
+        testFileset.commit()
+        testSubscription = Subscription(fileset=testFileset, workflow=testWorkflow,
+                                        split_algo="FileBased")
+        testSubscription.create()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package="WMCore.WMBS", subscription=testSubscription)
+        jobs = jobFactory(files_per_job=1)[0].jobs
+
+        change.propagate(jobs, "new", "none")
+        change.propagate(jobs, "created", "new")
+        stats = change.getCouchStats()
+        self.assertEqual(stats["failed"], 0)
+        jobsStats = stats["asyncCommits"][change.jobsdatabase.name]
+        self.assertEqual(jobsStats["docs"], 20)
+        self.assertEqual(jobsStats["depth"], 0)
+
+        for job in jobs:
+            jobDoc = change.jobsdatabase.document(job["couch_record"])
+            self.assertEqual(sorted(jobDoc["states"]), ["0", "1"])
+        change.jobsdatabase.disableAsyncCommit()
+        change.fwjrdatabase.disableAsyncCommit()
+        return
+
     def testUpdateFailedDoc(self):
         """
         _testUpdateFailedDoc_
@@ -1,12 +1,14 @@
 # system modules
 import json
 import re
+import time
 import zlib
 from multiprocessing import Process
 
 import cherrypy
 from cherrypy import response
 from cherrypy.test import webtest
+from nose.plugins.attrib import attr
 
 # WMCore modules
 from WMCore.REST.Server import RESTApi, RESTEntity, restcall, rows
@@ -14,7 +16,7 @@ from WMCore.REST.Test import setup_dummy_server, fake_authz_headers
 from WMCore.REST.Test import fake_authz_key_file
 from WMCore.REST.Validation import validate_num, validate_str
 from WMCore.REST.Error import InvalidObject
-from WMCore.REST.Format import RawFormat
+from WMCore.REST.Format import JSONFormat, RawFormat, ResponseCache
 from WMCore.REST.Tools import tools
 
 gif_bytes = ('GIF89a\x01\x00\x01\x00\x82\x00\x01\x99"\x1e\x00\x00\x00\x00\x00'
@@ -65,12 +67,47 @@ class Image(RESTEntity):
     def get(self):
         return gif_bytes
 
+class Rows(RESTEntity):
+    def __init__(self, app, api, config, mount):
+        RESTEntity.__init__(self, app, api, config, mount)
+        self.calls = 0
+
+    def validate(self, apiobj, method, api, param, safe):
+        validate_num("rows", param, safe, optional=True, minval=0, maxval=1000000)
+
+    def _generate(self, rows):
+        self.calls += 1
+        for i in xrange(0, rows if rows is not None else 10):
+            yield ["row", i, self.calls]
+
+class Big(Rows):
+    @restcall(etag_limit=1024)
+    @tools.expires(secs=300)
+    def get(self, rows):
+        return self._generate(rows)
+
+class Chunked(Rows):
+    @restcall(formats=[("application/json", JSONFormat(chunk_size=64 * 1024))], etag_limit=1024)
+    @tools.expires(secs=300)
+    def get(self, rows):
+        return self._generate(rows)
+
+class Cached(Rows):
+    @restcall(formats=[("application/json", JSONFormat(chunk_size=64 * 1024))],
+              compression=["deflate", "gzip"], cache=ResponseCache(version=lambda: 1))
+    @tools.expires(secs=300)
+    def get(self, rows):
+        return self._generate(rows)
+
 class Root(RESTApi):
     def __init__(self, app, config, mount):
         RESTApi.__init__(self, app, config, mount)
         self._add({ "simple": Simple(app, self, config, mount),
                     "image":  Image(app, self, config, mount),
-                    "multi":  Multi(app, self, config, mount) })
+                    "multi":  Multi(app, self, config, mount),
+                    "big":    Big(app, self, config, mount),
+                    "chunked": Chunked(app, self, config, mount),
+                    "cached": Cached(app, self, config, mount) })
 
 class Tester(webtest.WebCase):
 
@@ -244,6 +281,58 @@ class Tester(webtest.WebCase):
             assert b["result"][i][0] == "row"
             assert b["result"][i][1] == i
 
+    def test_chunked_json(self):
+        h = self.h + [("Accept", "application/json")]
+        self.getPage("/test/big?rows=1000", headers = h)
+        self.assertStatus("200 OK")
+        body = self.body
+        self.getPage("/test/chunked?rows=1000", headers = h)
+        self.assertStatus("200 OK")
+        self.assertHeader("X-REST-Status", "100")
+        self.assertEqual(self.body, body)
+        b = json.loads(self.body)
+        assert len(b["result"]) == 1000
+        assert b["result"][999] == ["row", 999, 1]
+
+    def test_cached_json(self):
+        h = self.h + [("Accept", "application/json")]
+        self.getPage("/test/cached?rows=5", headers = h)
+        self.assertStatus("200 OK")
+        etag = self.assertHeader("ETag")
+        body = self.body
+        assert json.loads(body)["result"][0] == ["row", 0, 1]
+
+        # same arguments are replied from the cache, without calling the API
+        self.getPage("/test/cached?rows=5", headers = h)
+        self.assertStatus("200 OK")
+        self.assertHeader("ETag", etag)
+        self.assertHeader("Cache-Control", "max-age=300")
+        self.assertEqual(self.body, body)
+
+        self.getPage("/test/cached?rows=5", headers = h + [("If-None-Match", etag)])
+        self.assertStatus(304)
+
+        for enc, wbits in (("deflate", -zlib.MAX_WBITS), ("gzip", 16 + zlib.MAX_WBITS)):
+            self.getPage("/test/cached?rows=5", headers = h + [("Accept-Encoding", enc)])
+            self.assertStatus("200 OK")
+            self.assertHeader("Content-Encoding", enc)
+            self.assertEqual(zlib.decompress(self.body, wbits), body)
+
+        self.getPage("/test/cached?rows=6", headers = h)
+        self.assertStatus("200 OK")
+        assert json.loads(self.body)["result"][0] == ["row", 0, 2]
+
+    @attr('performance')
+    def test_json_performance(self):
+        h = self.h + [("Accept", "application/json")]
+        for page in ("big", "chunked", "cached"):
+            for _ in xrange(0, 3):
+                start = time.time()
+                self.getPage("/test/%s?rows=100000" % page, headers = h)
+                elapsed = time.time() - start
+                self.assertStatus("200 OK")
+                print("%s: 100000 rows, %d bytes in %.2f secs" % (page, len(self.body), elapsed))
+
 def setup_server():
     srcfile = __file__.split("/")[-1].split(".py")[0]
     setup_dummy_server(srcfile, "Root", authz_key_file=FAKE_FILE, port=PORT)
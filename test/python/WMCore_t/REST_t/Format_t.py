@@ -1,3 +1,9 @@
+import json
+import unittest
+import zlib
+
+import cherrypy
+
 from WMCore.REST.Format import RESTFormat
 from WMCore.REST.Format import XMLFormat
 from WMCore.REST.Format import JSONFormat
@@ -5,6 +11,8 @@ from WMCore.REST.Format import RawFormat
 from WMCore.REST.Format import DigestETag
 from WMCore.REST.Format import MD5ETag
 from WMCore.REST.Format import SHA1ETag
+from WMCore.REST.Format import _stream_compress_deflate, _stream_compress_gzip
+
 RESTFormat()
 XMLFormat("app")
 JSONFormat()
@@ -12,3 +20,51 @@ RawFormat()
 DigestETag('md5')
 MD5ETag()
 SHA1ETag()
+
+
+class JSONFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        cherrypy.request.rest_generate_data = "result"
+        cherrypy.request.rest_generate_preamble = None
+        self.rows = [["row", i, {"name": "/Primary/Processed-v%d/RAW" % i}] for i in range(1000)]
+
+    def _format(self, fmt, rows):
+        etag = SHA1ETag()
+        return list(fmt(iter(rows), etag)), etag.value()
+
+    def test_coalesced_chunks(self):
+        chunks, etagval = self._format(JSONFormat(), self.rows)
+        self.assertEqual(len(chunks), len(self.rows) + 2)
+        for chunk_size in (1, 100, 4096, 10 ** 6):
+            cchunks, cetagval = self._format(JSONFormat(chunk_size=chunk_size), self.rows)
+            self.assertEqual("".join(cchunks), "".join(chunks))
+            self.assertEqual(cetagval, etagval)
+            for chunk in cchunks[1:]:
+                self.assertTrue(chunk.endswith("\n"))
+            lines = [len(line) + 1 for line in "".join(cchunks[1:-1]).splitlines()]
+            self.assertTrue(all(len(chunk) < chunk_size + max(lines) for chunk in cchunks[1:-1]))
+        self.assertEqual(len(cchunks), 2)
+        body = json.loads("".join(cchunks))
+        self.assertEqual(body["result"], self.rows)
+
+    def test_coalesced_error(self):
+        def rows():
+            for row in self.rows[:10]:
+                yield row
+            raise ValueError("failed")
+
+        chunks, etagval = self._format(JSONFormat(chunk_size=4096), rows())
+        self.assertEqual(etagval, None)
+        self.assertEqual(json.loads("".join(chunks))["result"], self.rows[:10])
+
+    def test_compressors(self):
+        chunks, _ = self._format(JSONFormat(chunk_size=4096), self.rows)
+        body = "".join(chunks)
+        deflated = "".join(_stream_compress_deflate(chunks, 9, 64 * 1024))
+        self.assertEqual(zlib.decompress(deflated, -zlib.MAX_WBITS), body)
+        gzipped = "".join(_stream_compress_gzip(chunks, 9, 64 * 1024))
+        self.assertEqual(zlib.decompress(gzipped, 16 + zlib.MAX_WBITS), body)
+
+if __name__ == '__main__':
+    unittest.main()
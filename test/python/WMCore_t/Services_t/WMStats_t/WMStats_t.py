@@ -2,6 +2,7 @@
 from __future__ import (print_function, division)
 import unittest
 from pprint import pprint
+from WMCore.Services.WMStats.ActiveDataRefresher import ActiveDataRefresher
 from WMCore.Services.WMStats.WMStatsReader import WMStatsReader
 from WMCore.Services.RequestDB.RequestDBWriter import RequestDBWriter
 from WMQuality.TestInitCouchApp import TestInitCouchApp
@@ -109,6 +110,55 @@ class WMStatsTest(unittest.TestCase):
         requests = self.wmstatsReader.getRequestSummaryWithJobInfo(schema[0]['RequestName'])
         self.assertEqual(requests.keys(), [schema[0]['RequestName']])
 
+    def testActiveDataRefresher(self):
+        """
+        Test that the incremental refreshes give the same data as getActiveData
+        """
+        schema = generate_reqmgr_schema(3)
+        for request in schema:
+            self.reqDBWriter.insertGenericRequest(request)
+        names = [request['RequestName'] for request in schema]
+        self.reqDBWriter.updateRequestStatus(names[0], "assigned")
+        wmstatsDB = self.wmstatsReader.couchDB
+
+        def agentDoc(docId, workflow, agentURL, timestamp):
+            return {"_id": docId, "type": "agent_request", "workflow": workflow,
+                    "agent_url": agentURL, "timestamp": timestamp, "status": {}}
+
+        wmstatsDB.queue(agentDoc("doc1", names[0], "agent1", 10))
+        wmstatsDB.commit()
+
+        refresher = ActiveDataRefresher(self.wmstatsReader)
+        data = refresher.refresh()
+        self.assertEqual(refresher.stats["full"], 1)
+        self.assertEqual(data, self.wmstatsReader.getActiveData(jobInfoFlag=True))
+        self.assertEqual(data[names[0]]["AgentJobInfo"]["agent1"]["_id"], "doc1")
+
+        # newer agent documents, a status change and an archived request
+        wmstatsDB.queue(agentDoc("doc2", names[0], "agent1", 20))
+        wmstatsDB.queue(agentDoc("doc3", names[1], "agent2", 30))
+        wmstatsDB.commit()
+        self.reqDBWriter.updateRequestStatus(names[1], "assigned")
+        self.reqDBWriter.updateRequestStatus(names[2], "normal-archived")
+
+        previous = data
+        data = refresher.refresh()
+        self.assertEqual(refresher.stats["incremental"], 1)
+        self.assertEqual(data, self.wmstatsReader.getActiveData(jobInfoFlag=True))
+        self.assertEqual(data[names[0]]["AgentJobInfo"]["agent1"]["_id"], "doc2")
+        self.assertEqual(data[names[1]]["AgentJobInfo"]["agent2"]["_id"], "doc3")
+        self.assertNotIn(names[2], data)
+        # the previous data isn't modified
+        self.assertEqual(previous[names[0]]["AgentJobInfo"]["agent1"]["_id"], "doc1")
+        self.assertIn(names[2], previous)
+
+        # deleting the latest document gives back the previous one
+        doc = wmstatsDB.document("doc2")
+        wmstatsDB.delete_doc("doc2", rev=doc["_rev"])
+        data = refresher.refresh()
+        self.assertEqual(data[names[0]]["AgentJobInfo"]["agent1"]["_id"], "doc1")
+        self.assertEqual(refresher.stats["full"], 1)
+
     def testCompletedCheck(self):
         self.assertEqual(RequestInfo(sample_request_info).isWorkflowFinished(), False)
         self.assertEqual(RequestInfo(sample_complete).isWorkflowFinished(), True)
@@ -2,13 +2,251 @@
 Unit test for pycurl_manager module.
 """
 
-from __future__ import division
+from __future__ import division, print_function
 
+import json
 import os
+import socket
 import tempfile
+import threading
+import time
 import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from nose.plugins.attrib import attr
+
+from WMCore.Services.pycurl_manager import (CurlHandlePool, RequestHandler, getdata, cern_sso_cookie,
+                                            getCurlHandlePool)
+
+BIG_ROWS = json.dumps([{"name": "row%d" % i, "size": i} for i in range(2000)])
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answer every GET with a small JSON document, keeping the connection open"""
+    protocol_version = "HTTP/1.1"
+    # ResponseHeader takes any header line with HTTP in it for the status line
+    server_version = "LocalServer/1.0"
+    sys_version = ""
+    # send each response in one go, like a real server would
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        status = 200
+        body = '{"path": "%s"}' % self.path
+        if self.path.startswith("/flaky"):
+            # fail the first request to each flaky path
+            with self.server.lock:
+                self.server.requests[self.path] = self.server.requests.get(self.path, 0) + 1
+                if self.server.requests[self.path] == 1:
+                    status = 503
+        elif self.path.startswith("/broken"):
+            status = 500
+        elif self.path.startswith("/text"):
+            body = "not json"
+        elif self.path.startswith("/big"):
+            # a service that takes a while to answer with a large document
+            time.sleep(0.02)
+            body = '{"path": "%s", "rows": %s}' % (self.path, BIG_ROWS)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        return
+
+
+class LocalServer(ThreadingMixIn, HTTPServer):
+    """Local HTTP stand-in for a remote service"""
+    daemon_threads = True
+
+    def __init__(self, *args):
+        HTTPServer.__init__(self, *args)
+        self.lock = threading.Lock()
+        self.requests = {}
+
+
+class LocalServerTest(unittest.TestCase):
+    """Base class of the tests against a local HTTP server"""
+
+    def setUp(self):
+        "start the local server"
+        self.server = LocalServer(("127.0.0.1", 0), KeepAliveHandler)
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        "stop the local server"
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class CurlHandlePoolTest(LocalServerTest):
+    """Test the curl handle pool against a local HTTP server"""
+
+    def testHandlePool(self):
+        """
+        Test that handles and their connections are reused.
+        """
+        pool = CurlHandlePool(size=2, idleTimeout=60)
+        mgr = RequestHandler({'pool': pool})
+        for i in range(5):
+            header, data = mgr.request("%s/doc%d" % (self.url, i), {}, decode=True)
+            self.assertEqual(header.status, 200)
+            self.assertEqual(data, {"path": "/doc%d" % i})
+        self.assertEqual(pool.stats(), {'hits': 4, 'misses': 1, 'expired': 0, 'discarded': 0,
+                                        'connections': 1, 'reused_connections': 4, 'idle': 1})
+
+        # a full pool closes the extra handles
+        handles = [pool.get(self.url) for _ in range(3)]
+        for handle in handles:
+            pool.put(self.url, handle)
+        self.assertEqual(pool.stats()['idle'], 2)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+        # and idle handles expire
+        pool.idleTimeout = 0
+        time.sleep(0.01)
+        mgr.request(self.url, {})
+        stats = pool.stats()
+        self.assertEqual(stats['expired'], 2)
+        self.assertEqual(stats['connections'], 2)
+        self.assertEqual(stats['idle'], 1)
+        pool.clear()
+        self.assertEqual(pool.stats()['idle'], 0)
+
+    def testHandlePoolFork(self):
+        """
+        Test that a forked process doesn't reuse the handles of its parent.
+        """
+        pool = getCurlHandlePool()
+        mgr = RequestHandler({'pool': pool})
+        mgr.request(self.url, {})
+        parentHandle = pool.get(self.url)
+        pool.put(self.url, parentHandle)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+        readFd, writeFd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # the child reports what it sees and exits without running the other tests
+            try:
+                result = {'samePool': getCurlHandlePool() is pool,
+                          'idle': pool.stats()['idle'],
+                          'sameHandle': pool.get(self.url) is parentHandle}
+                header, _ = mgr.request(self.url, {})
+                result['status'] = header.status
+                result['childIdle'] = pool.stats()['idle']
+                os.write(writeFd, json.dumps(result))
+            finally:
+                os._exit(0)
+        os.close(writeFd)
+        os.waitpid(pid, 0)
+        result = json.loads(os.read(readFd, 1024))
+        os.close(readFd)
+        self.assertEqual(result, {'samePool': False, 'idle': 0, 'sameHandle': False,
+                                  'status': 200, 'childIdle': 1})
+
+        # the parent keeps its handle and connection
+        self.assertTrue(pool.get(self.url) is parentHandle)
+        pool.clear()
+
+    @attr('performance')
+    def testHandlePoolPerformance(self):
+        """
+        Time 2000 requests to the local server with and without the pool.
+        """
+        for pool in (None, CurlHandlePool()):
+            mgr = RequestHandler({'pool': pool})
+            startTime = time.time()
+            for i in range(2000):
+                mgr.request("%s/doc%d" % (self.url, i), {})
+            print("2000 requests with pool %s: %.2f secs" % (pool is not None, time.time() - startTime))
+            if pool:
+                print(pool.stats())
+
+
+class MultiFetcherTest(LocalServerTest):
+    """Test fetching several urls at once against a local HTTP server"""
+
+    def testGetdata(self):
+        """
+        Test that every url gets exactly one result, raw or decoded.
+        """
+        urls = ["%s/doc%d" % (self.url, i) for i in range(50)]
+        results = list(getdata(urls, "key.pem", "cert.pem", num_conn=5, host_conn=2))
+        self.assertEqual(sorted(row['url'] for row in results), sorted(urls))
+        for row in results:
+            self.assertTrue('200 OK' in row['headers'])
+            self.assertEqual(json.loads(row['data']), {"path": row['url'][len(self.url):]})
+
+        for threads in (0, 4):
+            urls.append("%s/text" % self.url)
+            results = list(getdata(urls, "key.pem", "cert.pem", num_conn=5,
+                                   decode=json.loads, decode_threads=threads))
+            self.assertEqual(sorted(row['url'] for row in results), sorted(urls))
+            for row in results:
+                if row['url'].endswith("/text"):
+                    self.assertEqual(row['data'], None)
+                    self.assertTrue(row['error'].startswith("failed to decode data"))
+                else:
+                    self.assertEqual(row['data'], {"path": row['url'][len(self.url):]})
+            urls.pop()
+
+        # invalid urls are skipped
+        self.assertEqual(list(getdata(["ftp://host/file"], "key.pem", "cert.pem")), [])
+
+    def testRetries(self):
+        """
+        Test that server and connection errors are retried with backoff.
+        """
+        urls = ["%s/flaky%d" % (self.url, i) for i in range(5)] + ["%s/broken" % self.url]
+        results = dict((row['url'], row) for row in getdata(urls, "key.pem", "cert.pem",
+                                                             retries=2, backoff=0.01,
+                                                             decode=json.loads))
+        self.assertEqual(len(results), 6)
+        for url in urls[:5]:
+            self.assertEqual(results[url]['data'], {"path": url[len(self.url):]})
+            self.assertEqual(self.server.requests[url[len(self.url):]], 2)
+        # the last attempt of an url that keeps failing is returned as is
+        self.assertTrue('500' in results[urls[5]]['headers'])
+
+        # nothing listens on a closed port
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        url = "http://127.0.0.1:%d" % closed.getsockname()[1]
+        closed.close()
+        startTime = time.time()
+        results = list(getdata([url], "key.pem", "cert.pem", retries=2, backoff=0.1))
+        self.assertTrue(time.time() - startTime >= 0.3)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['data'], None)
+        self.assertEqual(results[0]['code'], 7)
+
+    @attr('performance')
+    def testGetdataPerformance(self):
+        """
+        Time fetching and decoding 500 JSON documents, decoding them after
+        the fetch, as each transfer completes or in a thread pool.
+        """
+        urls = ["%s/big%d" % (self.url, i) for i in range(500)]
+        startTime = time.time()
+        for row in getdata(urls, "key.pem", "cert.pem", num_conn=10):
+            json.loads(row['data'])
+        print("500 documents decoded after the fetch: %.2f secs" % (time.time() - startTime))
+        for threads in (0, 4):
+            startTime = time.time()
+            for _ in getdata(urls, "key.pem", "cert.pem", num_conn=10,
+                             decode=json.loads, decode_threads=threads):
+                pass
+            print("500 documents decoded while fetching with %d threads: %.2f secs" %
+                  (threads, time.time() - startTime))
 
-from WMCore.Services.pycurl_manager import RequestHandler, getdata, cern_sso_cookie
 
 class PyCurlManager(unittest.TestCase):
     """Test pycurl_manager module"""
@@ -12,7 +12,7 @@ import unittest
 from WMCore.DAOFactory import DAOFactory
 from WMCore.DataStructs.File import File as WMFile
 from WMCore.DataStructs.Run import Run
-from WMCore.WMBS.File import File, addFilesToWMBSInBulk
+from WMCore.WMBS.File import File, addFilesToWMBSInBulk, getFileAncestry, getFileLFNs, loadFilesByID
 from WMCore.WMBS.Fileset import Fileset
 from WMCore.WMBS.Job import Job
 from WMCore.WMBS.JobGroup import JobGroup
@@ -689,6 +689,53 @@ class FileTest(unittest.TestCase):
 
         return
 
+    def testGetFileAncestry(self):
+        """
+        _testGetFileAncestry_
+
+        Verify that the ancestry of several files is loaded level by level in
+        bulk, along with the lfns and the files of the ancestors.
+        """
+        testFiles = {}
+        for name in "ABCDEF":
+            testFile = File(lfn="/this/is/a/lfn%s" % name, size=1024, events=10,
+                            checksums={'cksum': '1%s' % name}, locations="T1_US_FNAL_Disk")
+            testFile.create()
+            testFiles[name] = testFile
+
+        testFiles["A"].addParent(lfn="/this/is/a/lfnB")
+        testFiles["A"].addParent(lfn="/this/is/a/lfnC")
+        testFiles["B"].addParent(lfn="/this/is/a/lfnD")
+        testFiles["C"].addParent(lfn="/this/is/a/lfnD")
+        testFiles["D"].addParent(lfn="/this/is/a/lfnE")
+        testFiles["D"].addParent(lfn="/this/is/a/lfnF")
+        ids = dict((name, testFile["id"]) for name, testFile in testFiles.items())
+
+        daoFactory = testFiles["A"].daofactory
+        ancestry = getFileAncestry(daoFactory, [ids["A"], ids["C"], ids["F"]], level=4)
+        self.assertEqual(ancestry[ids["A"]], [sorted([ids["B"], ids["C"]]), [ids["D"]],
+                                              sorted([ids["E"], ids["F"]]), []])
+        self.assertEqual(ancestry[ids["C"]], [[ids["D"]], sorted([ids["E"], ids["F"]]), [], []])
+        self.assertEqual(ancestry[ids["F"]], [[], [], [], []])
+
+        descendants = getFileAncestry(daoFactory, [ids["D"], ids["E"]], level=2, descendants=True)
+        self.assertEqual(descendants[ids["D"]], [sorted([ids["B"], ids["C"]]), [ids["A"]]])
+        self.assertEqual(descendants[ids["E"]], [[ids["D"]], sorted([ids["B"], ids["C"]])])
+
+        lfns = getFileLFNs(daoFactory, [ids["B"], ids["E"]], useCache=True)
+        self.assertEqual(lfns, {ids["B"]: "/this/is/a/lfnB", ids["E"]: "/this/is/a/lfnE"})
+        lfns = getFileLFNs(daoFactory, [ids["B"], ids["C"]], useCache=True)
+        self.assertEqual(lfns, {ids["B"]: "/this/is/a/lfnB", ids["C"]: "/this/is/a/lfnC"})
+
+        ancestors = testFiles["A"].getAncestors(level=3, type="file")
+        self.assertEqual([f["lfn"] for f in ancestors], ["/this/is/a/lfnE", "/this/is/a/lfnF"])
+        self.assertEqual(ancestors[0]["checksums"], {'cksum': '1E'})
+        self.assertEqual(ancestors[0]["size"], 1024)
+        self.assertEqual(ancestors[0]["events"], 10)
+        self.assertEqual(testFiles["F"].getAncestors(level=1, type="file"), [])
+        self.assertEqual(loadFilesByID(daoFactory, []), {})
+        return
+
     def testGetLocationBulk(self):
         """
         _testGetLocationBulk_
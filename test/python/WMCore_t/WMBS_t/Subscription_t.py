@@ -5,15 +5,19 @@ _Subscription_t_
 Unit tests for the WMBS Subscription class and all it's DAOs.
 """
 from __future__ import division, print_function
+import copy
+import pickle
 import threading
 import time
 import unittest
 from functools import reduce
 
+from nose.plugins.attrib import attr
+
 from WMCore.DAOFactory import DAOFactory
 from WMCore.DataStructs.Run import Run
 from WMCore.WMBS.CreateWMBSBase import CreateWMBSBase
-from WMCore.WMBS.File import File
+from WMCore.WMBS.File import File, addFilesToWMBSInBulk
 from WMCore.WMBS.Fileset import Fileset
 from WMCore.WMBS.Job import Job
 from WMCore.WMBS.JobGroup import JobGroup
@@ -1513,6 +1517,110 @@ class SubscriptionTest(unittest.TestCase):
         testFileF.delete()
         return
 
+    def testFilesOfStatusBulkLoad(self):
+        """
+        _testFilesOfStatusBulkLoad_
+
+        Verify that filesOfStatus() loads the checksums and run/lumi
+        information of all the files in bulk, and that lazy checksums are
+        loaded for all the files the first time one of them is looked up.
+        """
+        testWorkflow = Workflow(spec="spec.xml", owner="Simon",
+                                name="wf001", task='Test')
+        testWorkflow.create()
+
+        testFileA = File(lfn="/this/is/a/lfnA", size=1024, events=20,
+                         checksums={'cksum': '1111', 'adler32': 'abcd1234'},
+                         locations={"goodse.cern.ch"})
+        testFileA.addRun(Run(1, *[45, 46]))
+        testFileA.addRun(Run(2, *[47]))
+        testFileB = File(lfn="/this/is/a/lfnB", size=1024, events=20,
+                         checksums={'cksum': '2222'}, locations={"testse.cern.ch"})
+        testFileB.addRun(Run(3, *[48]))
+        testFileC = File(lfn="/this/is/a/lfnC", size=1024, events=20,
+                         locations={"goodse.cern.ch"})
+        testFileA.create()
+        testFileB.create()
+        testFileC.create()
+
+        testFileset = Fileset(name="TestFileset")
+        testFileset.create()
+        testFileset.addFile(testFileA)
+        testFileset.addFile(testFileB)
+        testFileset.addFile(testFileC)
+        testFileset.commit()
+
+        testSubscription = Subscription(fileset=testFileset,
+                                        workflow=testWorkflow)
+        testSubscription.create()
+
+        files = dict((f["lfn"], f) for f in testSubscription.filesOfStatus("Available"))
+        self.assertEqual(files["/this/is/a/lfnA"]["checksums"], {'cksum': '1111', 'adler32': 'abcd1234'})
+        self.assertEqual(files["/this/is/a/lfnB"]["checksums"], {'cksum': '2222'})
+        self.assertEqual(files["/this/is/a/lfnC"]["checksums"], {})
+        self.assertEqual(files["/this/is/a/lfnB"]["locations"], {"testse.cern.ch"})
+        self.assertEqual(len(files["/this/is/a/lfnA"]["runs"]), 0)
+
+        files = dict((f["lfn"], f) for f in testSubscription.filesOfStatus("Available", loadRunLumis=True))
+        self.assertEqual(sorted(files["/this/is/a/lfnA"]["runs"]), [Run(1, *[45, 46]), Run(2, *[47])])
+        self.assertEqual(sorted(files["/this/is/a/lfnB"]["runs"]), [Run(3, *[48])])
+        self.assertEqual(len(files["/this/is/a/lfnC"]["runs"]), 0)
+
+        files = dict((f["lfn"], f) for f in testSubscription.filesOfStatus("Available", lazyChecksums=True))
+        for testFile in files.values():
+            self.assertFalse("checksums" in testFile)
+        self.assertEqual(files["/this/is/a/lfnB"]["checksums"], {'cksum': '2222'})
+        for testFile in files.values():
+            self.assertTrue("checksums" in testFile)
+        self.assertEqual(files["/this/is/a/lfnA"]["checksums"], {'cksum': '1111', 'adler32': 'abcd1234'})
+        self.assertEqual(files["/this/is/a/lfnC"]["checksums"], {})
+        self.assertRaises(KeyError, files["/this/is/a/lfnC"].__getitem__, "nonexistent")
+
+        # lazy files are copied and pickled with their checksums
+        files = dict((f["lfn"], f) for f in testSubscription.filesOfStatus("Available", lazyChecksums=True))
+        copiedFile = copy.deepcopy(files["/this/is/a/lfnA"])
+        self.assertEqual(copiedFile["checksums"], {'cksum': '1111', 'adler32': 'abcd1234'})
+        self.assertFalse(hasattr(copiedFile, "checksumLoader"))
+        files = dict((f["lfn"], f) for f in testSubscription.filesOfStatus("Available", lazyChecksums=True))
+        pickledFile = pickle.loads(pickle.dumps(files["/this/is/a/lfnB"], pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(pickledFile["checksums"], {'cksum': '2222'})
+
+        files = testSubscription.filesOfStatus("Available", loadChecksums=False)
+        self.assertEqual([f["checksums"] for f in files], [{}, {}, {}])
+        return
+
+    @attr('performance')
+    def testFilesOfStatusPerformance(self):
+        """
+        _testFilesOfStatusPerformance_
+
+        Time loading the available files of a subscription with 100k files.
+        """
+        testWorkflow = Workflow(spec="spec.xml", owner="Simon",
+                                name="wf001", task='Test')
+        testWorkflow.create()
+        testFileset = Fileset(name="TestFileset")
+        testFileset.create()
+
+        files = []
+        for i in range(100000):
+            testFile = File(lfn="/this/is/a/lfn%d" % i, size=1024, events=20,
+                            checksums={'cksum': str(i), 'adler32': '%08x' % i},
+                            locations={"goodse.cern.ch"})
+            testFile.addRun(Run(1, *[i]))
+            files.append(testFile)
+        addFilesToWMBSInBulk(testFileset.id, "wf001", files, isDBS=False)
+        testSubscription = Subscription(fileset=testFileset, workflow=testWorkflow)
+        testSubscription.create()
+
+        for lazyChecksums in (False, True):
+            startTime = time.time()
+            availableFiles = testSubscription.filesOfStatus("Available", doingJobSplitting=True,
+                                                            lazyChecksums=lazyChecksums)
+            self.assertEqual(len(availableFiles), 100000)
+            print("filesOfStatus(lazyChecksums=%s): %.2f secs" % (lazyChecksums, time.time() - startTime))
+        return
+
     def testJobs(self):
         """
         _testJobs_
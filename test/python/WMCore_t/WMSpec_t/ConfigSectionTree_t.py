@@ -2,12 +2,18 @@
 """
 Tests for ConfigSectionTree
 """
+from __future__ import print_function
 
+import pickle
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.WMSpec.ConfigSectionTree import ConfigSectionTree
 from WMCore.WMSpec.ConfigSectionTree import TreeHelper
-from WMCore.WMSpec.ConfigSectionTree import findTopNode, addNode
+from WMCore.WMSpec.ConfigSectionTree import findTopNode, addNode, getNode
+from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper
 
 
 class ConfigSectionTreeTest(unittest.TestCase):
@@ -134,6 +140,61 @@ class ConfigSectionTreeTest(unittest.TestCase):
         self.assertEqual(topNode.name(), "node2")
         topNode = TreeHelper(findTopNode(node3))
         self.assertEqual(topNode.name(), "node2")
+    def testNodeIndex(self):
+        """cached node lookups follow tree changes"""
+        node1 = TreeHelper(ConfigSectionTree("node1"))
+        node2 = TreeHelper(ConfigSectionTree("node2"))
+        node3 = TreeHelper(ConfigSectionTree("node3"))
+        node4 = TreeHelper(ConfigSectionTree("node4"))
+
+        node1.addNode(node2)
+        self.assertTrue(node1.getNode("node2") is node2.data)
+        self.assertEqual(node1.getNode("node3"), None)
+
+        node2.addNode(node3)
+        self.assertTrue(node1.getNode("node3") is node3.data)
+        self.assertTrue(getNode(node3.data, "node1") is node1.data)
+        node1.addTopNode(node4)
+        self.assertEqual([x._internal_name for x in node1.nodeIterator()],
+                         ["node1", "node4", "node2", "node3"])
+        self.assertRaises(RuntimeError, node3.addNode, TreeHelper(ConfigSectionTree("node4")))
+
+        node1.deleteNode("node2")
+        self.assertEqual(node1.getNode("node2"), None)
+        self.assertEqual(node1.getNode("node3"), None)
+        self.assertEqual(node1.listNodes(), ["node1", "node4"])
+        node4.addNode(node2)
+        self.assertEqual([x._internal_name for x in node1.nodeChildIterator()],
+                         ["node4", "node2", "node3"])
+
+        # changes made without the tree functions are picked up on a miss
+        node5 = ConfigSectionTree("node5")
+        setattr(node3.data.tree.children, "node5", node5)
+        node3.data.tree.childNames.append("node5")
+        self.assertTrue(node1.getNode("node5") is node5)
+
+        # the index isn't pickled and is rebuilt for the unpickled tree
+        self.assertFalse("_internal_nodeIndex" in node1.data.__getstate__())
+        tree = pickle.loads(pickle.dumps(node1.data))
+        self.assertEqual(TreeHelper(tree).listNodes(), node1.listNodes())
+        self.assertEqual(TreeHelper(tree).getNode("node3")._internal_name, "node3")
+        self.assertTrue(TreeHelper(tree).getNode("node3") is tree.tree.children.node4.tree.children.node2.tree.children.node3)
+
+    @attr('performance')
+    def testTaskIteratorPerformance(self):
+        """walk a 200 task workload"""
+        workload = WMWorkloadHelper(WMWorkload("TestWorkload"))
+        tasks = [workload.newTask("Task0")]
+        for i in range(1, 200):
+            tasks.append(tasks[(i - 1) // 2].addTask("Task%d" % i))
+
+        startTime = time.time()
+        for _ in range(10):
+            names = [task.name() for topTask in workload.taskIterator() for task in topTask.taskIterator()]
+        print("10 walks over 200 tasks: %.3f secs" % (time.time() - startTime))
+        self.assertEqual(len(names), 200)
+        self.assertEqual(names[:4], ["Task0", "Task1", "Task3", "Task7"])
+
 
 
 
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Unittests for the WMStats DataCache
+"""
+
+from __future__ import division, print_function
+
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.ReqMgr.DataStructs.Request import RequestInfo, protectedLFNs
+from WMCore.ReqMgr.DataStructs.RequestStatus import ACTIVE_STATUS_FILTER
+from WMCore.WMStats.DataStructs.DataCache import DataCache
+
+STATUSES = ["assigned", "acquired", "running-open", "running-closed", "completed",
+            "closed-out", "announced", "aborted-completed"]
+CAMPAIGNS = ["CampaignA", "CampaignB", "CampaignC"]
+TEAMS = ["production", "relval", "highprio"]
+AGENTS = ["https://agent%d.cern.ch:5984" % i for i in range(4)]
+
+
+def makeRequests(numRequests, seed=0):
+    """
+    Build a snapshot of active requests, with ReReco, TaskChain and StepChain
+    requests and some properties missing, in a list or boolean
+    """
+    rand = random.Random(seed)
+    requests = {}
+    for i in range(numRequests):
+        name = "request_%d" % i
+        reqDict = {"RequestName": name,
+                   "RequestStatus": rand.choice(STATUSES),
+                   "Team": rand.choice(TEAMS),
+                   "AgentURL": rand.sample(AGENTS, rand.randint(0, 2)),
+                   "OutputDatasets": ["/Primary%d/Era-Proc%d-v1/AODSIM" % (i, j) for j in range(2)],
+                   "UnmergedLFNBase": "/store/unmerged",
+                   "RequestPriority": rand.randint(0, 3),
+                   "TrustSitelists": rand.choice([True, False])}
+        kind = i % 5
+        if kind == 0:
+            reqDict["TaskChain"] = 2
+            reqDict["Campaign"] = rand.choice(CAMPAIGNS)
+            reqDict["Task1"] = {"InputDataset": "/Input%d/Era-v1/RAW" % (i % 7),
+                                "Campaign": rand.choice(CAMPAIGNS)}
+            reqDict["Task2"] = {}
+        elif kind == 1:
+            reqDict["StepChain"] = 1
+            reqDict["Step1"] = {"Campaign": rand.choice(CAMPAIGNS)}
+        elif kind == 2:
+            reqDict["Campaign"] = rand.choice(CAMPAIGNS)
+            reqDict["InputDataset"] = "/Input%d/Era-v1/RAW" % (i % 7)
+        elif kind == 3:
+            reqDict["Campaign"] = rand.sample(CAMPAIGNS, 2)
+            reqDict["Team"] = True
+        requests[name] = reqDict
+    return requests
+
+
+def scanRequests(requests, filterDict):
+    """
+    Names of the requests matching the filter, checking all of them
+    """
+    return [reqDict["RequestName"] for reqDict in requests.values()
+            if RequestInfo(reqDict).andFilterCheck(filterDict)]
+
+
+class DataCacheTest(unittest.TestCase):
+    """
+    Test the WMStats DataCache
+    """
+
+    def setUp(self):
+        self.requests = makeRequests(500)
+        DataCache.setlatestJobData(self.requests)
+
+    def tearDown(self):
+        DataCache.setlatestJobData({})
+
+    def testFilterDataByRequest(self):
+        """
+        Test that the indexes return the same requests as a full scan
+        """
+        filters = [{},
+                   {"RequestStatus": "completed"},
+                   {"RequestStatus": ["assigned", "acquired"], "Team": "relval"},
+                   {"Campaign": "CampaignB"},
+                   {"Campaign": ["CampaignA", "CampaignC"], "AgentURL": AGENTS[1]},
+                   {"InputDataset": "/Input3/Era-v1/RAW", "RequestStatus": STATUSES[:4]},
+                   {"OutputDatasets": "/Primary10/Era-Proc1-v1/AODSIM"},
+                   {"RequestPriority": 2, "Team": ["production", "highprio"]},
+                   {"TrustSitelists": "true", "RequestStatus": "completed"},
+                   {"RequestStatus": []},
+                   {"RequestStatus": "completed", "AgentJobInfo": {"ignored": 1}},
+                   {"AgentJobInfo": "CLEANED", "RequestStatus": "announced"},
+                   {"RequestStatus": "no-such-status"},
+                   {"UnknownProperty": "foo"}]
+        for filterDict in filters:
+            names = [reqDict["RequestName"] for reqDict in DataCache.filterDataByRequest(filterDict)]
+            self.assertEqual(names, scanRequests(self.requests, filterDict))
+
+        result = list(DataCache.filterDataByRequest({"RequestStatus": "completed"}, "Team"))
+        self.assertEqual([item["RequestName"] for item in result],
+                         scanRequests(self.requests, {"RequestStatus": "completed"}))
+        self.assertItemsEqual(result[0].keys(), ["Team", "RequestName"])
+
+    def testFilterData(self):
+        """
+        Test filterData and getProtectedLFNs against a full scan
+        """
+        expected = []
+        for reqDict in self.requests.values():
+            if RequestInfo(reqDict).andFilterCheck(ACTIVE_STATUS_FILTER):
+                expected.extend(reqDict["OutputDatasets"])
+        self.assertEqual(list(DataCache.filterData(ACTIVE_STATUS_FILTER, ["OutputDatasets"])), expected)
+
+        expected = []
+        for reqDict in self.requests.values():
+            expected.extend(protectedLFNs(reqDict))
+        self.assertEqual(list(DataCache.getProtectedLFNs()), expected)
+
+        # the indexes follow the cache refreshes
+        DataCache.setlatestJobData(makeRequests(10, seed=1))
+        self.assertEqual(len(list(DataCache.filterDataByRequest({}))), 10)
+
+    @attr('performance')
+    def testFilterPerformance(self):
+        """
+        Time 1000 filters on 20k requests, with the indexes and with full scans
+        """
+        requests = makeRequests(20000)
+        DataCache.setlatestJobData(requests)
+        filterDict = {"RequestStatus": "completed", "Campaign": "CampaignA"}
+
+        startTime = time.time()
+        for _ in range(1000):
+            names = [reqDict["RequestName"] for reqDict in DataCache.filterDataByRequest(filterDict)]
+        print("1000 filters with indexes: %.2f secs" % (time.time() - startTime))
+
+        startTime = time.time()
+        for _ in range(10):
+            self.assertEqual(scanRequests(requests, filterDict), names)
+        print("10 filters with full scans: %.2f secs" % (time.time() - startTime))
+
+
+if __name__ == '__main__':
+    unittest.main()
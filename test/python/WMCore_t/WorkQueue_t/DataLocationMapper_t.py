@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+_DataLocationMapper_t_
+
+Unit tests for the WorkQueue data location mapper, with fake PhEDEx, DBS and
+SiteDB services.
+"""
+from __future__ import print_function, division
+
+import threading
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.WorkQueue.DataLocationMapper import DataLocationMapper, chunkNames
+
+# dataset -> {block: nodes}
+REPLICAS = {"/Primary%d/Processed/RAW" % i: dict(("/Primary%d/Processed/RAW#block%d" % (i, j),
+                                                  ["T1_US_FNAL_Disk", "T2_CH_CERN"] if j % 2 else ["T2_CH_CERN"])
+                                                 for j in range(10))
+            for i in range(20)}
+
+
+class FakePhEDEx(object):
+    """
+    blockreplicas api answering from REPLICAS
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def getReplicaInfoForBlocks(self, **args):
+        with self.lock:
+            self.calls.append(args)
+        time.sleep(self.delay)
+        blocks = []
+        for dataset in args.get('dataset', []):
+            if dataset == "/Bad/Dataset/RAW":
+                raise RuntimeError("PhEDEx error")
+            for block, nodes in sorted(REPLICAS.get(dataset, {}).items()):
+                blocks.append({'name': block, 'replica': [{'node': node} for node in nodes]})
+        for block in args.get('block', []):
+            nodes = REPLICAS.get(block.split('#')[0], {}).get(block)
+            if nodes:
+                blocks.append({'name': block, 'replica': [{'node': node} for node in nodes]})
+        return {'phedex': {'block': blocks}}
+
+
+class FakeSiteDB(object):
+    """
+    PNN to PSN conversion counting its calls
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def PNNstoPSNs(self, pnns):
+        self.calls += 1
+        return [pnn.replace("_Disk", "") for pnn in pnns]
+
+
+class FakeDBS(object):
+    """
+    DBSReader origin site apis
+    """
+
+    def listFileBlockLocation(self, block, dbsOnly=False):
+        return ["T2_CH_CERN"]
+
+    def listDatasetLocation(self, dataset, dbsOnly=False):
+        if dataset == "/Bad/Dataset/RAW":
+            raise RuntimeError("DBS error")
+        return ["T1_US_FNAL_Disk"]
+
+
+class DataLocationMapperTest(unittest.TestCase):
+    """
+    _DataLocationMapperTest_
+
+    Unit tests for the data location mapper.
+    """
+
+    def setUp(self):
+        self.phedex = FakePhEDEx()
+        self.sitedb = FakeSiteDB()
+        self.blocks = sorted(block for replicas in REPLICAS.values() for block in replicas)
+
+    def getMapper(self, **kwargs):
+        return DataLocationMapper(phedex=self.phedex, sitedb=self.sitedb, locationFrom='location', **kwargs)
+
+    def testChunkNames(self):
+        """
+        _testChunkNames_
+
+        Test splitting names in chunks of limited length.
+        """
+        self.assertEqual(list(chunkNames(["aa", "bbb", "c", "dddddd"], 4)), [["aa"], ["bbb", "c"], ["dddddd"]])
+        self.assertEqual(list(chunkNames([], 4)), [])
+        return
+
+    def testLocationsFromPhEDEx(self):
+        """
+        _testLocationsFromPhEDEx_
+
+        Test that blocks and datasets are queried by chunks, with or without
+        threads, and converted to PSNs.
+        """
+        dataItems = self.blocks + ["/Primary1/Processed/RAW", "/Primary2/Processed/RAW", "/Bad/Dataset/RAW"]
+        for fetchThreads in (1, 4):
+            self.phedex.calls = []
+            self.sitedb.calls = 0
+            mapper = self.getMapper(maxNamesLength=1000, fetchThreads=fetchThreads)
+            result, fullResync = mapper.locationsFromPhEDEx(dataItems, fullResync=True)
+            self.assertTrue(fullResync)
+            self.assertEqual(len(result), len(self.blocks) + 2)
+            self.assertItemsEqual(result["/Primary3/Processed/RAW#block1"], ["T1_US_FNAL", "T2_CH_CERN"])
+            self.assertItemsEqual(result["/Primary3/Processed/RAW#block2"], ["T2_CH_CERN"])
+            self.assertItemsEqual(result["/Primary2/Processed/RAW"], ["T1_US_FNAL", "T2_CH_CERN"])
+            self.assertNotIn("/Bad/Dataset/RAW", result)
+            # 7 chunks of blocks, and the chunk of datasets queried again one by one
+            self.assertEqual(len(self.phedex.calls), 11)
+            self.assertTrue(all(call['complete'] == 'y' for call in self.phedex.calls))
+            self.assertEqual(self.sitedb.calls, 2)
+        return
+
+    def testLocationCache(self):
+        """
+        _testLocationCache_
+
+        Test that data items queried recently are skipped until the next full
+        resync.
+        """
+        mapper = self.getMapper(locationCacheTTL=3600)
+        result, _ = mapper.locationsFromPhEDEx(self.blocks[:100], fullResync=True)
+        self.assertEqual(len(result), 100)
+        result, _ = mapper.locationsFromPhEDEx(self.blocks, fullResync=False)
+        self.assertItemsEqual(result.keys(), self.blocks[100:])
+        result, _ = mapper.locationsFromPhEDEx(self.blocks, fullResync=False)
+        self.assertEqual(result, {})
+        result, _ = mapper.locationsFromPhEDEx(self.blocks, fullResync=True)
+        self.assertEqual(len(result), len(self.blocks))
+
+        mapper = self.getMapper()
+        mapper.locationsFromPhEDEx(self.blocks, fullResync=True)
+        result, _ = mapper.locationsFromPhEDEx(self.blocks, fullResync=False)
+        self.assertEqual(len(result), len(self.blocks))
+        return
+
+    def testLocationsFromDBS(self):
+        """
+        _testLocationsFromDBS_
+
+        Test the locations from DBS, with or without threads.
+        """
+        dataItems = self.blocks[:20] + ["/Primary1/Processed/RAW", "/Bad/Dataset/RAW"]
+        for fetchThreads in (1, 4):
+            mapper = self.getMapper(fetchThreads=fetchThreads)
+            result, fullResync = mapper.locationsFromDBS(FakeDBS(), dataItems)
+            self.assertTrue(fullResync)
+            self.assertEqual(len(result), 21)
+            self.assertEqual(result[self.blocks[0]], ["T2_CH_CERN"])
+            self.assertEqual(result["/Primary1/Processed/RAW"], ["T1_US_FNAL"])
+        return
+
+    @attr('performance')
+    def testLocationsFromPhEDExPerformance(self):
+        """
+        _testLocationsFromPhEDExPerformance_
+
+        Time the location of 200 blocks with 20ms PhEDEx queries, one query
+        per block and by chunks with 4 threads.
+        """
+        self.phedex.delay = 0.02
+        for params in ({'maxNamesLength': 1}, {'fetchThreads': 4, 'maxNamesLength': 1000}):
+            self.phedex.calls = []
+            mapper = self.getMapper(**params)
+            startTime = time.time()
+            result, _ = mapper.locationsFromPhEDEx(self.blocks, fullResync=True)
+            print("%d blocks in %d queries: %.2f secs" % (len(result), len(self.phedex.calls),
+                                                          time.time() - startTime))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,10 +3,11 @@
     CouchWorkQueueElement unit tests
 """
 
+import random
 import unittest
 import time
 from WMQuality.TestInitCouchApp import TestInitCouchApp as TestInit
-from WMCore.WorkQueue.WorkQueueBackend import WorkQueueBackend
+from WMCore.WorkQueue.WorkQueueBackend import PriorityJobCounts, WorkQueueBackend
 from WMCore.WorkQueue.DataStructs.CouchWorkQueueElement import CouchWorkQueueElement
 from WMCore.WorkQueue.DataStructs.WorkQueueElement import WorkQueueElement
 
@@ -109,6 +110,64 @@ class WorkQueueBackendTest(unittest.TestCase):
         self.assertEqual(len(self.backend.db.allDocs()['rows']), 4)  # design doc + workflow + 2 elements
         self.assertEqual(self.backend.db.loadView('WorkQueue', 'conflicts')['total_rows'], 0)
 
+    def testAvailableWorkIndex(self):
+        """Available work from the in memory index follows the changes of the elements"""
+        indexBackend = WorkQueueBackend(db_url=self.testInit.couchUrl,
+                                        db_name='wq_backend_test',
+                                        inbox_name='wq_backend_test_inbox',
+                                        availableWorkIndex=True)
+        elements = [WorkQueueElement(RequestName='backend_test_%d' % i, WMSpec=self.processingSpec,
+                                     Status='Available', SiteWhitelist=["place", "other"],
+                                     Jobs=10, Priority=i % 3, TeamName='team%d' % (i % 2))
+                    for i in range(6)]
+        self.backend.insertElements(elements[:4])
+
+        def requestNames(backend, *args, **kwargs):
+            return [x['RequestName'] for x in backend.availableWork({'place': 1000}, {}, *args, **kwargs)[0]]
+
+        self.assertEqual(requestNames(indexBackend), requestNames(self.backend))
+        self.assertEqual(len(requestNames(indexBackend)), 4)
+
+        self.backend.insertElements(elements[4:])
+        ids = dict((x['RequestName'], x.id) for x in self.backend.getElements())
+        self.backend.updateElements(ids['backend_test_0'], Priority=10)
+        self.backend.updateElements(ids['backend_test_1'], Status='Acquired')
+        self.backend.deleteElements(*self.backend.getElements(elementIDs=[ids['backend_test_2']]))
+        work = requestNames(indexBackend)
+        self.assertEqual(work, requestNames(self.backend))
+        self.assertEqual(work[0], 'backend_test_0')
+        self.assertEqual(len(work), 4)
+        for args, kwargs in [(('team1',), {}), ((), {'wfs': ['backend_test_3', 'backend_test_4']}),
+                             ((), {'excludeWorkflows': ['backend_test_0']}), ((), {'numElems': 2})]:
+            self.assertEqual(requestNames(indexBackend, *args, **kwargs), requestNames(self.backend, *args, **kwargs))
+
+        # the elements handed out are not the ones of the index
+        element = indexBackend.availableWork({'place': 1000}, {})[0][0]
+        element['Subscription'] = 1
+        self.assertNotIn('Subscription', indexBackend.availableWork({'place': 1000}, {})[0][0])
+        self.assertEqual(indexBackend.availableWork({'nowhere': 1000}, {})[0], [])
+
+
+class PriorityJobCountsTest(unittest.TestCase):
+    def testCounts(self):
+        """Job counts by priority match summing the site job counts"""
+        for seed in range(20):
+            rand = random.Random(seed)
+            sites = ["T2_XX_Site%d" % i for i in range(5)]
+            siteJobCounts = {}
+            for site in sites[1:]:
+                siteJobCounts[site] = dict((rand.randint(0, 20) * 1000, rand.randint(0, 100)) for _ in range(5))
+            jobCounts = PriorityJobCounts(siteJobCounts)
+            prio = 30000
+            for _ in range(200):
+                prio -= rand.choice([0, 0, 100, 1000])
+                site = rand.choice(sites)
+                expected = sum(jobs for jobPrio, jobs in siteJobCounts.get(site, {}).items() if jobPrio >= prio)
+                self.assertEqual(jobCounts.count(site, prio), expected)
+                if rand.random() < 0.3:
+                    jobCounts.add(site, prio, rand.randint(1, 10))
+        return
+
 
 if __name__ == '__main__':
     unittest.main()